@@ -61,7 +61,7 @@ with st.sidebar:
 
     page = st.radio(
         "Navigate to:",
-        ["🏠 Dashboard", "💰 Cost Estimator", "📱 Social Media", "💬 Client Assistant", "🛡️ Safety Scanner", "📊 HubSpot CRM"],
+        ["🏠 Dashboard", "💰 Cost Estimator", "📱 Social Media", "💬 Client Assistant", "📥 Inquiry Inbox", "🛡️ Safety Scanner", "📈 Safety Trends", "📊 HubSpot CRM"],
         label_visibility="collapsed"
     )
 
@@ -92,10 +92,18 @@ elif page == "💬 Client Assistant":
     from modules.client_assistant import show_client_assistant
     show_client_assistant()
 
+elif page == "📥 Inquiry Inbox":
+    from modules.inquiry_inbox import show_inquiry_inbox
+    show_inquiry_inbox()
+
 elif page == "🛡️ Safety Scanner":
     from modules.safety_scanner import show_safety_scanner
     show_safety_scanner()
 
+elif page == "📈 Safety Trends":
+    from modules.safety_analytics import show_hazard_analytics
+    show_hazard_analytics()
+
 elif page == "📊 HubSpot CRM":
     from modules.hubspot_manager import show_hubspot_manager
     show_hubspot_manager()
@@ -0,0 +1,491 @@
+"""
+SE Builders - Client Assistant Load Test
+
+Replays scripted multi-turn client conversations against the assistant
+pipeline (AssistantSession: routing, knowledge base, answer cache, memory,
+lead qualification) with many simulated visitors at once, fully offline:
+
+- Gemini is replaced by a local stub with configurable first-token latency,
+  jitter, streaming speed and error rate; its timing is derived from a seed
+  and the prompt, so runs are repeatable regardless of thread scheduling
+- HubSpot is replaced by an in-memory stand-in with configurable latency,
+  driven through the real HubSpotIntegration code
+
+Each visitor runs in its own thread, as Streamlit script runs do. The report
+gives per-turn latency percentiles (total, first chunk and pipeline overhead
+outside the model), throughput, routing mix, error rates, HubSpot save
+latency and API calls, and traced memory per session.
+
+Usage:
+    python assistant_loadtest.py --users 50 --sessions 200
+    python assistant_loadtest.py --json loadtest.json --max-p95-ms 2500 --max-error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from modules.answer_cache import AnswerCache
+from modules.followup_prefetch import PrefetchBudget, PrefetchStats
+from modules.assistant_session import AssistantSession
+from modules.hubspot_integration import HUBSPOT_AVAILABLE, HubSpotIntegration
+from modules.intent_router import TIERS, RoutingLog
+from modules.knowledge_base import get_knowledge_base
+
+# Scripted conversations; "save" conversations end with a HubSpot save
+SCENARIOS = [
+    {
+        "name": "faq_browser",
+        "turns": [
+            "Hi there",
+            "What types of healthcare facilities do you build?",
+            "What is your service area?",
+            "Thanks, that's all",
+        ],
+    },
+    {
+        "name": "timeline_and_budget",
+        "turns": [
+            "How long does a typical medical office take?",
+            "What does a medical office build-out usually cost per square foot?",
+            "Do you handle permitting with the city?",
+            "How can I contact your team?",
+        ],
+    },
+    {
+        "name": "qualified_lead",
+        "save": True,
+        "turns": [
+            "Hello",
+            "We're planning a 12,000 sq ft outpatient surgery center in Irvine.",
+            "Our budget is around $6 million and we'd like to open within 9 months.",
+            "Does it need OSHPD review, and how does that affect the schedule?",
+            "I'm the facility director. You can reach me at {email} or 949-555-0134.",
+            "Can we schedule a consultation next week?",
+        ],
+    },
+    {
+        "name": "escalation",
+        "save": True,
+        "turns": [
+            "We're opening an urgent care clinic in Long Beach.",
+            "We need a formal proposal for our RFP by Friday - can you send a bid?",
+            "Please have someone call me, my email is {email}",
+        ],
+    },
+    {
+        "name": "long_planning_chat",
+        "turns": [
+            "Hi, I'm researching contractors for a hospital renovation in San Diego.",
+            "It's about 40,000 sq ft across two floors of an occupied hospital.",
+            "How do you handle infection control during construction in occupied areas?",
+            "What does phasing usually look like for a project like that?",
+            "Can you compare a phased renovation versus a full shutdown of the wing?",
+            "How long would the seismic retrofit portion take?",
+            "What medical gas work is typically involved?",
+            "Have you built imaging suites with MRI shielding?",
+            "What about nurse call and low-voltage systems?",
+            "How do you coordinate with hospital facilities staff?",
+            "What kind of warranty do you offer?",
+            "Can you share examples of past hospital projects?",
+            "Who would be our main point of contact during construction?",
+            "Thanks, this is really helpful",
+        ],
+    },
+    {
+        "name": "past_projects",
+        "turns": [
+            "Can I see examples of past projects?",
+            "What makes SE Builders different?",
+            "What is OSHPD compliance?",
+        ],
+    },
+]
+
+_FILLER = (
+    "our team delivers healthcare construction projects across Southern California with a focus "
+    "on compliance schedule budget infection control phasing and coordination with clinical staff "
+    "we recommend scheduling a consultation so we can review your requirements in detail"
+).split()
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of a list (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+# ==================== LLM STUB ====================
+
+class StubModel:
+    """Stands in for genai.GenerativeModel with simulated latency and errors"""
+
+    def __init__(self, config: Dict, timer: "UpstreamTimer", model_name: str, visitor: int):
+        self.config = config
+        self.timer = timer
+        self.model_name = model_name
+        self.visitor = visitor
+
+    def _rng(self, contents) -> random.Random:
+        # Seeded by the visitor and request so timing does not depend on thread order
+        return random.Random(f"{self.config['seed']}:{self.visitor}:{self.model_name}:{contents!r}")
+
+    def _reply(self, rng: random.Random) -> str:
+        words = [rng.choice(_FILLER) for _ in range(rng.randint(60, 160))]
+        return "Thanks for your question. " + " ".join(words).capitalize() + "."
+
+    def _sleep(self, seconds: float):
+        self.timer.add(seconds)
+        time.sleep(seconds)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        rng = self._rng(contents)
+        first = max(self.config["latency"] + rng.gauss(0, self.config["jitter"]), 0.02)
+        failed = rng.random() < self.config["error_rate"]
+        text = self._reply(rng)
+
+        if not stream:
+            self._sleep(first)
+            if failed:
+                raise RuntimeError("Simulated upstream error")
+            return SimpleNamespace(text=text[:600])
+
+        def chunks():
+            self._sleep(first)
+            if failed:
+                raise RuntimeError("Simulated upstream error")
+            words = text.split(" ")
+            for i in range(0, len(words), 12):
+                if i:
+                    self._sleep(self.config["chunk_delay"])
+                yield SimpleNamespace(text=" ".join(words[i:i + 12]) + " ")
+
+        return chunks()
+
+
+class UpstreamTimer:
+    """Time each visitor thread spends waiting on the model stub"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def add(self, seconds: float):
+        self._local.seconds = self.elapsed() + seconds
+
+    def elapsed(self) -> float:
+        return getattr(self._local, "seconds", 0.0)
+
+
+# ==================== HUBSPOT STAND-IN ====================
+
+class StandInHubSpotClient:
+    """In-memory stand-in for the parts of the HubSpot client the platform calls"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self.contacts: Dict[str, str] = {}
+        self.notes = 0
+        self._lock = threading.Lock()
+
+        self.crm = SimpleNamespace(
+            contacts=SimpleNamespace(
+                search_api=SimpleNamespace(do_search=self._search_contacts),
+                basic_api=SimpleNamespace(create=self._create_contact, update=self._update_contact)
+            ),
+            objects=SimpleNamespace(notes=SimpleNamespace(
+                basic_api=SimpleNamespace(create=self._create_note),
+                associations_api=SimpleNamespace(create=self._associate_note)
+            ))
+        )
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.latency)
+
+    def _search_contacts(self, public_object_search_request: Dict):
+        self._call("contacts.search")
+        email = public_object_search_request["filter_groups"][0]["filters"][0]["value"]
+        with self._lock:
+            contact_id = self.contacts.get(email)
+        results = [SimpleNamespace(id=contact_id)] if contact_id else []
+        return SimpleNamespace(total=len(results), results=results)
+
+    def _create_contact(self, simple_public_object_input):
+        self._call("contacts.create")
+        with self._lock:
+            contact_id = str(len(self.contacts) + 1)
+            self.contacts[simple_public_object_input.properties["email"]] = contact_id
+        return SimpleNamespace(id=contact_id)
+
+    def _update_contact(self, contact_id: str, simple_public_object_input):
+        self._call("contacts.update")
+        return SimpleNamespace(id=contact_id)
+
+    def _create_note(self, simple_public_object_input):
+        self._call("notes.create")
+        with self._lock:
+            self.notes += 1
+            return SimpleNamespace(id=f"note-{self.notes}")
+
+    def _associate_note(self, note_id: str, to_object_type: str, to_object_id: str):
+        self._call("notes.associate")
+
+
+def standin_hubspot(latency: float) -> Optional[HubSpotIntegration]:
+    """HubSpotIntegration wired to the stand-in client (None without hubspot-api-client)"""
+    if not HUBSPOT_AVAILABLE:
+        return None
+    integration = HubSpotIntegration()
+    integration.client = StandInHubSpotClient(latency)
+    integration.enabled = True
+    return integration
+
+
+# ==================== RUNNER ====================
+
+def run_visitor(
+    index: int,
+    scenario: Dict,
+    config: Dict,
+    timer: UpstreamTimer,
+    answer_cache: AnswerCache,
+    routing_log: RoutingLog,
+    prefetch: Dict,
+    hubspot: Optional[HubSpotIntegration]
+) -> Dict:
+    """Play one scripted conversation and return its measurements"""
+    rng = random.Random(f"{config['seed']}:visitor:{index}")
+    email = f"loadtest+{index}@example.com"
+    session = AssistantSession(
+        model_factory=lambda si, model_name="full": StubModel(config, timer, model_name, index),
+        answer_cache=answer_cache,
+        routing_log=routing_log,
+        prefetch_budget=prefetch["budget"],
+        prefetch_stats=prefetch["stats"]
+    )
+
+    turns = []
+    for message in scenario["turns"]:
+        if turns and config["think_time"]:
+            time.sleep(rng.uniform(0.5, 1.5) * config["think_time"])
+
+        message = message.format(email=email)
+        upstream_before = timer.elapsed()
+        started = time.perf_counter()
+        first_chunk = None
+        ok = True
+        try:
+            for _ in session.stream(message):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - started
+
+        turns.append({
+            "latency": latency,
+            "first_chunk": first_chunk,
+            "overhead": latency - (timer.elapsed() - upstream_before),
+            "tier": (session.last_route or {}).get("tier", "full"),
+            "ok": ok
+        })
+
+    save = None
+    if scenario.get("save") and hubspot is not None:
+        started = time.perf_counter()
+        saved = hubspot.log_assistant_lead(
+            contact_email=session.lead.profile["email"] or email,
+            conversation_history=session.transcript(),
+            lead=session.lead,
+            lead_source="Load Test"
+        )
+        save = {"latency": time.perf_counter() - started, "ok": bool(saved)}
+
+    return {"scenario": scenario["name"], "turns": turns, "save": save, "session": session}
+
+
+def run_load_test(config: Dict, scenarios: List[Dict] = None) -> Dict:
+    """
+    Run the simulated visitors and aggregate the results
+
+    Args:
+        config: Stub and runner settings (see main() for the keys)
+        scenarios: Scripted conversations (defaults to SCENARIOS)
+
+    Returns:
+        Report dict (JSON-serializable)
+    """
+    scenarios = scenarios or SCENARIOS
+    timer = UpstreamTimer()
+    answer_cache = AnswerCache()
+    routing_log = RoutingLog(path=None, keep=100000)
+    prefetch = {"budget": PrefetchBudget(), "stats": PrefetchStats()}
+    hubspot = standin_hubspot(config["hubspot_latency"])
+
+    get_knowledge_base()  # Load once up front, outside the measurements
+    if config["memory"]:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0] if config["memory"] else 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config["users"], thread_name_prefix="visitor") as pool:
+        futures = [
+            pool.submit(
+                run_visitor, i, scenarios[i % len(scenarios)], config,
+                timer, answer_cache, routing_log, prefetch, hubspot
+            )
+            for i in range(config["sessions"])
+        ]
+        visitors = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    # Sessions are still referenced, so the growth is what they hold
+    memory_per_session = None
+    if config["memory"]:
+        memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / len(visitors)
+        tracemalloc.stop()
+
+    turns = [turn for visitor in visitors for turn in visitor["turns"]]
+    ok_turns = [turn for turn in turns if turn["ok"]]
+    saves = [visitor["save"] for visitor in visitors if visitor["save"]]
+
+    def ms(values: List[float]) -> Dict:
+        return {
+            f"p{int(q * 100)}_ms": None if percentile(values, q) is None else round(percentile(values, q) * 1000, 1)
+            for q in (0.5, 0.95, 0.99)
+        }
+
+    tiers = Counter(turn["tier"] for turn in turns)
+    report = {
+        "config": {k: v for k, v in config.items()},
+        "sessions": len(visitors),
+        "turns": len(turns),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_turns_per_s": round(len(turns) / elapsed, 2),
+        "error_rate": round(1 - len(ok_turns) / len(turns), 4) if turns else 0.0,
+        "latency": ms([turn["latency"] for turn in ok_turns]),
+        "first_chunk": ms([turn["first_chunk"] for turn in ok_turns if turn["first_chunk"] is not None]),
+        "pipeline_overhead": ms([turn["overhead"] for turn in ok_turns]),
+        "tiers": {tier: tiers[tier] for tier in TIERS if tiers[tier]},
+        "per_tier_latency": {
+            tier: ms([turn["latency"] for turn in ok_turns if turn["tier"] == tier])
+            for tier in TIERS if tiers[tier]
+        },
+        "cache": answer_cache.stats(),
+        "prefetch": prefetch["stats"].stats(),
+        "memory_per_session_kb": None if memory_per_session is None else round(memory_per_session / 1024, 1),
+        "hubspot": None
+    }
+    if hubspot is not None:
+        report["hubspot"] = {
+            "saves": len(saves),
+            "errors": sum(1 for save in saves if not save["ok"]),
+            **ms([save["latency"] for save in saves]),
+            "api_calls": dict(hubspot.client.calls),
+            "api_calls_per_save": round(sum(hubspot.client.calls.values()) / len(saves), 1) if saves else None
+        }
+    return report
+
+
+def print_report(report: Dict):
+    def row(label: str, values: Dict):
+        cells = "  ".join(
+            f"{key.removesuffix('_ms')} {value:>8,.1f} ms" if value is not None else f"{key.removesuffix('_ms')}        -"
+            for key, value in values.items() if key.endswith("_ms")
+        )
+        print(f"  {label:<20}{cells}")
+
+    print(f"\n{report['sessions']} sessions, {report['turns']} turns in {report['elapsed_s']}s "
+          f"({report['throughput_turns_per_s']} turns/s) with {report['config']['users']} concurrent users")
+    print(f"Error rate: {report['error_rate']:.2%}")
+    print("\nTurn latency")
+    row("total", report["latency"])
+    row("first chunk", report["first_chunk"])
+    row("pipeline overhead", report["pipeline_overhead"])
+    print("\nBy tier")
+    for tier, count in report["tiers"].items():
+        row(f"{tier} ({count / report['turns']:.0%})", report["per_tier_latency"][tier])
+    cache = report["cache"]
+    print(f"\nAnswer cache: {cache['hits']} of {cache['lookups']} lookups hit ({cache['hit_rate']:.0%})")
+    prefetch = report["prefetch"]
+    print(f"Prefetch: {prefetch['started']} started, {prefetch['used']} of {prefetch['ready']} ready answers used, "
+          f"{prefetch['cancelled']} cancelled, {prefetch['over_budget']} over budget")
+    if report["memory_per_session_kb"] is not None:
+        print(f"Memory per session: {report['memory_per_session_kb']:,.1f} KB")
+    hubspot = report["hubspot"]
+    if hubspot is None:
+        print("HubSpot stand-in skipped: hubspot-api-client is not installed")
+    elif hubspot["saves"]:
+        print(f"\nHubSpot saves: {hubspot['saves']} ({hubspot['errors']} failed), "
+              f"{hubspot['api_calls_per_save']} API calls per save")
+        row("save", hubspot)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of the client assistant pipeline")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent simulated visitors")
+    parser.add_argument("--sessions", type=int, default=200, help="Conversations to play in total")
+    parser.add_argument("--scenarios", help="JSON file with scripted conversations (default: built-in)")
+    parser.add_argument("--latency", type=float, default=0.8, help="Model stub first-chunk latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Standard deviation of that latency (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.03, help="Delay between streamed chunks (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls that fail")
+    parser.add_argument("--hubspot-latency", type=float, default=0.15, help="HubSpot stand-in latency per API call (s)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Average pause between a visitor's messages (s)")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for stub timing and visitor pauses")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows the pipeline down)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit with status 1 if p95 turn latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="Exit with status 1 if the error rate is higher")
+    args = parser.parse_args(argv)
+
+    scenarios = None
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as f:
+            scenarios = json.load(f)
+
+    config = {
+        "users": max(1, args.users),
+        "sessions": max(1, args.sessions),
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "chunk_delay": args.chunk_delay,
+        "error_rate": args.error_rate,
+        "hubspot_latency": args.hubspot_latency,
+        "think_time": args.think_time,
+        "seed": args.seed,
+        "memory": not args.no_memory
+    }
+    report = run_load_test(config, scenarios)
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+    failed = False
+    p95 = report["latency"]["p95_ms"]
+    if args.max_p95_ms is not None and p95 is not None and p95 > args.max_p95_ms:
+        print(f"FAIL: p95 latency {p95:,.1f} ms exceeds {args.max_p95_ms:,.1f} ms", file=sys.stderr)
+        failed = True
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        print(f"FAIL: error rate {report['error_rate']:.2%} exceeds {args.max_error_rate:.2%}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
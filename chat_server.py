@@ -0,0 +1,350 @@
+"""
+SE Builders - Client Assistant Chat Server
+
+Asynchronous HTTP/WebSocket backend for the website chat widget. It serves
+the same assistant as the Streamlit page (AssistantSession: instructions,
+knowledge base, answer cache, routing, lead qualification) and the same
+HubSpot logging, without holding a thread per visitor:
+
+- Visitors are cheap: a session is a small object in an in-process LRU
+  store, evicted after SESSION_IDLE_SECONDS without activity
+- Gemini calls run on a bounded worker pool (MAX_UPSTREAM_CALLS) that shares
+  one configured client and its connection pool; waiting visitors hold no
+  thread, and replies are streamed back chunk by chunk as they arrive
+- Messages within one session are handled one at a time
+
+API (JSON; replies stream as newline-delimited JSON events):
+
+    POST /chat/sessions                   -> {session_id, greeting}
+    GET  /chat/sessions/<id>              -> {messages, lead}
+    POST /chat/sessions/<id>/messages     {message}
+                                          -> {"type": "chunk", "text"}... {"type": "done", "suggestions", ...}
+    POST /chat/sessions/<id>/hubspot      {email, name, phone, company} -> {saved}
+    WS   /chat/ws/<id>                    send {"message"}; receive the same events
+
+Usage:
+    python chat_server.py --port 8503
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+import tornado.ioloop
+import tornado.iostream
+import tornado.web
+import tornado.websocket
+from dotenv import load_dotenv
+
+from modules.assistant_session import AssistantSession
+from modules.hubspot_integration import HubSpotIntegration
+
+# Concurrent Gemini calls; further messages wait without holding a thread
+MAX_UPSTREAM_CALLS = 32
+
+MAX_SESSIONS = 5000
+SESSION_IDLE_SECONDS = 2 * 3600
+PURGE_INTERVAL_MS = 60 * 1000
+
+MAX_MESSAGE_CHARS = 4000
+
+GREETING = (
+    "Hello! 👋 Welcome to SE Builders. I can help with our healthcare construction services, "
+    "typical timelines and budgets, past projects, or scheduling a consultation. "
+    "How can I assist you today?"
+)
+
+ERROR_REPLY = (
+    "I apologize, but I encountered an error. Please try again or contact our team directly "
+    "at info@sebuilders.com"
+)
+
+
+class ChatSession:
+    """One website visitor's conversation"""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.assistant = AssistantSession()
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+
+    def lead_info(self) -> Dict:
+        lead = self.assistant.lead
+        return {"score": lead.score, "grade": lead.grade, "escalations": lead.escalation_labels()}
+
+
+class SessionStore:
+    """In-process LRU of chat sessions, evicting idle ones"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex)
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_active = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def purge_idle(self) -> int:
+        """Drop sessions idle for too long; returns how many were removed"""
+        cutoff = time.monotonic() - self.idle_seconds
+        removed = 0
+        # Oldest first, so stop at the first active session
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_active >= cutoff or session.lock.locked():
+                break
+            del self._sessions[session_id]
+            removed += 1
+        return removed
+
+
+class ChatBackend:
+    """Shared session store, HubSpot client and upstream worker pool"""
+
+    def __init__(self, store: SessionStore, hubspot: HubSpotIntegration, max_upstream: int = MAX_UPSTREAM_CALLS):
+        self.store = store
+        self.hubspot = hubspot
+        self.executor = ThreadPoolExecutor(max_workers=max_upstream, thread_name_prefix="chat-upstream")
+        self.upstream = asyncio.Semaphore(max_upstream)
+
+    async def reply(self, session: ChatSession, message: str) -> AsyncIterator[Dict]:
+        """
+        Answer a visitor message, yielding chunk events and a final done event
+
+        The synchronous Gemini stream runs on the worker pool and hands
+        chunks back to the event loop through a queue. The session stays
+        locked until the worker is done, even if the caller stops reading.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def produce():
+            try:
+                for piece in session.assistant.stream(message):
+                    loop.call_soon_threadsafe(queue.put_nowait, ("chunk", piece))
+                loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+        async with session.lock, self.upstream:
+            producer = loop.run_in_executor(self.executor, produce)
+            try:
+                while True:
+                    kind, value = await queue.get()
+                    if kind == "chunk":
+                        yield {"type": "chunk", "text": value}
+                    elif kind == "error":
+                        yield {"type": "error", "text": ERROR_REPLY}
+                        return
+                    else:
+                        break
+            finally:
+                # A visitor who leaves closes this generator early; the reply still
+                # completes into the session, and the next message waits for it
+                await asyncio.shield(producer)
+
+        route = session.assistant.last_route or {}
+        yield {
+            "type": "done",
+            "tier": route.get("tier"),
+            "lead": session.lead_info(),
+            "suggestions": session.assistant.suggestions,
+        }
+
+    async def save_to_hubspot(self, session: ChatSession, fields: Dict) -> bool:
+        """Log the conversation and lead profile to HubSpot off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            lambda: self.hubspot.log_assistant_lead(
+                contact_email=fields["email"],
+                conversation_history=session.assistant.transcript(),
+                lead=session.assistant.lead,
+                name=fields.get("name", ""),
+                phone=fields.get("phone", ""),
+                company=fields.get("company", ""),
+                lead_source="Website Chat Widget"
+            )
+        )
+
+
+def _parse_message(body: Dict) -> str:
+    message = str(body.get("message", "")).strip()
+    if not message:
+        raise tornado.web.HTTPError(400, reason="Message is empty")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise tornado.web.HTTPError(400, reason=f"Message is longer than {MAX_MESSAGE_CHARS} characters")
+    return message
+
+
+class ChatHandler(tornado.web.RequestHandler):
+    """Base handler with CORS and JSON errors"""
+
+    def initialize(self, backend: ChatBackend, origins: List[str]):
+        self.backend = backend
+        self.origins = origins
+
+    def prepare(self):
+        origin = self.request.headers.get("Origin")
+        if origin and (not self.origins or origin in self.origins):
+            self.set_header("Access-Control-Allow-Origin", origin)
+            self.set_header("Access-Control-Allow-Headers", "Content-Type")
+            self.set_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.set_header("Vary", "Origin")
+
+    def options(self, *args):
+        self.set_status(204)
+        self.finish()
+
+    def write_error(self, status_code: int, **kwargs):
+        self.finish({"error": self._reason})
+
+    def json_body(self) -> Dict:
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Expected a JSON body")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="Expected a JSON object")
+        return body
+
+    def session(self, session_id: str) -> ChatSession:
+        session = self.backend.store.get(session_id)
+        if session is None:
+            raise tornado.web.HTTPError(404, reason="Unknown or expired session")
+        return session
+
+
+class SessionsHandler(ChatHandler):
+    def post(self):
+        session = self.backend.store.create()
+        self.write({"session_id": session.id, "greeting": GREETING})
+
+
+class SessionHandler(ChatHandler):
+    def get(self, session_id: str):
+        session = self.session(session_id)
+        self.write({"messages": session.assistant.transcript(), "lead": session.lead_info()})
+
+
+class MessageHandler(ChatHandler):
+    async def post(self, session_id: str):
+        session = self.session(session_id)
+        message = _parse_message(self.json_body())
+
+        self.set_header("Content-Type", "application/x-ndjson")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")  # Let reverse proxies pass chunks through
+
+        async with aclosing(self.backend.reply(session, message)) as events:
+            async for event in events:
+                self.write(json.dumps(event) + "\n")
+                try:
+                    await self.flush()
+                except tornado.iostream.StreamClosedError:
+                    return  # Visitor left; the reply still completes into the session history
+
+
+class HubSpotHandler(ChatHandler):
+    async def post(self, session_id: str):
+        session = self.session(session_id)
+        fields = {k: str(v).strip() for k, v in self.json_body().items()}
+        if "@" not in fields.get("email", ""):
+            raise tornado.web.HTTPError(400, reason="A valid email is required")
+        if not self.backend.hubspot.is_enabled():
+            raise tornado.web.HTTPError(503, reason="HubSpot is not configured")
+        self.write({"saved": await self.backend.save_to_hubspot(session, fields)})
+
+
+class ChatSocket(tornado.websocket.WebSocketHandler):
+    """Same conversation over a WebSocket, one JSON event per frame"""
+
+    def initialize(self, backend: ChatBackend, origins: List[str]):
+        self.backend = backend
+        self.origins = origins
+
+    def check_origin(self, origin: str) -> bool:
+        return not self.origins or origin in self.origins
+
+    def open(self, session_id: str):
+        self.chat = self.backend.store.get(session_id)
+        if self.chat is None:
+            self.close(4404, "Unknown or expired session")
+
+    async def on_message(self, raw):
+        try:
+            message = _parse_message(json.loads(raw))
+        except (ValueError, AttributeError, tornado.web.HTTPError) as e:
+            self.write_message({"type": "error", "text": getattr(e, "reason", None) or "Expected {\"message\": ...}"})
+            return
+
+        self.chat.last_active = time.monotonic()
+        async with aclosing(self.backend.reply(self.chat, message)) as events:
+            async for event in events:
+                try:
+                    await self.write_message(event)
+                except tornado.websocket.WebSocketClosedError:
+                    return
+
+
+def make_app(backend: ChatBackend, origins: List[str] = None) -> tornado.web.Application:
+    settings = {"backend": backend, "origins": origins or []}
+    return tornado.web.Application([
+        (r"/chat/sessions", SessionsHandler, settings),
+        (r"/chat/sessions/([0-9a-f]{32})", SessionHandler, settings),
+        (r"/chat/sessions/([0-9a-f]{32})/messages", MessageHandler, settings),
+        (r"/chat/sessions/([0-9a-f]{32})/hubspot", HubSpotHandler, settings),
+        (r"/chat/ws/([0-9a-f]{32})", ChatSocket, settings),
+    ])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Client assistant chat backend for the website widget")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8503)
+    parser.add_argument("--max-upstream", type=int, default=MAX_UPSTREAM_CALLS, help="Concurrent Gemini calls")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    origins = [o.strip() for o in os.getenv("CHAT_ALLOWED_ORIGINS", "").split(",") if o.strip()]
+    if not origins:
+        print("Warning: CHAT_ALLOWED_ORIGINS is not set - any website can embed the chat", file=sys.stderr)
+
+    async def serve():
+        store = SessionStore()
+        # Created after .env is loaded so the HubSpot key is picked up
+        app = make_app(ChatBackend(store, HubSpotIntegration(), args.max_upstream), origins)
+        app.listen(args.port, args.host)
+        tornado.ioloop.PeriodicCallback(store.purge_idle, PURGE_INTERVAL_MS).start()
+        print(f"Chat backend on http://{args.host}:{args.port}/chat/sessions")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+SE Builders - Field Photo Uploader
+
+Queues site photos in a local outbox and sends them to upload_server.py in
+small acknowledged chunks, so a flaky LTE connection never restarts a batch:
+
+- Photos are downscaled to what the safety model actually sees before they
+  are queued (skip with --original), which cuts most of the bytes on the wire
+- The server is asked for each photo by content hash first; photos it
+  already has are skipped and partial uploads resume from the missing chunks
+- Network failures back off and retry; anything still queued is sent on the
+  next run, so photos can be queued while offline
+- A transfer that fails its checksum, or whose partial upload the server
+  dropped, is started again; only rejections no retry can fix (bad token,
+  photo too large or of an unsupported type) remove a photo from the queue
+
+Usage:
+    python field_upload.py ~/DCIM/site-walk --project "Costa Mesa Clinic" \\
+        --location "2nd Floor" --server https://uploads.example.com
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from modules.safety_analysis import MAX_IMAGE_DIMENSION
+
+PHOTO_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+MANIFEST_FILE = "manifest.json"
+
+REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 2.0
+
+# Rejections that retrying can never fix
+PERMANENT_STATUSES = {401, 403, 413}
+
+# Fresh starts per photo after the server discarded its chunks
+MAX_RESTARTS = 2
+
+
+def prepare_for_upload(path: Path, max_dimension: int) -> bytes:
+    """Downscale and re-encode a photo, keeping its EXIF (capture time, GPS)"""
+    with Image.open(path) as image:
+        exif = image.info.get("exif", b"")
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension))
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85, exif=exif)
+        return buf.getvalue()
+
+
+class Outbox:
+    """Local queue of prepared photos waiting to be uploaded"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = directory / MANIFEST_FILE
+        self.entries: Dict[str, Dict] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def enqueue(self, path: Path, project: str, location: str, batch: str, max_dimension: int, original: bool):
+        """Prepare a photo and add it to the queue (no-op if already queued unchanged)"""
+        key = str(path.resolve())
+        stat = path.stat()
+        existing = self.entries.get(key)
+        if existing and existing["mtime"] == stat.st_mtime and existing["source_size"] == stat.st_size:
+            return
+
+        data = path.read_bytes() if original else prepare_for_upload(path, max_dimension)
+        sha256 = hashlib.sha256(data).hexdigest()
+        name = path.name if original else f"{path.stem}.jpg"
+        (self.directory / f"{sha256}{Path(name).suffix.lower()}").write_bytes(data)
+
+        self.entries[key] = {
+            "name": name,
+            "sha256": sha256,
+            "size": len(data),
+            "source_size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "project": project,
+            "location": location,
+            "batch": batch,
+            "done": False
+        }
+
+    def pending(self) -> List[Dict]:
+        return [entry for entry in self.entries.values() if not entry["done"]]
+
+    def read(self, entry: Dict) -> bytes:
+        return (self.directory / f"{entry['sha256']}{Path(entry['name']).suffix.lower()}").read_bytes()
+
+    def mark_done(self, entry: Dict):
+        entry["done"] = True
+        (self.directory / f"{entry['sha256']}{Path(entry['name']).suffix.lower()}").unlink(missing_ok=True)
+        self.save()
+
+
+class UploadRejected(ValueError):
+    """The server refused a request (4xx)"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.restartable = False
+
+    @property
+    def permanent(self) -> bool:
+        """Whether resending the photo can never succeed"""
+        return self.status in PERMANENT_STATUSES or (self.status == 400 and not self.restartable)
+
+
+class UploadClient:
+    """Minimal client for upload_server.py with retries"""
+
+    def __init__(self, server: str, token: str = ""):
+        self.server = server.rstrip("/")
+        self.token = token
+        self.bytes_sent = 0
+
+    def _request(self, method: str, path: str, body: bytes = None, headers: Dict = None) -> Dict:
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            request = urllib.request.Request(f"{self.server}{path}", data=body, method=method, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                    self.bytes_sent += len(body or b"")
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    detail = e.read().decode("utf-8", "replace")
+                    raise UploadRejected(e.code, f"{method} {path} failed ({e.code}): {detail}")
+                error = e
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                error = e
+
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(RETRY_BASE_DELAY * 2 ** (attempt - 1))
+
+        raise ConnectionError(f"{method} {path} failed after {MAX_ATTEMPTS} attempts: {error}")
+
+    def upload(self, entry: Dict, data: bytes) -> str:
+        """
+        Send one photo, resuming a partial upload if the server has one
+
+        A corrupted transfer (chunk or whole-file checksum mismatch) or a
+        partial upload the server has purged starts the photo again.
+
+        Returns:
+            "duplicate" if the server already had the photo, else "complete"
+
+        Raises:
+            UploadRejected: The server refused the photo, or it kept
+                failing after MAX_RESTARTS fresh starts
+            ConnectionError: The server could not be reached
+        """
+        for restart in range(MAX_RESTARTS + 1):
+            try:
+                return self._send(entry, data)
+            except UploadRejected as e:
+                if not e.restartable or restart == MAX_RESTARTS:
+                    raise
+
+    def _send(self, entry: Dict, data: bytes) -> str:
+        started = self._request(
+            "POST", "/uploads",
+            json.dumps({k: entry[k] for k in ("name", "size", "sha256", "project", "location", "batch")}).encode(),
+            {"Content-Type": "application/json"}
+        )
+        if started["status"] == "duplicate":
+            return "duplicate"
+
+        chunk_size = started["chunk_size"]
+        status = started
+        for index in started["missing"]:
+            chunk = data[index * chunk_size:(index + 1) * chunk_size]
+            try:
+                status = self._request(
+                    "PUT", f"/uploads/{started['upload_id']}/chunks/{index}", chunk,
+                    {"Content-Type": "application/octet-stream",
+                     "X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()}
+                )
+            except UploadRejected as e:
+                # Bad chunk, failed whole-file checksum or purged partial upload
+                e.restartable = e.status in (400, 404)
+                raise
+
+        if status["status"] != "complete":
+            raise ConnectionError(f"Upload of {entry['name']} incomplete: {len(status['missing'])} chunk(s) missing")
+        return "complete"
+
+
+def find_photos(paths: List[str]) -> List[Path]:
+    photos = []
+    for raw in paths:
+        path = Path(raw).expanduser()
+        if path.is_dir():
+            photos.extend(p for p in sorted(path.rglob("*")) if p.suffix.lower() in PHOTO_EXTENSIONS)
+        elif path.suffix.lower() in PHOTO_EXTENSIONS:
+            photos.append(path)
+    return photos
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Queue and upload site photos over unreliable connections")
+    parser.add_argument("paths", nargs="*", help="Photos or folders to queue (omit to just send the outbox)")
+    parser.add_argument("--server", default=os.getenv("UPLOAD_SERVER", "http://localhost:8502"))
+    parser.add_argument("--project", default="", help="Project the photos belong to")
+    parser.add_argument("--location", default="", help="Area of the site")
+    parser.add_argument("--batch", default=datetime.now().strftime("%Y%m%d-%H%M"), help="Site-walk batch ID")
+    parser.add_argument("--outbox", default=".upload_outbox", help="Local queue directory")
+    parser.add_argument("--max-dimension", type=int, default=MAX_IMAGE_DIMENSION, help="Longest side after downscaling")
+    parser.add_argument("--original", action="store_true", help="Upload original files without downscaling")
+    parser.add_argument("--rounds", type=int, default=5, help="Retry rounds while the server is unreachable")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    outbox = Outbox(Path(args.outbox))
+
+    photos = find_photos(args.paths)
+    original_bytes = 0
+    for path in photos:
+        outbox.enqueue(path, args.project, args.location, args.batch, args.max_dimension, args.original)
+        original_bytes += path.stat().st_size
+    outbox.save()
+
+    client = UploadClient(args.server, os.getenv("UPLOAD_TOKEN", ""))
+    counts = {"complete": 0, "duplicate": 0, "failed": 0}
+
+    for round_number in range(1, args.rounds + 1):
+        pending = outbox.pending()
+        if not pending:
+            break
+        print(f"Round {round_number}: {len(pending)} photo(s) to send")
+
+        offline = False
+        for entry in pending:
+            try:
+                result = client.upload(entry, outbox.read(entry))
+            except ConnectionError as e:
+                print(f"  {entry['name']}: {e}")
+                offline = True
+                break
+            except UploadRejected as e:
+                if not e.permanent:
+                    print(f"  {entry['name']}: {e} - kept in the queue", file=sys.stderr)
+                    continue
+                print(f"  {entry['name']}: rejected - {e}", file=sys.stderr)
+                counts["failed"] += 1
+                outbox.mark_done(entry)
+                continue
+            counts[result] += 1
+            outbox.mark_done(entry)
+            print(f"  {entry['name']}: {'already on server' if result == 'duplicate' else 'uploaded'}")
+
+        if offline and round_number < args.rounds:
+            delay = RETRY_BASE_DELAY * 4 ** round_number
+            print(f"Server unreachable - retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    remaining = len(outbox.pending())
+    print(
+        f"Uploaded {counts['complete']}, skipped {counts['duplicate']} duplicate(s), "
+        f"{counts['failed']} rejected, {remaining} still queued"
+    )
+    if original_bytes:
+        print(f"Sent {client.bytes_sent / 1e6:.1f} MB for {original_bytes / 1e6:.1f} MB of original photos")
+
+    return 0 if remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
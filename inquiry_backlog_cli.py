@@ -0,0 +1,110 @@
+"""
+SE Builders - Inbound Inquiry Backlog Processor
+
+Drafts replies to a backlog of email and web form inquiries with the client
+assistant's instructions and knowledge base, scores each lead and saves the
+contacts to HubSpot in a few batch requests. Drafts land in the review
+queue shown on the Inquiry Inbox page; nothing is sent automatically.
+
+Accepts a folder (.eml, .txt, .json), an mbox file or a CSV export. Already
+drafted inquiries are skipped, so the same export can be re-run safely;
+contacts an interrupted run left unsaved are saved on the next run.
+
+Usage:
+    python inquiry_backlog_cli.py ~/exports/inbox.mbox
+    python inquiry_backlog_cli.py web_form_leads.csv --concurrency 16 --rate 300
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+
+from modules.hubspot_integration import HubSpotIntegration
+from modules.inquiry_backlog import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE_PER_MINUTE,
+    FAILED,
+    draft_replies,
+    drafted_ids,
+    load_inquiries,
+    save_drafts,
+    set_contact_ids,
+    unsaved_contacts,
+)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Draft replies to a backlog of inbound inquiries")
+    parser.add_argument("source", help="Folder of .eml/.txt/.json files, an mbox file or a CSV export")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent model calls")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_MINUTE, help="Maximum model requests per minute")
+    parser.add_argument("--limit", type=int, help="Only process this many new inquiries")
+    parser.add_argument("--no-hubspot", action="store_true", help="Don't save contacts to HubSpot")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("GOOGLE_API_KEY not found in environment or .env file", file=sys.stderr)
+        return 2
+
+    source = Path(args.source)
+    if not source.exists():
+        print(f"Not found: {source}", file=sys.stderr)
+        return 2
+
+    inquiries = load_inquiries(source)
+    done = drafted_ids()
+    pending = [inquiry for inquiry in inquiries if inquiry["id"] not in done]
+    if args.limit is not None:
+        pending = pending[:args.limit]
+
+    print(f"Found {len(inquiries)} inquiry(s); {len(inquiries) - len(pending)} already drafted, {len(pending)} to go")
+    failed = 0
+    if pending:
+        failed = draft_backlog(pending, args.concurrency, args.rate)
+
+    # Every queued contact not saved yet, including those of interrupted earlier runs
+    contacts = unsaved_contacts()
+    if contacts and not args.no_hubspot:
+        hubspot = HubSpotIntegration()  # After load_dotenv() so the key is picked up
+        if hubspot.is_enabled():
+            contact_ids = hubspot.batch_upsert_contacts(contacts)
+            set_contact_ids(contact_ids)
+            print(f"Saved {len(contact_ids)} of {len(contacts)} contact(s) to HubSpot")
+        else:
+            print("HubSpot is not configured; contacts were not saved")
+
+    return 1 if failed else 0
+
+
+def draft_backlog(pending: List[dict], concurrency: int, rate: float) -> int:
+    """Draft replies for new inquiries, queueing each as it finishes; returns the number that failed"""
+    started = time.monotonic()
+    finished = []
+
+    def on_result(record):
+        # Each draft is queued as soon as it is ready, so an interrupted run keeps its work
+        save_drafts([record])
+        finished.append(record)
+        status = "FAILED" if record["status"] == FAILED else record["lead_grade"].upper()
+        sender = record["contact"]["email"] or record["name"] or record["source"]
+        print(f"[{len(finished)}/{len(pending)}] {status:<6} {record['lead_score']:>3}  {sender}", flush=True)
+
+    records = asyncio.run(draft_replies(pending, concurrency, rate, on_result=on_result))
+    failed = sum(1 for record in records if record["status"] == FAILED)
+    print(f"Drafted {len(records) - failed} reply(s), {failed} failed in {time.monotonic() - started:.1f}s")
+
+    hot = sum(1 for record in records if record["lead_grade"] == "Hot")
+    escalated = sum(1 for record in records if record["escalations"])
+    print(f"{hot} hot lead(s), {escalated} needing personal follow-up - review them on the Inquiry Inbox page")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
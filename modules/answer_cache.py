@@ -0,0 +1,194 @@
+"""
+Semantic Answer Cache for the Client Assistant
+
+Most website visitors open with the same handful of questions ("What is
+your service area?", "What is OSHPD compliance?"). Their answers are cached
+process-wide and looked up by meaning rather than exact text:
+
+- Questions are embedded locally with the hashing trick over stemmed words,
+  word pairs and character trigrams (for typos), then L2-normalized
+- Embeddings sit in one NumPy matrix, so a lookup is a single matrix-vector
+  product; the best match is used if its cosine similarity clears the
+  threshold
+- Numbers, amounts and months must match exactly: "20,000 sq ft" and
+  "50,000 sq ft" versions of a question embed almost identically but need
+  different answers
+- Entries expire after a TTL, and the whole cache is dropped when the
+  knowledge base version changes, so edited facts are never served stale
+
+Only opening questions are stored (see AssistantSession), since follow-ups
+depend on the conversation before them.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from modules.knowledge_base import tokenize
+
+EMBEDDING_DIM = 1024
+
+# Cosine similarity needed to reuse an answer
+SIMILARITY_THRESHOLD = 0.75
+
+ANSWER_TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 500
+
+# Long, specific messages are project inquiries rather than common questions
+MAX_QUESTION_CHARS = 200
+
+# Figures and dates a cached answer has to agree on
+_SPECIFIC = re.compile(
+    r"\d[\d,]*(?:\.\d+)?|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b|\bq[1-4]\b"
+)
+
+# Feature weights: whole words dominate, trigrams only absorb spelling noise
+_WORD_WEIGHT = 1.0
+_PAIR_WEIGHT = 0.7
+_TRIGRAM_WEIGHT = 0.25
+
+
+def _feature(name: str):
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % EMBEDDING_DIM, 1.0 if value >> 63 else -1.0
+
+
+def question_specifics(text: str) -> FrozenSet[str]:
+    """Numbers (without separators), month names and quarters in a question"""
+    return frozenset(match.replace(",", "")[:3] if match[0].isalpha() else match.replace(",", "")
+                     for match in _SPECIFIC.findall(text.lower()))
+
+
+def embed_question(text: str) -> np.ndarray:
+    """Unit-length hashed embedding of a question"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = tokenize(text)
+
+    features = [(f"w:{w}", _WORD_WEIGHT) for w in words]
+    features += [(f"p:{a} {b}", _PAIR_WEIGHT) for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"^{word}$"
+        features += [(f"t:{padded[i:i + 3]}", _TRIGRAM_WEIGHT / max(len(padded) - 2, 1))
+                     for i in range(len(padded) - 2)]
+
+    for name, weight in features:
+        index, sign = _feature(name)
+        vector[index] += sign * weight
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """In-memory vector index of answered questions"""
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        ttl: float = ANSWER_TTL_SECONDS,
+        max_entries: int = MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.knowledge_version: Optional[str] = None
+        self._vectors = np.zeros((max_entries, EMBEDDING_DIM), dtype=np.float32)
+        self._entries: List[Dict] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, knowledge_version: str):
+        if knowledge_version != self.knowledge_version:
+            self._entries = []
+            self.knowledge_version = knowledge_version
+
+    def lookup(self, question: str, knowledge_version: str) -> Optional[Dict]:
+        """
+        Find a cached answer to an equivalent question
+
+        Args:
+            question: Client message
+            knowledge_version: Current KnowledgeBase.version
+
+        Returns:
+            Dict with question, answer and similarity, or None on a miss
+        """
+        vector = embed_question(question)
+        specifics = question_specifics(question)
+        now = time.time()
+
+        with self._lock:
+            self._check_version(knowledge_version)
+            match = None
+            if self._entries and vector.any():
+                similarities = self._vectors[:len(self._entries)] @ vector
+                for index, entry in enumerate(self._entries):
+                    if entry["specifics"] != specifics:
+                        similarities[index] = -1.0
+                best = int(np.argmax(similarities))
+                entry = self._entries[best]
+                if similarities[best] >= self.threshold and now - entry["created"] < self.ttl:
+                    entry["hits"] += 1
+                    entry["last_used"] = now
+                    match = {"question": entry["question"], "answer": entry["answer"],
+                             "similarity": round(float(similarities[best]), 3)}
+
+            if match:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return match
+
+    def store(self, question: str, answer: str, knowledge_version: str):
+        """Cache an answer, replacing expired or least recently used entries when full"""
+        if len(question) > MAX_QUESTION_CHARS:
+            return
+        vector = embed_question(question)
+        if not vector.any():
+            return
+        now = time.time()
+
+        with self._lock:
+            self._check_version(knowledge_version)
+            entry = {"question": question, "answer": answer, "specifics": question_specifics(question),
+                     "created": now, "last_used": now, "hits": 0}
+
+            if len(self._entries) < self.max_entries:
+                slot = len(self._entries)
+                self._entries.append(entry)
+            else:
+                slot = min(
+                    range(len(self._entries)),
+                    key=lambda i: (now - self._entries[i]["created"] < self.ttl, self._entries[i]["last_used"])
+                )
+                self._entries[slot] = entry
+            self._vectors[slot] = vector
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+
+    def stats(self) -> Dict:
+        """Lookup counts and hit rate since the process started"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "lookups": lookups,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    """Process-wide cache shared by every visitor's session"""
+    return AnswerCache()
@@ -0,0 +1,410 @@
+"""
+Client Assistant Chat Session
+
+One AssistantSession per website conversation. The model is built once per
+conversation with the assistant instructions as its system instruction, and
+each turn sends just the new message on top of the structured chat history,
+instead of re-sending the whole knowledge text and history as one string.
+
+Company knowledge comes from the knowledge base (modules/knowledge_base.py):
+only the chunks relevant to the new message are attached to it, and they
+are not kept in the history, so the prompt size stays constant. Answers to
+common opening questions are reused from the semantic answer cache
+(modules/answer_cache.py) without calling the model. History is sent within
+a token budget, with older turns folded into a running summary
+(modules/conversation_memory.py). Every client message also updates a
+local lead profile (modules/lead_qualification.py); when it raises an
+escalation, the model is told to offer the SE Builders team. The intent
+router (modules/intent_router.py) picks the cheapest adequate tier for each
+message: a template, the answer cache, the light model or the full model.
+After each reply the likeliest follow-up questions are suggested and the top
+ones answered ahead in the background (modules/followup_prefetch.py).
+
+The session is independent of Streamlit so other front ends and load tests
+can drive it; the model factory is injectable for testing.
+"""
+
+import copy
+import os
+import threading
+import time
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+
+from modules.answer_cache import AnswerCache, get_answer_cache
+from modules.conversation_memory import HISTORY_TOKEN_BUDGET, ConversationMemory, estimate_tokens, truncate_to_tokens
+from modules.followup_prefetch import (
+    PREFETCH_MAX_OUTPUT_TOKENS, PREFETCH_PER_SESSION, PREFETCH_PER_TURN, PREFETCH_POOL,
+    PrefetchBudget, PrefetchStats, get_prefetch_budget, get_prefetch_stats,
+    normalize_question, predict_followups, wait_for
+)
+from modules.intent_router import TAILORED_INTENTS, RoutingLog, classify_message, get_routing_log
+from modules.knowledge_base import DEFAULT_TOP_K, MAX_CHUNK_CHARS, KnowledgeBase, get_knowledge_base
+from modules.lead_qualification import ESCALATION_LABELS, LeadQualifier
+
+ASSISTANT_MODEL_NAME = "gemini-2.0-flash-exp"
+# Cheaper tier for simple questions and conversation summaries
+LIGHT_MODEL_NAME = "gemini-2.0-flash-lite"
+
+ASSISTANT_INSTRUCTIONS = """You are an AI assistant for SE Builders Inc., a premier commercial construction company specializing in healthcare facilities in Southern California.
+
+Each client message comes with the most relevant excerpts from the SE Builders knowledge base (services, projects, timelines, pricing ranges, OSHPD FAQ). Base company facts on those excerpts only; never invent projects, prices or timelines that are not in them.
+
+CONVERSATION GUIDELINES:
+1. Be professional, friendly, and helpful
+2. Ask clarifying questions to understand client needs
+3. Provide accurate information based on the knowledge base excerpts
+4. For specific pricing, encourage scheduling a consultation
+5. Highlight SE Builders' healthcare expertise
+6. If you don't know something, say so and offer to connect them with the team
+7. When appropriate, ask if they'd like to:
+   - Schedule a consultation
+   - See examples of similar projects
+   - Get a preliminary cost estimate
+   - Receive more information via email
+
+ESCALATION TRIGGERS (suggest human contact):
+- Client requests specific detailed pricing
+- Complex regulatory questions beyond general info
+- Legal or contract discussions
+- Project budget exceeds typical ranges significantly
+- Client expresses frustration
+- RFP or formal proposal requested
+- Timeline is urgent (less than 6 months)
+
+Remember: You represent SE Builders. Be knowledgeable, professional, and helpful while building trust with potential clients."""
+
+
+@lru_cache(maxsize=1)
+def _configure():
+    """Configure the Gemini client once per process"""
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def default_model_factory(system_instruction: str, model_name: str = ASSISTANT_MODEL_NAME):
+    """Build a Gemini chat model with the given system instruction"""
+    _configure()
+    return genai.GenerativeModel(
+        model_name=model_name,
+        system_instruction=system_instruction
+    )
+
+
+def _hit_token_limit(chunk) -> bool:
+    """Whether a streamed chunk ended its answer at the output token limit"""
+    for candidate in getattr(chunk, "candidates", None) or []:
+        reason = getattr(candidate, "finish_reason", None)
+        if getattr(reason, "name", reason) in ("MAX_TOKENS", 2):
+            return True
+    return False
+
+
+class AssistantSession:
+    """A client conversation with its own model and chat history"""
+
+    def __init__(
+        self,
+        system_instruction: str = ASSISTANT_INSTRUCTIONS,
+        history: Optional[List[Dict]] = None,
+        model_factory: Callable[[str], object] = default_model_factory,
+        history_tokens: int = HISTORY_TOKEN_BUDGET,
+        knowledge_base: Optional[KnowledgeBase] = None,
+        top_k: int = DEFAULT_TOP_K,
+        answer_cache: Optional[AnswerCache] = None,
+        cache_answers: bool = True,
+        routing: bool = True,
+        routing_log: Optional[RoutingLog] = None,
+        prefetch: bool = True,
+        prefetch_budget: Optional[PrefetchBudget] = None,
+        prefetch_stats: Optional[PrefetchStats] = None
+    ):
+        self.system_instruction = system_instruction
+        self.model_factory = model_factory
+        self.knowledge_base = knowledge_base
+        self.top_k = top_k
+        self.answer_cache = answer_cache
+        self.cache_answers = cache_answers
+        self.routing = routing
+        self.routing_log = routing_log
+        self.prefetch = prefetch
+        self.prefetch_budget = prefetch_budget
+        self.prefetch_stats = prefetch_stats
+        # Whether the last reply came from the answer cache, and how it was routed
+        self.last_reply_cached = False
+        self.last_route: Optional[Dict] = None
+        self._model = None
+        self._light_model = None
+        self.memory = ConversationMemory(
+            partial(model_factory, model_name=LIGHT_MODEL_NAME), history_tokens=history_tokens
+        )
+        # Suggested next questions, and answers being prefetched for them by question
+        self.suggestions: List[str] = []
+        self._prefetches: Dict[str, Dict] = {}
+        self._prefetch_count = 0
+
+        # Gemini content format: {"role": "user" | "model", "parts": [text]}
+        self.history: List[Dict] = []
+        self.lead = LeadQualifier()
+        # Questions answered so far other than greetings and other templates
+        self.answered = 0
+        for message in history or []:
+            self._append(message["role"], message["content"])
+            if message["role"] == "user":
+                self.lead.update(message["content"])
+                self.answered += 1
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.model_factory(self.system_instruction)
+        return self._model
+
+    @property
+    def light_model(self):
+        if self._light_model is None:
+            self._light_model = self.model_factory(self.system_instruction, model_name=LIGHT_MODEL_NAME)
+        return self._light_model
+
+    def _append(self, role: str, text: str):
+        role = "model" if role == "assistant" else role
+        # Chat history must start with a user turn; drop greetings before it
+        if not self.history and role != "user":
+            return
+        self.history.append({"role": role, "parts": [text]})
+
+    def _knowledge_base(self) -> KnowledgeBase:
+        return self.knowledge_base or get_knowledge_base()
+
+    def _answer_cache(self) -> AnswerCache:
+        return self.answer_cache or get_answer_cache()
+
+    def _routing_log(self) -> RoutingLog:
+        return self.routing_log or get_routing_log()
+
+    def _prefetch_budget(self) -> PrefetchBudget:
+        return self.prefetch_budget or get_prefetch_budget()
+
+    def _prefetch_stats(self) -> PrefetchStats:
+        return self.prefetch_stats or get_prefetch_stats()
+
+    def retrieve(self, prompt: str) -> str:
+        """Knowledge base excerpts for a message ("" if none are relevant)"""
+        knowledge_base = self._knowledge_base()
+        # The previous question helps with follow-ups like "how long does that take?"
+        previous = next((turn["parts"][0] for turn in reversed(self.history) if turn["role"] == "user"), "")
+        return knowledge_base.build_context(f"{prompt}\n{previous}", self.top_k)
+
+    def _contents(self, prompt: str, escalations: Optional[List[str]] = None) -> List[Dict]:
+        summary, recent = self.memory.build(self.history)
+
+        parts = []
+        if summary:
+            parts.append(f"EARLIER IN THIS CONVERSATION (summary):\n{summary}")
+        context = self.retrieve(prompt)
+        if context:
+            parts.append(context)
+        if escalations:
+            reasons = ", ".join(ESCALATION_LABELS[flag].lower() for flag in escalations)
+            parts.append(
+                f"ESCALATION ({reasons}): answer what you can, then recommend connecting with the "
+                "SE Builders team and offer to schedule a consultation."
+            )
+        message = truncate_to_tokens(prompt, self.memory.turn_tokens)
+        parts.append(f"CLIENT MESSAGE:\n{message}" if parts else message)
+        return recent + [{"role": "user", "parts": parts}]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Send a user message and yield the reply text as it is generated
+
+        Both turns are added to the history once the reply is complete; a
+        failed reply leaves the history and lead profile unchanged. Templated and cached
+        answers are returned in one piece without a model call.
+        """
+        started = time.perf_counter()
+        self.last_reply_cached = False
+        # Anything but a prefetched question means the visitor went another way
+        prefetched = self._take_prefetch(prompt)
+        self.cancel_prefetch()
+        self.suggestions = []
+        knowledge_base = self._knowledge_base()
+        # Follow-ups depend on the conversation, so only opening questions are cached
+        opening = self.answered == 0
+        # Restored if the reply fails, so a retry of the message escalates again
+        lead_before = copy.deepcopy(self.lead)
+        escalations = self.lead.update(prompt)
+
+        if self.routing:
+            route = classify_message(prompt, escalations, self.lead, knowledge_base)
+        else:
+            route = {"intent": "general", "tier": "full", "reason": "routing disabled"}
+        self.last_route = route
+
+        if route["tier"] == "template":
+            yield from self._finish_instant(prompt, route["reply"], route, started)
+            return
+
+        # Escalated, project-specific and complex messages need a tailored reply, never
+        # a cached one; follow-ups need the conversation, so only opening questions are looked up
+        if self.cache_answers and opening and not escalations and route["intent"] not in TAILORED_INTENTS:
+            cached = self._answer_cache().lookup(prompt, knowledge_base.version)
+            if cached:
+                self.last_reply_cached = True
+                self.answered += 1
+                route = self.last_route = {**route, "tier": "cache", "reason": f"similarity {cached['similarity']}"}
+                yield from self._finish_instant(prompt, cached["answer"], route, started)
+                return
+
+        if prefetched is not None:
+            answer = wait_for(prefetched["future"])
+            if answer:
+                self._prefetch_stats().add("used")
+                self.answered += 1
+                route = self.last_route = {**route, "tier": "prefetch", "reason": "answered ahead"}
+                yield from self._finish_instant(prompt, answer, route, started)
+                return
+
+        model = self.light_model if route["tier"] == "light" else self.model
+        text, first_token = "", None
+        try:
+            response = model.generate_content(self._contents(prompt, escalations), stream=True)
+            for chunk in response:
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    continue  # Chunk without text (e.g. only safety ratings)
+                if first_token is None:
+                    first_token = time.perf_counter()
+                text += piece
+                yield piece
+
+            if not text:
+                raise ValueError("Empty response from model")
+        except GeneratorExit:
+            self.lead = lead_before  # Abandoned mid-reply; the history is unchanged too
+            raise
+        except Exception:
+            self.lead = lead_before
+            self._routing_log().record(route, (time.perf_counter() - started) * 1000, ok=False)
+            raise
+
+        self._routing_log().record(
+            route, (time.perf_counter() - started) * 1000, (first_token - started) * 1000
+        )
+
+        if self.cache_answers and opening and not escalations and route["intent"] not in TAILORED_INTENTS:
+            self._answer_cache().store(prompt, text, knowledge_base.version)
+
+        self.answered += 1
+        self._append("user", prompt)
+        self._append("model", text)
+        # Fold turns that just left the window into the summary before the next message
+        self.memory.update_async(self.history)
+        self._suggest_followups(text)
+
+    def _finish_instant(self, prompt: str, answer: str, route: Dict, started: float) -> Iterator[str]:
+        """Reply with a ready answer (template, cache or prefetch) in one piece"""
+        latency = (time.perf_counter() - started) * 1000
+        yield answer
+        self._append("user", prompt)
+        self._append("model", answer)
+        self.memory.update_async(self.history)
+        self._routing_log().record(route, latency, latency)
+        self._suggest_followups(answer)
+
+    def _suggest_followups(self, reply: str):
+        """Predict the next questions and start answering the top ones"""
+        asked = [turn["parts"][0] for turn in self.history if turn["role"] == "user"]
+        self.suggestions = predict_followups(self.lead, asked, reply)
+        if self.prefetch:
+            self._start_prefetch(self.suggestions[:PREFETCH_PER_TURN])
+
+    def _start_prefetch(self, questions: List[str]):
+        knowledge_base = self._knowledge_base()
+        budget, stats = self._prefetch_budget(), self._prefetch_stats()
+        # Largest prompt a prefetch can send, plus its capped answer
+        tokens = (
+            estimate_tokens(self.system_instruction) + self.memory.history_tokens + self.memory.summary_tokens
+            + self.top_k * MAX_CHUNK_CHARS // 4 + self.memory.turn_tokens + PREFETCH_MAX_OUTPUT_TOKENS
+        )
+
+        for question in questions:
+            if self._prefetch_count >= PREFETCH_PER_SESSION:
+                return
+            # Route the question as stream() would, without touching the real lead profile
+            probe = copy.deepcopy(self.lead)
+            escalations = probe.update(question)
+            if self.routing:
+                route = classify_message(question, escalations, probe, knowledge_base)
+            else:
+                route = {"intent": "general", "tier": "full", "reason": "routing disabled"}
+            if route["tier"] == "template":
+                continue  # Instant anyway
+            if not budget.reserve(tokens):
+                stats.add("over_budget")
+                return
+
+            cancel = threading.Event()
+            future = PREFETCH_POOL.submit(self._prefetch_answer, question, escalations, route, len(self.history), cancel)
+            self._prefetches[normalize_question(question)] = {
+                "future": future, "cancel": cancel, "history_len": len(self.history)
+            }
+            self._prefetch_count += 1
+            stats.add("started")
+            stats.add("tokens", tokens)
+
+    def _prefetch_answer(
+        self, question: str, escalations: List[str], route: Dict, history_len: int, cancel: threading.Event
+    ) -> Optional[str]:
+        """Answer a predicted question in the background (None if cancelled)"""
+        if cancel.is_set() or len(self.history) != history_len:
+            return None
+        model = self.light_model if route["tier"] == "light" else self.model
+        response = model.generate_content(
+            self._contents(question, escalations),
+            stream=True,
+            generation_config={"max_output_tokens": PREFETCH_MAX_OUTPUT_TOKENS}
+        )
+        text = ""
+        for chunk in response:
+            if cancel.is_set():
+                return None  # Stop reading; the visitor asked something else
+            if _hit_token_limit(chunk):
+                # Cut off by the prefetch cap; a click generates the full answer live
+                self._prefetch_stats().add("truncated")
+                return None
+            try:
+                text += chunk.text
+            except ValueError:
+                continue
+        if text:
+            self._prefetch_stats().add("ready")
+        return text or None
+
+    def _take_prefetch(self, prompt: str) -> Optional[Dict]:
+        entry = self._prefetches.pop(normalize_question(prompt), None)
+        if entry is not None and entry["history_len"] == len(self.history):
+            return entry
+        return None
+
+    def cancel_prefetch(self):
+        """Stop answering suggested questions ahead"""
+        for entry in self._prefetches.values():
+            entry["cancel"].set()
+            if not entry["future"].done():
+                entry["future"].cancel()
+                self._prefetch_stats().add("cancelled")
+        self._prefetches.clear()
+
+    def send(self, prompt: str) -> str:
+        """Send a user message and return the full reply"""
+        return "".join(self.stream(prompt))
+
+    def transcript(self) -> List[Dict]:
+        """History as chat messages ({"role": "user" | "assistant", "content"})"""
+        return [
+            {"role": "assistant" if turn["role"] == "model" else "user", "content": turn["parts"][0]}
+            for turn in self.history
+        ]
@@ -0,0 +1,553 @@
+"""
+Continuous Camera-Feed Safety Monitoring
+
+Watches a fixed site camera and runs the safety analysis on frames that
+changed, instead of on uploaded photos:
+
+- A reader thread drains the feed (HTTP MJPEG, a local .mjpg file or a
+  folder of frames; RTSP and video files when OpenCV is installed) into a
+  single "latest frame" slot. A slow analysis never builds a queue: frames
+  that arrive before the previous one was sampled are dropped and counted.
+- A sampler thread looks at the latest frame at an adaptive interval that
+  shortens while the scene changes and backs off while it is static. Only
+  frames that differ from the last analyzed frame go to the model, and an
+  hourly call budget caps API spend.
+- A newly seen CRITICAL hazard raises an alert; the same hazard is not
+  re-alerted until its cooldown expires.
+
+Every buffer is fixed-size, so memory stays flat over days of runtime.
+
+Test stand-in for a real camera:
+    python -m modules.camera_monitor serve <frames dir or .mjpg> --port 8090
+then monitor http://localhost:8090/stream.mjpg
+"""
+
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from modules.safety_analysis import get_safety_model, analyze_photo, parse_hazards, hazard_similarity
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+MJPEG_SUFFIXES = (".mjpg", ".mjpeg")
+
+# A single JPEG frame larger than this means the stream is corrupt
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+_READ_CHUNK = 64 * 1024
+
+# Frames are downscaled to this before analysis
+MONITOR_MAX_DIMENSION = 1280
+
+# Size of the grayscale thumbnail used for change detection
+_CHANGE_THUMBNAIL = (64, 36)
+
+DEFAULT_SETTINGS = {
+    "min_interval": 5.0,         # Seconds between samples while the scene changes
+    "max_interval": 120.0,       # Longest back-off while the scene is static
+    "backoff": 1.5,              # Interval multiplier per unchanged sample
+    "change_threshold": 0.04,    # Mean absolute pixel change (0-1) that counts as changed
+    "max_calls_per_hour": 60,    # Model call budget
+    "alert_cooldown": 30 * 60,   # Seconds before the same CRITICAL hazard alerts again
+    "source_fps": 5.0            # Playback rate for file and folder sources
+}
+
+# Fixed-size history kept per monitor
+MAX_EVENTS = 200
+MAX_ALERTS = 100
+
+
+# ==================== FRAME SOURCES ====================
+
+def _split_jpegs(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Cut JPEG frames out of an MJPEG byte stream
+
+    Frames are found by their start/end markers, which works for both
+    multipart/x-mixed-replace HTTP streams and raw concatenated .mjpg files.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            start = buffer.find(b"\xff\xd8")
+            if start < 0:
+                # Keep a trailing 0xff in case the marker is split across chunks
+                del buffer[:max(len(buffer) - 1, 0)]
+                break
+            end = buffer.find(b"\xff\xd9", start + 2)
+            if end < 0:
+                del buffer[:start]
+                if len(buffer) > MAX_FRAME_BYTES:
+                    buffer.clear()
+                break
+            yield bytes(buffer[start:end + 2])
+            del buffer[:end + 2]
+
+
+def _read_chunks(stream) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _paced(frames: Iterator[bytes], fps: float, stop: threading.Event) -> Iterator[bytes]:
+    """Replay recorded frames at roughly real-time speed"""
+    delay = 1.0 / fps if fps > 0 else 0
+    for frame in frames:
+        yield frame
+        if stop.wait(delay):
+            return
+
+
+def _folder_frames(folder: Path, loop: bool) -> Iterator[bytes]:
+    while True:
+        paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not paths:
+            return
+        for path in paths:
+            yield path.read_bytes()
+        if not loop:
+            return
+
+
+def _mjpeg_file_frames(path: Path, loop: bool) -> Iterator[bytes]:
+    while True:
+        with open(path, "rb") as f:
+            yield from _split_jpegs(_read_chunks(f))
+        if not loop:
+            return
+
+
+def _opencv_frames(source: str, stop: threading.Event) -> Iterator[bytes]:
+    capture = cv2.VideoCapture(source)
+    try:
+        while not stop.is_set():
+            ok, frame = capture.read()
+            if not ok:
+                return
+            ok, encoded = cv2.imencode(".jpg", frame)
+            if ok:
+                yield encoded.tobytes()
+    finally:
+        capture.release()
+
+
+def open_frame_source(source: str, stop: threading.Event, fps: float = 5.0, loop: bool = True) -> Iterator[bytes]:
+    """
+    Iterate JPEG frames from a camera URL or local stand-in
+
+    Args:
+        source: http(s):// MJPEG URL, rtsp:// URL, .mjpg file, video file or
+            folder of image frames
+        stop: Event that ends playback of local sources
+        fps: Playback rate for local sources
+        loop: Restart local sources at the end so they behave like a camera
+
+    Returns:
+        Iterator of JPEG bytes
+    """
+    if source.startswith(("http://", "https://")):
+        response = urllib.request.urlopen(source, timeout=30)
+        return _split_jpegs(_read_chunks(response))
+
+    path = Path(source)
+    if path.is_dir():
+        return _paced(_folder_frames(path, loop), fps, stop)
+    if path.suffix.lower() in MJPEG_SUFFIXES:
+        return _paced(_mjpeg_file_frames(path, loop), fps, stop)
+
+    if not CV2_AVAILABLE:
+        raise ValueError(
+            f"Unsupported camera source '{source}'. RTSP streams and video files "
+            "need OpenCV (pip install opencv-python-headless)."
+        )
+    return _opencv_frames(source, stop)
+
+
+# ==================== CHANGE DETECTION ====================
+
+def frame_thumbnail(jpeg_bytes: bytes) -> np.ndarray:
+    """Small grayscale thumbnail of a frame, decoded at reduced scale"""
+    with Image.open(io.BytesIO(jpeg_bytes)) as image:
+        image.draft("L", (_CHANGE_THUMBNAIL[0] * 4, _CHANGE_THUMBNAIL[1] * 4))
+        small = image.convert("L").resize(_CHANGE_THUMBNAIL, Image.BILINEAR)
+        return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def frame_change(previous: Optional[np.ndarray], current: np.ndarray) -> float:
+    """Mean absolute pixel change between two thumbnails (1.0 if no previous)"""
+    if previous is None:
+        return 1.0
+    return float(np.abs(current - previous).mean())
+
+
+def _downscale(jpeg_bytes: bytes, max_dimension: int = MONITOR_MAX_DIMENSION) -> bytes:
+    with Image.open(io.BytesIO(jpeg_bytes)) as image:
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension))
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85)
+        return buf.getvalue()
+
+
+class CallBudget:
+    """Token bucket limiting model calls per hour"""
+
+    def __init__(self, calls_per_hour: int):
+        self.capacity = max(calls_per_hour, 1)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 3600.0
+        self.updated = time.monotonic()
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# ==================== MONITOR ====================
+
+class CameraMonitor:
+    """Samples one camera feed and analyzes changed frames in the background"""
+
+    def __init__(
+        self,
+        camera_name: str,
+        source: str,
+        project_name: str,
+        location: str,
+        settings: Dict = None,
+        alert_handlers: List[Callable[[Dict], None]] = None,
+        model_factory: Callable = get_safety_model
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.camera_name = camera_name
+        self.source = source
+        self.project_name = project_name
+        self.location = location
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.alert_handlers = list(alert_handlers or [])
+        self.model_factory = model_factory
+
+        self.started_at = datetime.now()
+        self.interval = self.settings["min_interval"]
+        self.last_error = ""
+        self.last_analysis = ""
+        self.last_analyzed_at: Optional[datetime] = None
+        self.last_analyzed_frame: Optional[bytes] = None
+
+        self.stats = {
+            "frames_read": 0,
+            "frames_dropped": 0,
+            "samples": 0,
+            "unchanged": 0,
+            "analyses": 0,
+            "budget_skipped": 0,
+            "bad_frames": 0,
+            "analysis_errors": 0,
+            "alerts": 0,
+            "reconnects": 0
+        }
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.alerts = deque(maxlen=MAX_ALERTS)
+
+        self._budget = CallBudget(self.settings["max_calls_per_hour"])
+        self._stop = threading.Event()
+        self._frame_ready = threading.Event()
+        self._latest: Optional[bytes] = None
+        self._latest_consumed = True
+        self._slot_lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None
+        # Recently alerted CRITICAL hazards with the monotonic time last seen
+        self._active_alerts: List[Dict] = []
+
+        self._threads = [
+            threading.Thread(target=self._read_loop, name=f"camera-read-{self.id}", daemon=True),
+            threading.Thread(target=self._sample_loop, name=f"camera-sample-{self.id}", daemon=True)
+        ]
+
+    @property
+    def running(self) -> bool:
+        return not self._stop.is_set() and any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._frame_ready.set()
+
+    def _log(self, message: str):
+        self.events.append((datetime.now(), message))
+
+    # ---------- Reader: keep only the newest frame ----------
+
+    def _read_loop(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                for frame in open_frame_source(self.source, self._stop, self.settings["source_fps"]):
+                    if self._stop.is_set():
+                        return
+                    with self._slot_lock:
+                        if not self._latest_consumed:
+                            self.stats["frames_dropped"] += 1
+                        self._latest = frame
+                        self._latest_consumed = False
+                    self.stats["frames_read"] += 1
+                    self._frame_ready.set()
+                    backoff = 1.0
+                self._log("Feed ended")
+            except Exception as e:
+                self.last_error = str(e)
+                self._log(f"Feed error: {e}")
+
+            # Reconnect with exponential back-off
+            self.stats["reconnects"] += 1
+            if self._stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, 60.0)
+
+    def _take_latest(self) -> Optional[bytes]:
+        with self._slot_lock:
+            if self._latest_consumed:
+                return None
+            self._latest_consumed = True
+            return self._latest
+
+    # ---------- Sampler: adaptive rate, change gate, budget ----------
+
+    def _sample_loop(self):
+        model = None
+        while not self._stop.is_set():
+            self._frame_ready.wait(timeout=self.settings["max_interval"])
+            self._frame_ready.clear()
+            frame = self._take_latest()
+            if frame is None:
+                continue
+
+            self.stats["samples"] += 1
+            try:
+                thumbnail = frame_thumbnail(frame)
+            except Exception:
+                self.stats["bad_frames"] += 1
+                continue
+
+            change = frame_change(self._reference, thumbnail)
+            if change < self.settings["change_threshold"]:
+                self.stats["unchanged"] += 1
+                self.interval = min(self.interval * self.settings["backoff"], self.settings["max_interval"])
+            elif not self._budget.try_spend():
+                self.stats["budget_skipped"] += 1
+                self._log("Scene changed but the hourly call budget is used up")
+                self.interval = min(self.interval * self.settings["backoff"], self.settings["max_interval"])
+            else:
+                self.interval = self.settings["min_interval"]
+                try:
+                    if model is None:
+                        model = self.model_factory()
+                    self._analyze(model, frame)
+                    self._reference = thumbnail
+                except Exception as e:
+                    self.stats["analysis_errors"] += 1
+                    self.last_error = str(e)
+                    self._log(f"Analysis failed: {e}")
+
+            if self._stop.wait(self.interval):
+                return
+
+    def _analyze(self, model, frame: bytes):
+        now = datetime.now()
+        jpeg = _downscale(frame)
+        analysis = analyze_photo(
+            model, jpeg, f"{self.camera_name} {now.strftime('%Y-%m-%d %H:%M:%S')}",
+            self.project_name, self.location,
+            "This is a frame from a fixed site camera, not a handheld photo."
+        )
+        self.stats["analyses"] += 1
+        self.last_analysis = analysis
+        self.last_analyzed_at = now
+        self.last_analyzed_frame = jpeg
+
+        hazards = parse_hazards(analysis)
+        self._log(f"Analyzed frame: {len(hazards)} hazard(s)")
+
+        critical = [h for h in hazards if h["severity"] == "CRITICAL"]
+        for hazard in self._new_critical(critical):
+            alert = {
+                "camera": self.camera_name,
+                "project": self.project_name,
+                "location": self.location,
+                "time": now,
+                "hazard": hazard,
+                "frame": jpeg
+            }
+            self.alerts.append({k: v for k, v in alert.items() if k != "frame"})
+            self.stats["alerts"] += 1
+            self._log(f"🚨 CRITICAL: {hazard['description'][:80]}")
+            for handler in self.alert_handlers:
+                try:
+                    handler(alert)
+                except Exception as e:
+                    self._log(f"Alert delivery failed: {e}")
+
+    def _new_critical(self, hazards: List[Dict]) -> List[Dict]:
+        """CRITICAL hazards not already alerted within the cooldown"""
+        now = time.monotonic()
+        cooldown = self.settings["alert_cooldown"]
+        self._active_alerts = [a for a in self._active_alerts if now - a["at"] < cooldown]
+
+        fresh = []
+        for hazard in hazards:
+            known = next((a for a in self._active_alerts if hazard_similarity(a["hazard"], hazard) >= 0.5), None)
+            if known:
+                known["at"] = now  # Still present: extend the quiet period
+            else:
+                self._active_alerts.append({"hazard": hazard, "at": now})
+                fresh.append(hazard)
+        return fresh
+
+
+def webhook_alert_handler(url: str) -> Callable[[Dict], None]:
+    """Alert handler that POSTs alerts as JSON (e.g. to a chat webhook)"""
+    def send(alert: Dict):
+        hazard = alert["hazard"]
+        payload = {
+            "text": (
+                f"🚨 CRITICAL safety hazard on {alert['camera']} "
+                f"({alert['project']} - {alert['location'] or 'site camera'}): "
+                f"{hazard['description']} | Action: {hazard.get('action') or 'Investigate immediately'}"
+            )
+        }
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(request, timeout=10).close()
+    return send
+
+
+# ==================== MONITOR REGISTRY ====================
+
+_monitors: Dict[str, CameraMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def start_monitor(
+    camera_name: str,
+    source: str,
+    project_name: str,
+    location: str,
+    settings: Dict = None,
+    alert_handlers: List[Callable[[Dict], None]] = None
+) -> str:
+    """
+    Start monitoring a camera (or return the running monitor for that source)
+
+    Returns:
+        Monitor ID for get_monitor()
+    """
+    with _monitors_lock:
+        for monitor in _monitors.values():
+            if monitor.source == source and monitor.running:
+                return monitor.id
+        # Forget stopped monitors so the registry stays bounded
+        for monitor_id, monitor in list(_monitors.items()):
+            if not monitor.running:
+                del _monitors[monitor_id]
+
+        monitor = CameraMonitor(camera_name, source, project_name, location, settings, alert_handlers)
+        _monitors[monitor.id] = monitor
+
+    env_webhook = os.getenv("SAFETY_ALERT_WEBHOOK")
+    if env_webhook:
+        monitor.alert_handlers.append(webhook_alert_handler(env_webhook))
+    monitor.start()
+    return monitor.id
+
+
+def get_monitor(monitor_id: Optional[str]) -> Optional[CameraMonitor]:
+    if not monitor_id:
+        return None
+    with _monitors_lock:
+        return _monitors.get(monitor_id)
+
+
+def list_monitors() -> List[CameraMonitor]:
+    with _monitors_lock:
+        return sorted(_monitors.values(), key=lambda m: m.started_at, reverse=True)
+
+
+def stop_monitor(monitor_id: str):
+    monitor = get_monitor(monitor_id)
+    if monitor:
+        monitor.stop()
+
+
+# ==================== TEST STREAM ====================
+
+def serve_test_stream(source: str, port: int = 8090, fps: float = 5.0):
+    """Serve a frames folder or .mjpg file as a looping HTTP MJPEG camera"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StreamHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+            self.end_headers()
+            stop = threading.Event()
+            try:
+                for frame in open_frame_source(source, stop, fps):
+                    self.wfile.write(
+                        b"--frame\r\nContent-Type: image/jpeg\r\n"
+                        + f"Content-Length: {len(frame)}\r\n\r\n".encode() + frame + b"\r\n"
+                    )
+            except (BrokenPipeError, ConnectionResetError):
+                stop.set()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StreamHandler)
+    print(f"Serving {source} at http://127.0.0.1:{port}/stream.mjpg (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local MJPEG test camera for the safety monitor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Serve frames as an HTTP MJPEG stream")
+    serve.add_argument("source", help="Folder of JPEG/PNG frames or an .mjpg file")
+    serve.add_argument("--port", type=int, default=8090)
+    serve.add_argument("--fps", type=float, default=5.0)
+    args = parser.parse_args()
+    serve_test_stream(args.source, args.port, args.fps)
@@ -1,22 +1,15 @@
 import streamlit as st
-import google.generativeai as genai
-import os
-from datetime import datetime
+from modules import transcript_store
 from modules.hubspot_integration import hubspot, show_hubspot_status
+from modules.assistant_session import AssistantSession
+from modules.answer_cache import get_answer_cache
+from modules.followup_prefetch import get_prefetch_stats
+from modules.intent_router import get_routing_log
 
-def show_client_assistant():
-    st.markdown("<h1 class='main-header'>💬 Smart Client Communication Assistant</h1>", unsafe_allow_html=True)
-    st.markdown("<p class='sub-header'>24/7 AI-powered client support and lead qualification</p>", unsafe_allow_html=True)
+# Messages rendered per page; earlier ones load on request
+CHAT_PAGE_SIZE = 20
 
-    st.markdown("---")
-
-    # Initialize session state for chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-        # Add welcome message
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": """Hello! 👋 Welcome to SE Builders.
+WELCOME_MESSAGE = """Hello! 👋 Welcome to SE Builders.
 
 I'm your AI assistant, here to help answer questions about our healthcare construction services.
 
@@ -29,98 +22,80 @@ I can help you with:
 • General construction questions
 
 How can I assist you today?"""
-        })
-
-    # SE Builders knowledge base for the AI
-    se_builders_context = """
-You are an AI assistant for SE Builders, a premier commercial construction company specializing in healthcare facilities in Southern California.
-
-COMPANY INFORMATION:
-- Company: SE Builders Inc.
-- Specialty: Healthcare construction (hospitals, surgery centers, medical offices, urgent care, imaging centers)
-- Service Area: Southern California (Orange County, Los Angeles, San Diego, Riverside, San Bernardino, Ventura)
-- Experience: 15+ years in healthcare construction
-- Team: 64+ skilled professionals
-- Active Projects: 12 concurrent projects
-
-SERVICES OFFERED:
-1. Healthcare Facility Construction
-   - Hospitals and hospital additions
-   - Outpatient surgery centers
-   - Medical office buildings
-   - Urgent care facilities
-   - Imaging centers (MRI, CT, X-ray)
-   - Dental offices
-   - Laboratories
-   - Rehabilitation centers
-
-2. Specialized Healthcare Systems:
-   - OSHPD compliance (seismic requirements)
-   - Medical gas systems (oxygen, nitrogen, medical air)
-   - HVAC with HEPA filtration
-   - Emergency power systems
-   - Clean rooms and sterile environments
-   - Lead-lined walls for imaging
-   - Infection control measures
-
-3. Project Phases:
-   - Pre-construction and planning
-   - Design-build services
-   - Permitting and regulatory compliance
-   - Construction and project management
-   - Quality control and inspections
-   - Post-construction support
-
-TYPICAL PROJECT TIMELINES:
-- Medical Office (10,000-20,000 sq ft): 12-18 months
-- Surgery Center (15,000-30,000 sq ft): 18-24 months
-- Small Hospital Addition: 24-36 months
-
-TYPICAL INVESTMENT RANGES:
-- Medical Office: $250-350 per sq ft
-- Surgery Center: $350-500 per sq ft
-- Hospital: $500-800+ per sq ft
-(Note: These are estimates; actual costs vary based on specifications)
-
-RECENT PROJECTS (Examples):
-1. Irvine Surgery Center - 25,000 sq ft, 6 operating suites, completed 2024
-2. Orange County Medical Office - 18,000 sq ft, 20 exam rooms
-3. Newport Beach Imaging Center - 12,000 sq ft, MRI and CT suites
-
-COMPANY VALUES:
-- Innovation through technology
-- Quality craftsmanship
-- Safety-first culture
-- Client collaboration
-- Community impact
-- Sustainable building practices
-
-TAGLINE: "Building spaces where care and community can thrive"
-
-CONVERSATION GUIDELINES:
-1. Be professional, friendly, and helpful
-2. Ask clarifying questions to understand client needs
-3. Provide accurate information based on the context above
-4. For specific pricing, encourage scheduling a consultation
-5. Highlight SE Builders' healthcare expertise
-6. If you don't know something, say so and offer to connect them with the team
-7. When appropriate, ask if they'd like to:
-   - Schedule a consultation
-   - See examples of similar projects
-   - Get a preliminary cost estimate
-   - Receive more information via email
-
-ESCALATION TRIGGERS (suggest human contact):
-- Client requests specific detailed pricing
-- Complex regulatory questions beyond general info
-- Legal or contract discussions
-- Project budget exceeds typical ranges significantly
-- Client expresses frustration
-- RFP or formal proposal requested
-- Timeline is urgent (less than 6 months)
-
-Remember: You represent SE Builders. Be knowledgeable, professional, and helpful while building trust with potential clients.
-"""
+
+
+def stream_to_placeholder(chunks, placeholder) -> str:
+    """
+    Render streamed reply text chunk by chunk
+
+    Args:
+        chunks: Iterator of text pieces, e.g. AssistantSession.stream()
+        placeholder: st.empty() slot inside the assistant chat bubble
+
+    Returns:
+        The full response text
+    """
+    text = ""
+    for piece in chunks:
+        text += piece
+        placeholder.markdown(text + "▌")
+
+    placeholder.markdown(text)
+    return text
+
+
+def get_chat_token() -> str:
+    """This visitor's conversation token, kept in the URL so the chat survives a refresh"""
+    if "chat_token" not in st.session_state:
+        token = st.query_params.get("chat")
+        if not transcript_store.is_valid_token(token):
+            token = transcript_store.new_token()
+        conversation = transcript_store.get_conversation(token)
+        st.session_state.chat_token = token
+        st.session_state.chat_count = conversation["message_count"] if conversation else 0
+        st.session_state.chat_visible = CHAT_PAGE_SIZE
+        transcript_store.purge_expired()
+
+    if st.query_params.get("chat") != st.session_state.chat_token:
+        st.query_params["chat"] = st.session_state.chat_token
+    return st.session_state.chat_token
+
+
+def get_assistant_session() -> AssistantSession:
+    """This visitor's chat session, rebuilt from the stored transcript if needed"""
+    if "assistant_session" not in st.session_state:
+        token = get_chat_token()
+        conversation = transcript_store.get_conversation(token)
+        if conversation:
+            session = AssistantSession(history=transcript_store.load_messages(token))
+            session.memory.restore(
+                conversation["summary"], min(conversation["summarized_upto"], len(session.history))
+            )
+        else:
+            session = AssistantSession()
+        st.session_state.assistant_session = session
+    return st.session_state.assistant_session
+
+
+def save_exchange(prompt: str, response: str):
+    """Persist a question and its reply, with the session's running summary"""
+    token = get_chat_token()
+    st.session_state.chat_count = transcript_store.append_messages(token, [
+        {"role": "user", "content": prompt},
+        {"role": "assistant", "content": response}
+    ])
+    memory = get_assistant_session().memory
+    transcript_store.save_summary(token, memory.summary, memory.summarized_upto)
+
+
+def show_client_assistant():
+    st.markdown("<h1 class='main-header'>💬 Smart Client Communication Assistant</h1>", unsafe_allow_html=True)
+    st.markdown("<p class='sub-header'>24/7 AI-powered client support and lead qualification</p>", unsafe_allow_html=True)
+
+    st.markdown("---")
+
+    # Conversation token from the URL; the transcript itself stays in the store
+    token = get_chat_token()
 
     # Two columns layout
     col1, col2 = st.columns([2, 1])
@@ -132,59 +107,71 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
         # Create a container for chat messages
         chat_container = st.container()
 
-        # Display all messages in the container
+        # Display the latest page of messages; rerun cost stays flat however long the chat gets
         with chat_container:
-            for message in st.session_state.messages:
+            count = st.session_state.chat_count
+            start = max(count - st.session_state.chat_visible, 0)
+            if start:
+                if st.button(f"⬆️ Load earlier messages ({start} more)", key="load_earlier_messages", use_container_width=True):
+                    st.session_state.chat_visible += CHAT_PAGE_SIZE
+                    st.rerun()
+            else:
+                with st.chat_message("assistant"):
+                    st.markdown(WELCOME_MESSAGE)
+
+            for message in transcript_store.load_messages(token, start, count):
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
 
-        # Chat input at the bottom
-        if prompt := st.chat_input("Type your message here..."):
-            # Add user message
-            st.session_state.messages.append({"role": "user", "content": prompt})
-
-            # Generate AI response
-            try:
-                # Configure AI
-                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-                model = genai.GenerativeModel(model_name="gemini-2.0-flash-exp")
-
-                # Build conversation history
-                conversation = se_builders_context + "\n\nCONVERSATION HISTORY:\n"
-                for msg in st.session_state.messages[-6:]:  # Last 6 messages for context
-                    conversation += f"{msg['role'].upper()}: {msg['content']}\n"
-
-                conversation += f"\nUSER: {prompt}\n\nASSISTANT:"
-
-                # Generate response
-                response = model.generate_content(conversation)
-                assistant_response = response.text
-
-                # Add to chat history
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": assistant_response
-                })
-
-                # Rerun to display new messages
-                st.rerun()
-
-            except Exception as e:
-                error_msg = f"I apologize, but I encountered an error. Please try again or contact our team directly at info@sebuilders.com"
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": error_msg
-                })
-                st.rerun()
+        # Chat input at the bottom; Common Questions buttons queue their question
+        prompt = st.chat_input("Type your message here...") or st.session_state.pop("pending_question", None)
+        if prompt:
+            session = get_assistant_session()
+
+            with chat_container:
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+
+                # Stream the AI response into the assistant bubble as it is generated
+                with st.chat_message("assistant"):
+                    placeholder = st.empty()
+                    placeholder.markdown("▌")
+
+                    try:
+                        # Only the new message is added; the session holds context and history
+                        assistant_response = stream_to_placeholder(session.stream(prompt), placeholder)
+
+                    except Exception:
+                        # The session dropped the failed exchange, so the transcript must not keep it either
+                        assistant_response = None
+                        placeholder.markdown("I apologize, but I encountered an error. Please try again or contact our team directly at info@sebuilders.com")
+
+            # Save the exchange so the visitor can resume after a refresh
+            if assistant_response is not None:
+                save_exchange(prompt, assistant_response)
+
+        # Likely next questions; the top ones are already being answered in the background
+        session = st.session_state.get("assistant_session")
+        if session is not None and session.suggestions:
+            st.caption("💡 Suggested follow-ups")
+            columns = st.columns(len(session.suggestions))
+            for column, suggestion in zip(columns, session.suggestions):
+                with column:
+                    if st.button(suggestion, key=f"followup_{suggestion}", use_container_width=True):
+                        st.session_state.pending_question = suggestion
+                        st.rerun()
 
         # HubSpot integration section
-        if hubspot.is_enabled() and len(st.session_state.messages) > 2:
+        if hubspot.is_enabled() and st.session_state.chat_count >= 2:
             st.markdown("---")
             st.subheader("💾 Save to HubSpot CRM")
 
             with st.form("hubspot_save_form"):
+                lead = get_assistant_session().lead
+
                 contact_email = st.text_input(
                     "Client Email",
+                    value=lead.profile["email"] or "",
                     placeholder="client@example.com",
                     help="Enter client's email to save this conversation to HubSpot"
                 )
@@ -196,6 +183,7 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
                 phone = st.text_input(
                     "Phone (Optional)",
+                    value=lead.profile["phone"] or "",
                     placeholder="(555) 123-4567"
                 )
 
@@ -208,42 +196,16 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
                 if submitted and contact_email:
                     with st.spinner("Saving to HubSpot..."):
-                        # Parse name
-                        firstname, lastname = "", ""
-                        if contact_name:
-                            name_parts = contact_name.split()
-                            firstname = name_parts[0] if len(name_parts) > 0 else ""
-                            lastname = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-
-                        # Create conversation summary
-                        summary = f"AI chat conversation on {datetime.now().strftime('%Y-%m-%d')}"
-                        summary += f"\n\nMessages exchanged: {len(st.session_state.messages)}"
-
-                        # Extract topics from conversation
-                        user_messages = [m['content'] for m in st.session_state.messages if m['role'] == 'user']
-                        if user_messages:
-                            summary += f"\n\nTopics discussed: {', '.join(user_messages[:3])[:200]}..."
-
-                        # Log to HubSpot
-                        success = hubspot.log_chat_conversation(
+                        success = hubspot.log_assistant_lead(
                             contact_email=contact_email,
-                            conversation_history=st.session_state.messages,
-                            conversation_summary=summary
+                            conversation_history=transcript_store.load_messages(token),
+                            lead=lead,
+                            name=contact_name,
+                            phone=phone,
+                            company=company
                         )
 
                         if success:
-                            # Update contact with additional info
-                            hubspot.create_or_update_contact(
-                                email=contact_email,
-                                firstname=firstname,
-                                lastname=lastname,
-                                phone=phone,
-                                company=company,
-                                additional_properties={
-                                    "lead_source": "AI Chat Assistant",
-                                    "ai_conversation_date": datetime.now().strftime("%Y-%m-%d")
-                                }
-                            )
                             st.success("✅ Conversation saved to HubSpot!")
                             st.balloons()
                         else:
@@ -253,7 +215,13 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
         # Clear chat button
         if st.button("🗑️ Clear Conversation", use_container_width=True):
-            st.session_state.messages = []
+            transcript_store.delete_conversation(token)
+            if "assistant_session" in st.session_state:
+                st.session_state.assistant_session.cancel_prefetch()
+            for key in ("chat_token", "chat_count", "chat_visible", "assistant_session"):
+                st.session_state.pop(key, None)
+            # Start over with a new token rather than reusing the old link
+            del st.query_params["chat"]
             st.rerun()
 
     with col2:
@@ -279,10 +247,40 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
         st.markdown("---")
 
+        # Lead profile, updated locally from every client message
+        lead = get_assistant_session().lead
+        st.subheader("🎯 Lead Profile")
+        st.metric("Lead Score", f"{lead.score}/100", lead.grade, delta_color="off")
+        for label in lead.escalation_labels():
+            st.warning(f"🚨 Escalate: {label}")
+        facts = [line for line in lead.summary().splitlines()[1:] if not line.startswith("Escalation:")]
+        if facts:
+            st.caption("\n\n".join(facts))
+
+        st.markdown("---")
+
         # Chat statistics
         st.subheader("💡 Chat Stats")
-        st.metric("Messages", len(st.session_state.messages))
-        st.metric("Your Messages", len([m for m in st.session_state.messages if m["role"] == "user"]))
+        st.metric("Messages", st.session_state.chat_count + 1)
+        st.metric("Your Messages", lead.messages)
+
+        cache_stats = get_answer_cache().stats()
+        st.metric("Instant Answer Rate", f"{cache_stats['hit_rate']:.0%}")
+        st.caption(f"{cache_stats['hits']} of {cache_stats['lookups']} questions answered from cache")
+
+        prefetch_stats = get_prefetch_stats().stats()
+        st.metric("Prefetch Hit Rate", f"{prefetch_stats['hit_rate']:.0%}")
+        st.caption(
+            f"{prefetch_stats['used']} of {prefetch_stats['ready']} answers prepared ahead were used, "
+            f"{prefetch_stats['cancelled']} cancelled"
+        )
+
+        routing = get_routing_log().stats()
+        if routing:
+            with st.expander("🧭 Model Routing"):
+                for row in routing:
+                    latency = f"p50 {row['p50_ms']:,.0f} ms · p95 {row['p95_ms']:,.0f} ms" if row["p50_ms"] is not None else "no replies"
+                    st.markdown(f"**{row['tier'].title()}** · {row['messages']} ({row['share']:.0%})  \n{latency}")
 
         st.markdown("---")
 
@@ -300,8 +298,8 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
         for question in common_questions:
             if st.button(f"❓ {question}", key=question, use_container_width=True):
-                # Add question to chat
-                st.session_state.messages.append({"role": "user", "content": question})
+                # Answer it through the chat like a typed message
+                st.session_state.pending_question = question
                 st.rerun()
 
     # Info section
@@ -315,7 +313,7 @@ Remember: You represent SE Builders. Be knowledgeable, professional, and helpful
 
     **For complex inquiries,** the AI will recommend connecting with a human team member.
 
-    **Privacy:** Conversations are not stored permanently and are used only for immediate assistance.
+    **Privacy:** Conversations are kept for 30 days so you can pick up where you left off, and are used only to assist you.
     """)
 
     # Live metrics (mock data)
@@ -0,0 +1,196 @@
+"""
+Token-Budgeted Conversation Memory
+
+Keeps the client assistant prompt bounded however long a conversation runs
+without forgetting what the client told us early on:
+
+- Recent turns are sent verbatim, newest first, until the token budget for
+  history is spent; any single very long message is cut to a per-turn cap
+- Turns that fall out of that window are folded into a running summary by
+  a separate model call, which is told to keep every lead-qualifying fact
+  (facility type, size, location, budget, timeline, contacts)
+- The summary is updated in a background thread after each reply, so the
+  client never waits for it; a prompt only waits (briefly) if turns have
+  left the window and their summary is still being written
+
+Token counts are estimated locally (about four characters per token) so
+budgeting never costs an API call.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Token budget for verbatim history sent with each message
+HISTORY_TOKEN_BUDGET = 1500
+
+# Longest single turn in the prompt; longer messages keep their start and end
+MAX_TURN_TOKENS = 500
+
+# Length limit for the running summary
+SUMMARY_TOKEN_BUDGET = 350
+
+# The summary runs ahead of the window: turns are summarized once they fall
+# outside this share of the budget, so they are usually already covered by
+# the time they are dropped
+SUMMARY_LEAD = 0.6
+
+# How long a prompt waits for a pending summary of turns outside the window
+SUMMARY_WAIT_SECONDS = 8.0
+
+# Background summary calls in flight across all conversations; they are I/O
+# bound, and too few make busy conversations wait on each other's summaries
+SUMMARY_WORKERS = 16
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a website chat between a prospective client and the SE Builders AI assistant.
+
+Update the summary with the new conversation turns. Always keep every lead-qualifying fact the client has stated:
+- Name, company, role and contact details
+- Facility type, size (sq ft, rooms, suites) and location
+- Budget and timeline
+- Project stage, decision makers and any RFP or consultation requests
+- Requirements, concerns and open questions
+
+Drop greetings and the general company information the assistant gave. Write terse bullet points and never exceed {words} words."""
+
+_SUMMARY_POOL = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="chat-summary")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a long text to roughly max_tokens, keeping its start and end"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens * 4
+    head = text[:budget * 2 // 3].rstrip()
+    tail = text[-(budget // 3):].lstrip()
+    return f"{head}\n[...]\n{tail}"
+
+
+def _turn_text(turn: Dict) -> str:
+    return "\n".join(str(part) for part in turn["parts"])
+
+
+class ConversationMemory:
+    """Verbatim recent turns plus a background-updated summary of older ones"""
+
+    def __init__(
+        self,
+        model_factory: Callable[[str], object],
+        history_tokens: int = HISTORY_TOKEN_BUDGET,
+        turn_tokens: int = MAX_TURN_TOKENS,
+        summary_tokens: int = SUMMARY_TOKEN_BUDGET
+    ):
+        self.model_factory = model_factory
+        self.history_tokens = history_tokens
+        self.turn_tokens = turn_tokens
+        self.summary_tokens = summary_tokens
+
+        self.summary = ""
+        # History turns before this index are covered by the summary
+        self.summarized_upto = 0
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._pending: Optional[Future] = None
+
+    def restore(self, summary: str, summarized_upto: int):
+        """Resume from a summary saved earlier for the same history"""
+        with self._lock:
+            self.summary = summary
+            self.summarized_upto = summarized_upto
+
+    def window_start(self, history: List[Dict], budget: Optional[int] = None) -> int:
+        """Index of the oldest turn that still fits the history budget"""
+        budget = self.history_tokens if budget is None else budget
+        used = 0
+        start = len(history)
+        while start > 0:
+            tokens = min(estimate_tokens(_turn_text(history[start - 1])), self.turn_tokens)
+            if used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+
+        # Chat history sent to the model must start with a user turn
+        while start < len(history) and history[start]["role"] != "user":
+            start += 1
+        return start
+
+    def build(self, history: List[Dict]) -> Tuple[str, List[Dict]]:
+        """
+        Summary and recent turns to send with the next message
+
+        Args:
+            history: Full chat history in Gemini content format
+
+        Returns:
+            Tuple of (summary text, recent turns with long turns truncated)
+        """
+        start = self.window_start(history)
+        deadline = time.monotonic() + SUMMARY_WAIT_SECONDS
+        # Turns left the window before their summary was written; a summary
+        # already in flight may cover only part of them, hence the loop
+        while start > self.summarized_upto and time.monotonic() < deadline:
+            self.update_async(history)
+            try:
+                if not self._pending.result(timeout=max(deadline - time.monotonic(), 0)):
+                    break  # Summary failed; send without the missing turns
+            except Exception:
+                break  # Too slow; send without the missing turns rather than block the reply
+
+        recent = [
+            {"role": turn["role"], "parts": [truncate_to_tokens(_turn_text(turn), self.turn_tokens)]}
+            for turn in history[start:]
+        ]
+        with self._lock:
+            return self.summary, recent
+
+    def update_async(self, history: List[Dict]):
+        """Summarize turns that are about to leave the window, in the background"""
+        start = self.window_start(history, int(self.history_tokens * SUMMARY_LEAD))
+        with self._lock:
+            if start <= self.summarized_upto or (self._pending and not self._pending.done()):
+                return
+            self._pending = _SUMMARY_POOL.submit(self._summarize, list(history), start)
+
+    def _summarize(self, history: List[Dict], start: int) -> bool:
+        """Fold history[summarized_upto:start] into the summary; False on failure"""
+        with self._lock:
+            summary, upto = self.summary, self.summarized_upto
+        turns = history[upto:start]
+        if not turns:
+            return True
+
+        transcript = "\n\n".join(
+            f"{'Client' if turn['role'] == 'user' else 'Assistant'}: "
+            f"{truncate_to_tokens(_turn_text(turn), self.turn_tokens)}"
+            for turn in turns
+        )
+        prompt = (
+            f"CURRENT SUMMARY:\n{summary or '(none yet)'}\n\n"
+            f"NEW CONVERSATION TURNS:\n{transcript}\n\n"
+            "Return only the updated summary."
+        )
+
+        try:
+            if self._model is None:
+                self._model = self.model_factory(
+                    SUMMARY_INSTRUCTIONS.format(words=int(self.summary_tokens * 0.75))
+                )
+            text = self._model.generate_content(prompt).text.strip()
+        except Exception:
+            return False  # Keep the previous summary; retried after the next reply
+
+        with self._lock:
+            # Only move forward; a newer summary may have landed meanwhile
+            if start > self.summarized_upto:
+                self.summary = text[:self.summary_tokens * 4]
+                self.summarized_upto = start
+        return True
@@ -0,0 +1,199 @@
+"""
+Ensemble Voting Safety Analysis
+
+A single model pass per photo gives noisy severities, and one spurious
+CRITICAL is enough to open a HubSpot task. Ensemble mode runs several
+passes of the same photo concurrently, each with a different temperature
+and inspection focus, then groups matching hazards across passes. The
+share of passes that reported a hazard is its confidence; only hazards at
+or above the confidence threshold are escalated, and each confirmed
+hazard takes the median severity of the passes that reported it.
+
+Confidence is measured over the passes that succeeded. If too few passes
+succeed to reach the threshold at all, the photo fails rather than being
+reported as clear.
+
+Passes run in parallel, so wall-clock time stays close to a single pass.
+"""
+
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from PIL import Image
+
+from modules.safety_analysis import (
+    SEVERITY_ORDER,
+    build_safety_prompt,
+    format_hazards,
+    hazard_similarity,
+    image_to_part,
+    parse_hazards,
+)
+
+
+# (temperature, inspection focus) per pass; passes beyond the list reuse it in order
+ENSEMBLE_VARIANTS = [
+    (0.2, ""),
+    (0.7, "Inspect the photo systematically from foreground to background before answering."),
+    (0.5, "Only rate a hazard CRITICAL if it could cause death or serious injury right now; "
+          "otherwise use MODERATE or MINOR."),
+    (0.9, "Look at each worker individually for PPE and fall protection, then at the work area."),
+    (0.4, "Pay particular attention to electrical, housekeeping and healthcare-specific hazards."),
+]
+
+DEFAULT_PASSES = 3
+MAX_PASSES = len(ENSEMBLE_VARIANTS)
+
+# Share of passes that must report a hazard before it is escalated
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# Shown instead of the "no hazards" text when only unconfirmed findings remain
+UNCONFIRMED_ONLY = (
+    "⚠️ NO CONFIRMED HAZARDS - {count} possible finding(s) were reported by too few passes. "
+    "Review the photo before treating this area as compliant."
+)
+
+# Hazards from different passes with at least this description similarity
+# are treated as the same finding
+VOTE_SIMILARITY = 0.4
+
+_SEVERITY_BY_RANK = {rank: severity for severity, rank in SEVERITY_ORDER.items()}
+
+
+def merge_ensemble_hazards(pass_hazards: List[List[Dict]]) -> List[Dict]:
+    """
+    Group hazards reported by several passes and score their agreement
+
+    Each pass can vote for a group at most once. Groups are matched by
+    description similarity, best match first.
+
+    Args:
+        pass_hazards: Parsed hazards per pass
+
+    Returns:
+        Hazards with "confidence" (0-1), "votes", "passes" and
+        "severity_votes", sorted by confidence then severity
+    """
+    passes = len(pass_hazards)
+    groups: List[Dict] = []
+
+    for pass_number, hazards in enumerate(pass_hazards):
+        claimed = set()
+        for hazard in hazards:
+            best, best_score = None, VOTE_SIMILARITY
+            for index, group in enumerate(groups):
+                if index in claimed or pass_number in group["voters"]:
+                    continue
+                score = max(hazard_similarity(hazard, member) for member in group["members"])
+                if score >= best_score:
+                    best, best_score = index, score
+
+            if best is None:
+                groups.append({"members": [hazard], "voters": {pass_number}})
+                claimed.add(len(groups) - 1)
+            else:
+                groups[best]["members"].append(hazard)
+                groups[best]["voters"].add(pass_number)
+                claimed.add(best)
+
+    merged = []
+    for group in groups:
+        members = group["members"]
+        ranks = sorted(SEVERITY_ORDER[m["severity"]] for m in members)
+        # Lower median: a single outlier pass can't push a hazard to CRITICAL
+        severity = _SEVERITY_BY_RANK[ranks[(len(ranks) - 1) // 2]]
+
+        hazard = {"severity": severity}
+        for field in ("description", "osha_reference", "action"):
+            hazard[field] = max((m.get(field, "") for m in members), key=len)
+
+        hazard["votes"] = len(group["voters"])
+        hazard["passes"] = passes
+        hazard["confidence"] = round(len(group["voters"]) / passes, 2) if passes else 0.0
+        hazard["severity_votes"] = {
+            level: sum(1 for m in members if m["severity"] == level)
+            for level in SEVERITY_ORDER if any(m["severity"] == level for m in members)
+        }
+        merged.append(hazard)
+
+    merged.sort(key=lambda h: (h["confidence"], SEVERITY_ORDER[h["severity"]]), reverse=True)
+    return merged
+
+
+def analyze_photo_ensemble(
+    model,
+    image_bytes: bytes,
+    photo_name: str,
+    project_name: str,
+    location: str,
+    passes: int = DEFAULT_PASSES,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    extra_context: str = ""
+) -> Dict:
+    """
+    Run several analysis passes of one photo concurrently and vote
+
+    Args:
+        model: Gemini model from get_safety_model()
+        image_bytes: Raw uploaded image bytes
+        photo_name: File name of the photo
+        project_name: Project being inspected
+        location: Area of the site
+        passes: Number of concurrent passes
+        min_confidence: Share of passes needed to escalate a hazard
+        extra_context: Optional shared context added to every prompt
+
+    Returns:
+        Dict with "analysis" text and "hazards" for the confirmed hazards,
+        "unconfirmed" hazards below the threshold, and "passes" completed
+
+    Raises:
+        The first pass error if fewer passes succeeded than the threshold
+        needs (e.g. one of three at 0.6)
+    """
+    image_part = image_to_part(Image.open(io.BytesIO(image_bytes)))
+    variants = [ENSEMBLE_VARIANTS[i % len(ENSEMBLE_VARIANTS)] for i in range(passes)]
+
+    def run(variant):
+        temperature, focus = variant
+        context = "\n".join(part for part in (extra_context, focus) if part)
+        prompt = build_safety_prompt(project_name, location, photo_name, extra_context=context)
+        response = model.generate_content(
+            [image_part, prompt],
+            generation_config={"temperature": temperature}
+        )
+        return parse_hazards(response.text)
+
+    with ThreadPoolExecutor(max_workers=len(variants)) as pool:
+        futures = [pool.submit(run, variant) for variant in variants]
+
+    # Failed passes are left out of the vote; too few successes fail the photo
+    pass_hazards, errors = [], []
+    for future in futures:
+        try:
+            pass_hazards.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    required = max(1, math.ceil(round(min_confidence * passes, 6)))
+    if len(pass_hazards) < required:
+        raise RuntimeError(
+            f"Only {len(pass_hazards)} of {passes} analysis passes succeeded "
+            f"({required} needed): {errors[0]}"
+        )
+
+    hazards = merge_ensemble_hazards(pass_hazards)
+    confirmed = [h for h in hazards if h["confidence"] >= min_confidence]
+    unconfirmed = [h for h in hazards if h["confidence"] < min_confidence]
+
+    analysis = format_hazards(confirmed)
+    if not confirmed and unconfirmed:
+        analysis = UNCONFIRMED_ONLY.format(count=len(unconfirmed))
+
+    return {
+        "analysis": analysis,
+        "hazards": confirmed,
+        "unconfirmed": unconfirmed,
+        "passes": len(pass_hazards)
+    }
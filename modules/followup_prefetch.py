@@ -0,0 +1,203 @@
+"""
+Follow-Up Prediction and Speculative Prefetch
+
+After each assistant reply, visitors usually pick one of a few predictable
+next steps: schedule a consultation, see examples, get an estimate. The
+assistant suggests the likeliest ones (predicted locally from the lead
+profile, the reply and what was already asked) and answers the top ones in
+the background while the visitor reads, so clicking a suggestion is instant.
+
+Speculation is kept cheap and bounded:
+
+- Only PREFETCH_PER_TURN suggestions are answered ahead, at most
+  PREFETCH_PER_SESSION per conversation, and only ones that would need a
+  model call (templates are instant anyway)
+- All prefetches share a process-wide hourly token budget; each reserves its
+  largest possible prompt plus PREFETCH_MAX_OUTPUT_TOKENS (the output is
+  capped to that), so the budget can never be overrun
+- Anything else the visitor types cancels the pending prefetches: queued
+  ones never start and running ones stop reading the stream
+- An answer cut off by the output cap is discarded, so clicking its
+  suggestion generates the full answer live instead
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from modules.lead_qualification import LeadQualifier
+
+# Suggestions offered after each reply, and how many are answered ahead
+SUGGESTION_COUNT = 3
+PREFETCH_PER_TURN = 2
+PREFETCH_PER_SESSION = 8
+
+# Output cap for prefetched answers, reserved in full from the budget
+PREFETCH_MAX_OUTPUT_TOKENS = 700
+
+# Process-wide spend limit for speculative answers
+PREFETCH_TOKENS_PER_HOUR = 1_000_000
+
+# How long a clicked suggestion waits for its prefetch to finish
+PREFETCH_WAIT_SECONDS = 20.0
+
+PREFETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chat-prefetch")
+
+FOLLOW_UPS = {
+    "consultation": "Can we schedule a consultation?",
+    "examples": "Can I see examples of similar projects you've built?",
+    "estimate": "Can I get a preliminary cost estimate?",
+    "timeline": "How long would a project like this take?",
+    "oshpd": "Does my project need OSHPD review?",
+    "service_area": "Do you work in my area?",
+}
+
+# How likely each follow-up is before looking at the conversation
+_PRIORS = {
+    "consultation": 1.0,
+    "examples": 2.0,
+    "estimate": 1.5,
+    "timeline": 1.0,
+    "oshpd": 0.5,
+    "service_area": 0.5,
+}
+
+# Wording in the conversation that means a follow-up was already covered
+_ASKED = {
+    "consultation": re.compile(r"\b(?:consultation|meeting|meet|call me|schedule)\b"),
+    "examples": re.compile(r"\b(?:examples?|past projects?|portfolio|case stud(?:y|ies)|similar projects?)\b"),
+    "estimate": re.compile(r"\b(?:estimate|cost|price|pricing)\b"),
+    "timeline": re.compile(r"\b(?:how long|timeline|duration)\b"),
+    "oshpd": re.compile(r"\b(?:oshpd|hcai)\b"),
+    "service_area": re.compile(r"\b(?:service area|your area|where do you work|locations?)\b"),
+}
+
+# Reply wording that makes a follow-up the natural next question
+_REPLY_HINTS = {
+    "consultation": re.compile(r"\bconsultation\b"),
+    "examples": re.compile(r"\b(?:projects?|built|completed)\b"),
+    "estimate": re.compile(r"\b(?:estimate|per square foot|cost)\b"),
+    "timeline": re.compile(r"\b(?:weeks|months|timeline)\b"),
+    "oshpd": re.compile(r"\b(?:oshpd|hcai)\b"),
+}
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def predict_followups(
+    lead: LeadQualifier,
+    user_messages: List[str],
+    reply: str,
+    count: int = SUGGESTION_COUNT
+) -> List[str]:
+    """
+    Likeliest next questions after a reply, most likely first
+
+    Args:
+        lead: Lead profile of the conversation
+        user_messages: Everything the visitor has asked so far
+        reply: The assistant reply just shown
+
+    Returns:
+        Follow-up questions from FOLLOW_UPS
+    """
+    profile = lead.profile
+    asked = "\n".join(user_messages).lower()
+    reply = reply.lower()
+
+    scores = {}
+    for key, prior in _PRIORS.items():
+        if _ASKED[key].search(asked):
+            continue
+        score = prior
+        hint = _REPLY_HINTS.get(key)
+        if hint and hint.search(reply):
+            score += 1.0
+        scores[key] = score
+
+    if "examples" in scores and profile["facility_type"]:
+        scores["examples"] += 2.0
+    if "timeline" in scores:
+        scores["timeline"] += 1.0 if profile["facility_type"] else 0.0
+        scores["timeline"] -= 3.0 if profile["timeline_months"] is not None else 0.0
+    if "estimate" in scores and (profile["square_feet"] or profile["budget"]):
+        scores["estimate"] += 2.0
+    if "consultation" in scores:
+        scores["consultation"] += {"Hot": 3.0, "Warm": 2.0}.get(lead.grade, 0.0)
+        scores["consultation"] += 3.0 if lead.flags else 0.0
+    if "service_area" in scores and profile["location"]:
+        scores["service_area"] -= 3.0
+
+    ranked = sorted(scores, key=lambda key: -scores[key])
+    return [FOLLOW_UPS[key] for key in ranked[:count] if scores[key] > 0]
+
+
+class PrefetchBudget:
+    """Rolling one-hour token budget shared by all prefetches"""
+
+    def __init__(self, tokens_per_hour: int = PREFETCH_TOKENS_PER_HOUR):
+        self.tokens_per_hour = tokens_per_hour
+        self._spent = deque()  # (time, tokens)
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> bool:
+        """Take tokens from the budget; False (nothing taken) if it would overrun"""
+        with self._lock:
+            cutoff = time.monotonic() - 3600
+            while self._spent and self._spent[0][0] < cutoff:
+                self._spent.popleft()
+            if sum(spent for _, spent in self._spent) + tokens > self.tokens_per_hour:
+                return False
+            self._spent.append((time.monotonic(), tokens))
+            return True
+
+    def remaining(self) -> int:
+        with self._lock:
+            cutoff = time.monotonic() - 3600
+            return self.tokens_per_hour - sum(spent for at, spent in self._spent if at >= cutoff)
+
+
+class PrefetchStats:
+    """Process-wide prefetch counters for the chat stats panel"""
+
+    def __init__(self):
+        self._counts = {
+            "started": 0, "ready": 0, "used": 0, "cancelled": 0, "truncated": 0, "over_budget": 0, "tokens": 0
+        }
+        self._lock = threading.Lock()
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["hit_rate"] = counts["used"] / counts["ready"] if counts["ready"] else 0.0
+        return counts
+
+
+@lru_cache(maxsize=1)
+def get_prefetch_budget() -> PrefetchBudget:
+    """Process-wide prefetch budget"""
+    return PrefetchBudget()
+
+
+@lru_cache(maxsize=1)
+def get_prefetch_stats() -> PrefetchStats:
+    """Process-wide prefetch counters"""
+    return PrefetchStats()
+
+
+def wait_for(future, timeout: float = PREFETCH_WAIT_SECONDS) -> Optional[str]:
+    """Result of a prefetch, or None if it failed, was cancelled or is too slow"""
+    try:
+        return future.result(timeout=timeout)
+    except Exception:
+        return None
@@ -0,0 +1,208 @@
+"""
+Cross-Visit Hazard Diffing
+
+When a location is re-inspected, each hazard is matched against the previous
+scan of the same project/location to tell which hazards are new, which
+persist and which were resolved.
+
+Hazards are fingerprinted by normalized location + category and a MinHash
+signature over the description's word shingles. Signatures go into a banded
+LSH index, so each current hazard is only compared with the few previous
+hazards that share a band instead of every open hazard.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.safety_analysis import categorize_hazard, description_tokens
+
+NUM_PERMUTATIONS = 64
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Estimated Jaccard similarity needed to call two hazards the same finding
+MATCH_THRESHOLD = 0.35
+# Hazards filed under different categories need a clearly stronger match
+CROSS_CATEGORY_THRESHOLD = 0.6
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(1926)
+_A = _rng.integers(1, (1 << 31) - 1, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_location(location: str) -> str:
+    """Case/spacing-insensitive location key"""
+    return re.sub(r"[^a-z0-9]+", " ", (location or "").lower()).strip()
+
+
+def _shingles(description: str) -> List[str]:
+    """Content words plus adjacent word pairs of a description"""
+    content = description_tokens(description)
+    words = [w for w in re.findall(r"[a-z0-9]+", description.lower()) if w in content]
+    return sorted(set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])})
+
+
+def minhash_signature(description: str) -> np.ndarray:
+    """MinHash signature (uint32 array) of a description's shingles"""
+    shingles = _shingles(description)
+    if not shingles:
+        return np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    ) % _PRIME
+    # (a * h + b) mod p for every permutation x shingle, then min per permutation
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def fingerprint(hazard: Dict, location: str) -> Dict:
+    """
+    Fingerprint a hazard for cross-visit matching
+
+    Returns:
+        Dict with key ("location|category") and MinHash signature
+    """
+    category = hazard.get("category") or categorize_hazard(hazard["description"])
+    return {
+        "key": f"{normalize_location(location)}|{category}",
+        "category": category,
+        "signature": minhash_signature(hazard["description"])
+    }
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+
+class HazardIndex:
+    """Banded LSH index over hazard fingerprints"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._items: List[Tuple[Dict, Dict]] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, hazard: Dict, fp: Dict):
+        item_id = len(self._items)
+        self._items.append((hazard, fp))
+        self._matrix = None
+        bands = fp["signature"].reshape(BANDS, ROWS_PER_BAND)
+        for band, rows in enumerate(bands):
+            self._buckets[(band, rows.tobytes())].append(item_id)
+
+    def candidates(self, fp: Dict) -> List[Tuple[int, float]]:
+        """
+        Previous hazards that could match, with estimated similarity
+
+        Returns:
+            (item id, similarity) pairs above the match threshold, best first
+        """
+        seen = set()
+        bands = fp["signature"].reshape(BANDS, ROWS_PER_BAND)
+        for band, rows in enumerate(bands):
+            seen.update(self._buckets.get((band, rows.tobytes()), ()))
+        if not seen:
+            return []
+
+        if self._matrix is None:
+            self._matrix = np.stack([item_fp["signature"] for _, item_fp in self._items])
+
+        # Estimated Jaccard = share of agreeing MinHash rows, for all candidates at once
+        ids = np.fromiter(seen, dtype=np.int64, count=len(seen))
+        similarities = (self._matrix[ids] == fp["signature"]).mean(axis=1)
+
+        scored = []
+        for item_id, similarity in zip(ids.tolist(), similarities.tolist()):
+            same_key = self._items[item_id][1]["key"] == fp["key"]
+            if similarity >= (MATCH_THRESHOLD if same_key else CROSS_CATEGORY_THRESHOLD):
+                scored.append((item_id, similarity))
+
+        return sorted(scored, key=lambda pair: pair[1], reverse=True)
+
+    def hazard(self, item_id: int) -> Dict:
+        return self._items[item_id][0]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def diff_hazards(
+    previous: List[Dict],
+    current: List[Dict],
+    location: str
+) -> Dict:
+    """
+    Match current hazards against the previous visit's hazards
+
+    Each hazard may carry a precomputed "fingerprint"; otherwise one is
+    computed. Matching is one-to-one and greedy by similarity.
+
+    Args:
+        previous: Hazards from the previous scan of the same location
+        current: Hazards from the new scan
+        location: Location both scans cover
+
+    Returns:
+        Dict with "new" (current hazards), "persisting" (dicts with previous,
+        current and similarity) and "resolved" (previous hazards)
+    """
+    index = HazardIndex()
+    for hazard in previous:
+        index.add(hazard, hazard.get("fingerprint") or fingerprint(hazard, location))
+
+    pairs = []
+    for cur_id, hazard in enumerate(current):
+        fp = hazard.get("fingerprint") or fingerprint(hazard, location)
+        for prev_id, similarity in index.candidates(fp):
+            pairs.append((similarity, cur_id, prev_id))
+
+    matched_current, matched_previous = set(), set()
+    persisting = []
+    for similarity, cur_id, prev_id in sorted(pairs, reverse=True):
+        if cur_id in matched_current or prev_id in matched_previous:
+            continue
+        matched_current.add(cur_id)
+        matched_previous.add(prev_id)
+        persisting.append({
+            "previous": index.hazard(prev_id),
+            "current": current[cur_id],
+            "similarity": round(similarity, 2)
+        })
+
+    return {
+        "new": [h for i, h in enumerate(current) if i not in matched_current],
+        "persisting": persisting,
+        "resolved": [index.hazard(i) for i in range(len(index)) if i not in matched_previous]
+    }
+
+
+def format_diff_report(diff: Dict, location: str, previous_scanned_at: Optional[str]) -> str:
+    """Markdown summary of a visit-to-visit diff"""
+    since = f" since {previous_scanned_at[:10]}" if previous_scanned_at else ""
+    lines = [
+        f"**{(location or '').strip() or 'Not specified'}**{since}: "
+        f"🆕 {len(diff['new'])} new · 🔁 {len(diff['persisting'])} persisting · "
+        f"✅ {len(diff['resolved'])} resolved"
+    ]
+    if diff.get("unchecked"):
+        lines[0] += f" · ❔ {len(diff['unchecked'])} not re-checked (partial visit)"
+    for hazard in diff["new"]:
+        lines.append(f"- 🆕 {hazard['severity']}: {hazard['description']}")
+    for pair in diff["persisting"]:
+        lines.append(f"- 🔁 {pair['current']['severity']}: {pair['current']['description']}")
+    for hazard in diff["resolved"]:
+        lines.append(f"- ✅ ~~{hazard['description']}~~")
+    for hazard in diff.get("unchecked", []):
+        lines.append(f"- ❔ {hazard['severity']}: {hazard['description']}")
+    return "\n".join(lines)
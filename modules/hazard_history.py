@@ -0,0 +1,354 @@
+"""
+Hazard History Store
+
+Every completed safety scan is recorded in a local SQLite database, one row
+per scan and one row per hazard, so trends can be analyzed over time. The
+database lives in the platform data directory (HAZARD_HISTORY_DB overrides
+the path) and is safe to use from the Streamlit script thread, background
+scan workers and the bulk CLI at the same time.
+
+Each hazard row also keeps a fingerprint for cross-visit matching, the
+HubSpot task tracking it and whether it is still open, so a re-inspection
+of the same location can be diffed against the previous visit. Hazards are
+only resolved by a visit that re-analyzed the whole location; after a
+partial visit they stay unchecked until a later one covers them.
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.paths import DATA_DIR
+from modules.hazard_diff import (
+    diff_hazards, minhash_signature, normalize_location,
+    signature_from_bytes, signature_to_bytes
+)
+from modules.safety_analysis import categorize_hazard, parse_hazards
+
+HISTORY_DB_PATH = Path(os.getenv("HAZARD_HISTORY_DB", DATA_DIR / "hazard_history.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    location TEXT NOT NULL,
+    scanned_at TEXT NOT NULL,
+    photos INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hazards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_id TEXT NOT NULL REFERENCES scans(id),
+    project TEXT NOT NULL,
+    location TEXT NOT NULL,
+    photo TEXT NOT NULL,
+    scanned_at TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    osha_reference TEXT NOT NULL DEFAULT '',
+    action TEXT NOT NULL DEFAULT '',
+    fingerprint BLOB,
+    task_id TEXT,
+    status TEXT NOT NULL DEFAULT 'open'
+);
+CREATE INDEX IF NOT EXISTS idx_scans_project_location ON scans(project, location, scanned_at);
+CREATE INDEX IF NOT EXISTS idx_hazards_scan ON hazards(scan_id);
+CREATE INDEX IF NOT EXISTS idx_hazards_project_time ON hazards(project, scanned_at);
+"""
+
+# Columns added after the first release, created on older databases at connect
+_ADDED_COLUMNS = {
+    "hazards": {
+        "fingerprint": "BLOB",
+        "task_id": "TEXT",
+        "status": "TEXT NOT NULL DEFAULT 'open'"
+    },
+    "scans": {
+        "failed": "INTEGER NOT NULL DEFAULT 0"
+    }
+}
+
+# Hazard states
+OPEN = "open"
+PERSISTED = "persisted"  # Seen again on a later visit; the newer row carries it on
+RESOLVED = "resolved"
+UNCHECKED = "unchecked"  # Not seen on a partial visit; still open until a full visit checks it
+
+
+def connect() -> sqlite3.Connection:
+    """Open a connection to the history database, creating it if needed"""
+    HISTORY_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection):
+    """Add columns missing from databases created by older versions"""
+    for table, columns in _ADDED_COLUMNS.items():
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, definition in columns.items():
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError:
+                    pass  # Another connection added it first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hazards_task ON hazards(task_id)")
+
+
+def history_version() -> float:
+    """Modification time of the database, used as a cache key for analytics"""
+    try:
+        wal = HISTORY_DB_PATH.with_name(HISTORY_DB_PATH.name + "-wal")
+        return max(p.stat().st_mtime for p in (HISTORY_DB_PATH, wal) if p.exists())
+    except ValueError:
+        return 0.0
+
+
+def record_scan(
+    scan_id: str,
+    project_name: str,
+    location: str,
+    results: List[Dict],
+    scanned_at: datetime = None,
+    source: str = "scanner"
+) -> int:
+    """
+    Store a completed scan and its hazards
+
+    Recording the same scan_id twice replaces the earlier rows.
+
+    Args:
+        scan_id: Unique scan identifier (e.g. the background job ID)
+        project_name: Project inspected
+        location: Area of the site
+        results: Per-photo results with "file", "analysis" and optionally
+            pre-parsed "hazards"; failed photos are skipped
+        scanned_at: When the scan ran (defaults to now)
+        source: Where the scan came from (scanner, cli, ...)
+
+    Returns:
+        Number of hazards recorded
+    """
+    scanned_at = (scanned_at or datetime.now()).isoformat(timespec="seconds")
+    location = location or ""
+
+    rows = []
+    failed = 0
+    for result in results:
+        if result.get("error"):
+            failed += 1
+            continue
+        hazards = result.get("hazards")
+        if hazards is None:
+            hazards = parse_hazards(result["analysis"])
+        for hazard in hazards:
+            rows.append((
+                scan_id, project_name, location, result["file"], scanned_at,
+                hazard["severity"], categorize_hazard(hazard["description"]),
+                hazard["description"], hazard.get("osha_reference", ""), hazard.get("action", ""),
+                signature_to_bytes(minhash_signature(hazard["description"]))
+            ))
+
+    with closing(connect()) as conn, conn:
+        conn.execute("DELETE FROM hazards WHERE scan_id = ?", (scan_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO scans (id, project, location, scanned_at, photos, source, failed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (scan_id, project_name, location, scanned_at, len(results), source, failed)
+        )
+        conn.executemany(
+            "INSERT INTO hazards (scan_id, project, location, photo, scanned_at, severity, "
+            "category, description, osha_reference, action, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    return len(rows)
+
+
+def load_history(since: Optional[datetime] = None):
+    """
+    Load scans and hazards as pandas DataFrames
+
+    Args:
+        since: Only include scans at or after this time
+
+    Returns:
+        (scans, hazards) DataFrames with scanned_at parsed as datetimes
+    """
+    import pandas as pd
+
+    where, params = "", []
+    if since is not None:
+        where, params = " WHERE scanned_at >= ?", [since.isoformat(timespec="seconds")]
+
+    with closing(connect()) as conn:
+        scans = pd.read_sql_query(f"SELECT * FROM scans{where}", conn, params=params)
+        hazards = pd.read_sql_query(
+            "SELECT scan_id, project, location, photo, scanned_at, severity, category, "
+            f"description, osha_reference FROM hazards{where}",
+            conn, params=params
+        )
+
+    for frame in (scans, hazards):
+        frame["scanned_at"] = pd.to_datetime(frame["scanned_at"])
+
+    for column in ("project", "location", "severity", "category"):
+        if column in hazards:
+            hazards[column] = hazards[column].astype("category")
+
+    return scans, hazards
+
+
+# ==================== REPEAT VISITS ====================
+
+def previous_scan(scan_id: str, project_name: str, location: str) -> Optional[Dict]:
+    """
+    The most recent earlier scan of the same project and location
+
+    Locations are compared case- and punctuation-insensitively.
+
+    Returns:
+        Scan row as a dict, or None for a first visit
+    """
+    key = normalize_location(location)
+
+    with closing(connect()) as conn:
+        current = conn.execute("SELECT scanned_at FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        if current is None:
+            return None
+        rows = conn.execute(
+            "SELECT * FROM scans WHERE project = ? AND id != ? AND scanned_at <= ? "
+            "ORDER BY scanned_at DESC",
+            (project_name, scan_id, current["scanned_at"])
+        )
+        for row in rows:
+            if normalize_location(row["location"]) == key:
+                return dict(row)
+
+    return None
+
+
+_HAZARD_COLUMNS = (
+    "id, photo, location, severity, category, description, osha_reference, "
+    "action, fingerprint, task_id, status"
+)
+
+
+def _hazard_from_row(row: sqlite3.Row) -> Dict:
+    hazard = dict(row)
+    blob = hazard.pop("fingerprint")
+    if blob:
+        hazard["fingerprint"] = {
+            "key": f"{normalize_location(hazard['location'])}|{hazard['category']}",
+            "category": hazard["category"],
+            "signature": signature_from_bytes(blob)
+        }
+    return hazard
+
+
+def load_scan_hazards(scan_id: str) -> List[Dict]:
+    """Hazard rows of one scan, with decoded fingerprint signatures"""
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            f"SELECT {_HAZARD_COLUMNS} FROM hazards WHERE scan_id = ? ORDER BY id",
+            (scan_id,)
+        ).fetchall()
+    return [_hazard_from_row(row) for row in rows]
+
+
+def _unchecked_hazards(project_name: str, location: str, before: str) -> List[Dict]:
+    """Hazards of the location that earlier partial visits could not check"""
+    key = normalize_location(location)
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            f"SELECT {_HAZARD_COLUMNS} FROM hazards "
+            "WHERE project = ? AND status = ? AND scanned_at <= ? ORDER BY id",
+            (project_name, UNCHECKED, before)
+        ).fetchall()
+    return [_hazard_from_row(row) for row in rows if normalize_location(row["location"]) == key]
+
+
+def _analyzed_photos(scan: Dict) -> int:
+    return scan["photos"] - scan["failed"]
+
+
+def set_photo_task(scan_id: str, photo: str, task_id: str):
+    """Attach a HubSpot task to a photo's hazards that aren't tracked yet"""
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            "UPDATE hazards SET task_id = ? WHERE scan_id = ? AND photo = ? AND task_id IS NULL",
+            (task_id, scan_id, photo)
+        )
+
+
+def diff_with_previous_visit(scan_id: str, project_name: str, location: str) -> Optional[Dict]:
+    """
+    Diff a recorded scan against the previous visit to the same location
+
+    Persisting hazards inherit the HubSpot task of their earlier sighting.
+    Earlier hazards that were not seen again are only marked resolved when
+    this visit re-analyzed the whole location: no photo failed and at least
+    as many photos were analyzed as last time. Otherwise they are listed
+    as unchecked and compared again on the next visit. A task can be
+    closed once none of the hazards it tracks persist or stay unchecked.
+
+    Returns:
+        Dict with scan_id, location, previous_scan_id, previous_scanned_at,
+        the diff (new / persisting / resolved / unchecked), complete and
+        tasks_to_close, or None if this is the first visit
+    """
+    previous = previous_scan(scan_id, project_name, location)
+    if previous is None:
+        return None
+
+    with closing(connect()) as conn:
+        current = dict(conn.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone())
+    complete = current["failed"] == 0 and _analyzed_photos(current) >= _analyzed_photos(previous)
+
+    earlier = [h for h in load_scan_hazards(previous["id"]) if h["status"] == OPEN]
+    earlier += _unchecked_hazards(project_name, location, current["scanned_at"])
+    diff = diff_hazards(earlier, load_scan_hazards(scan_id), location)
+    diff["unchecked"] = []
+    if not complete:
+        diff["unchecked"], diff["resolved"] = diff["resolved"], []
+
+    carried = []
+    for pair in diff["persisting"]:
+        task_id = pair["previous"]["task_id"]
+        if task_id and not pair["current"]["task_id"]:
+            pair["current"]["task_id"] = task_id
+            carried.append((task_id, pair["current"]["id"]))
+    open_tasks = {pair["previous"]["task_id"] for pair in diff["persisting"]}
+    open_tasks |= {h["task_id"] for h in diff["unchecked"]}
+    tasks_to_close = sorted(
+        {h["task_id"] for h in diff["resolved"] if h["task_id"]} - open_tasks
+    )
+
+    with closing(connect()) as conn, conn:
+        conn.executemany("UPDATE hazards SET task_id = ? WHERE id = ?", carried)
+        conn.executemany(
+            "UPDATE hazards SET status = ? WHERE id = ?",
+            [(PERSISTED, pair["previous"]["id"]) for pair in diff["persisting"]] +
+            [(RESOLVED, h["id"]) for h in diff["resolved"]] +
+            [(UNCHECKED, h["id"]) for h in diff["unchecked"]]
+        )
+
+    return {
+        "scan_id": scan_id,
+        "location": location,
+        "previous_scan_id": previous["id"],
+        "previous_scanned_at": previous["scanned_at"],
+        "diff": diff,
+        "complete": complete,
+        "tasks_to_close": tasks_to_close
+    }
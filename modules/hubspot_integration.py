@@ -8,11 +8,20 @@ This module provides functions to integrate with HubSpot CRM:
 - Activity logging
 """
 
+import json
 import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from functools import lru_cache
+from typing import Callable, Optional, Dict, List
 import streamlit as st
 
+from modules.transcript_condenser import compress_transcript, condense_transcript
+
 try:
     from hubspot import HubSpot
     from hubspot.crm.contacts import SimplePublicObjectInput, ApiException
@@ -20,6 +29,110 @@ try:
 except ImportError:
     HUBSPOT_AVAILABLE = False
 
+# Largest number of records HubSpot accepts in one batch request
+BATCH_SIZE = 100
+
+# HubSpot-defined association types for associations sent with batch creates
+TASK_TO_CONTACT = 204
+NOTE_TO_CONTACT = 202
+DEAL_TO_CONTACT = 3
+
+# File manager folder for compressed chat transcripts attached to notes
+TRANSCRIPT_FOLDER = "/ai-chat-transcripts"
+
+
+# Contact IDs remembered per email; stale ones are also dropped on a 404
+CONTACT_CACHE_TTL_SECONDS = 6 * 3600
+CONTACT_CACHE_SIZE = 10_000
+
+
+def _batches(items: List, size: int = BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _is_not_found(error: Exception) -> bool:
+    return getattr(error, "status", None) == 404
+
+
+# 'Property "ai_lead_score" does not exist' inside HubSpot validation errors (quotes may be escaped)
+_MISSING_PROPERTY = re.compile(r'Property \\*"(\w+)\\*" does not exist')
+
+
+def _missing_properties(error: Exception) -> set:
+    """Custom properties a HubSpot error reports as not created in the portal"""
+    return set(_MISSING_PROPERTY.findall(str(getattr(error, "body", None) or error)))
+
+
+def _ids_by_trace_id(response, count: int) -> List[Optional[str]]:
+    # Batch results are not returned in input order, so each input carries its
+    # index as objectWriteTraceId and results are matched on that alone; an
+    # input without a matching result stays None rather than being guessed
+    ids = [None] * count
+    for result in json.loads(response.data).get("results", []):
+        trace_id = str(result.get("objectWriteTraceId", ""))
+        if trace_id.isdigit() and int(trace_id) < count:
+            ids[int(trace_id)] = result["id"]
+    return ids
+
+
+class ContactIdCache:
+    """Thread-safe LRU of email -> HubSpot contact ID with a TTL"""
+
+    def __init__(self, ttl_seconds: float = CONTACT_CACHE_TTL_SECONDS, max_entries: int = CONTACT_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # email -> (contact_id, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return email.strip().lower()
+
+    def get(self, email: str) -> Optional[str]:
+        key = self._key(email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, email: str, contact_id: str):
+        key = self._key(email)
+        with self._lock:
+            self._entries[key] = (contact_id, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(self._key(email), None)
+
+    def stats(self) -> Dict:
+        """Lookup counts and hit rate since the process started"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "lookups": lookups,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+@lru_cache(maxsize=1)
+def get_contact_cache() -> ContactIdCache:
+    """Process-wide contact ID cache shared by every HubSpotIntegration"""
+    return ContactIdCache()
+
 
 class HubSpotIntegration:
     """HubSpot CRM Integration for SE Builders"""
@@ -27,6 +140,11 @@ class HubSpotIntegration:
     def __init__(self):
         """Initialize HubSpot client"""
         self.api_key = os.getenv("HUBSPOT_API_KEY")
+        self.contact_cache = get_contact_cache()
+        # Custom contact properties the portal rejected; left out of later writes
+        self.missing_properties = set()
+        # Attach the full compressed transcript to chat notes (one extra upload per chat)
+        self.attach_transcripts = os.getenv("HUBSPOT_ATTACH_TRANSCRIPTS", "").lower() in ("1", "true", "yes")
 
         if not self.api_key:
             self.client = None
@@ -89,45 +207,196 @@ class HubSpotIntegration:
         # Remove empty values
         properties = {k: v for k, v in properties.items() if v}
 
-        try:
-            # Search for existing contact by email
-            search_results = self.client.crm.contacts.search_api.do_search(
-                public_object_search_request={
-                    "filter_groups": [{
-                        "filters": [{
-                            "propertyName": "email",
-                            "operator": "EQ",
-                            "value": email
-                        }]
-                    }]
-                }
+        for attempt in range(2):
+            try:
+                return self._upsert_contact(email, self._writable(properties))
+            except Exception as e:
+                if attempt == 0 and self._note_missing_properties(e):
+                    continue  # Save the standard fields without the missing custom ones
+                st.error(f"HubSpot contact error: {str(e)}")
+                return None
+
+    def _writable(self, properties: Dict) -> Dict:
+        """Properties without the custom ones this portal does not have"""
+        return {k: v for k, v in properties.items() if k not in self.missing_properties}
+
+    def _note_missing_properties(self, error: Exception) -> bool:
+        """Remember custom properties HubSpot rejected as missing; True if there were new ones"""
+        missing = _missing_properties(error) - self.missing_properties
+        if missing:
+            self.missing_properties |= missing
+            st.warning(
+                f"HubSpot has no contact properties {', '.join(sorted(missing))}; saving without them. "
+                "Create them as described in HUBSPOT_SETUP.md."
             )
+        return bool(missing)
 
-            if search_results.total > 0:
-                # Update existing contact
-                contact_id = search_results.results[0].id
-                contact_update = SimplePublicObjectInput(properties=properties)
+    def _upsert_contact(self, email: str, properties: Dict) -> str:
+        """Update the contact with this email, or create it; returns its ID"""
+        # Known contact: update it without searching
+        contact_id = self.contact_cache.get(email)
+        if contact_id:
+            try:
                 self.client.crm.contacts.basic_api.update(
                     contact_id=contact_id,
-                    simple_public_object_input=contact_update
+                    simple_public_object_input=SimplePublicObjectInput(properties=properties)
                 )
                 return contact_id
-            else:
-                # Create new contact
-                contact_input = SimplePublicObjectInput(properties=properties)
-                result = self.client.crm.contacts.basic_api.create(
-                    simple_public_object_input=contact_input
-                )
-                return result.id
+            except ApiException as e:
+                if not _is_not_found(e):
+                    raise
+                # Deleted or merged since it was cached
+                self.contact_cache.invalidate(email)
+
+        # Search for existing contact by email
+        search_results = self.client.crm.contacts.search_api.do_search(
+            public_object_search_request={
+                "filter_groups": [{
+                    "filters": [{
+                        "propertyName": "email",
+                        "operator": "EQ",
+                        "value": email
+                    }]
+                }]
+            }
+        )
+
+        if search_results.total > 0:
+            # Update existing contact
+            contact_id = search_results.results[0].id
+            contact_update = SimplePublicObjectInput(properties=properties)
+            self.client.crm.contacts.basic_api.update(
+                contact_id=contact_id,
+                simple_public_object_input=contact_update
+            )
+        else:
+            # Create new contact
+            contact_input = SimplePublicObjectInput(properties=properties)
+            result = self.client.crm.contacts.basic_api.create(
+                simple_public_object_input=contact_input
+            )
+            contact_id = result.id
+
+        self.contact_cache.put(email, contact_id)
+        return contact_id
+
+    def batch_upsert_contacts(self, contacts: List[Dict]) -> Dict[str, str]:
+        """
+        Create or update many contacts by email with a few batch requests
+
+        Existing contacts are looked up with one batch read per 100 emails,
+        then updated and created in batches, instead of a search plus a
+        write per contact.
+
+        Args:
+            contacts: Contact properties, each including "email"
+
+        Returns:
+            Dict mapping lowercased email to contact ID for the contacts saved
+        """
+        if not self.is_enabled():
+            return {}
+
+        by_email = {}
+        for contact in contacts:
+            email = contact["email"].strip().lower()
+            properties = {
+                "firstname": email.split('@')[0],
+                "lead_source": "SE Builders AI Platform",
+                "hs_lead_status": "NEW",
+                **contact,
+                "email": email
+            }
+            by_email[email] = {k: v for k, v in properties.items() if v}
 
+        emails = list(by_email)
+        contact_ids = {}
+        # Batches rejected over missing custom properties are retried without them;
+        # contacts saved before the failure are found by the read and updated
+        for attempt in range(2):
+            try:
+                for batch in _batches(emails):
+                    found = self.client.crm.contacts.batch_api.read(
+                        batch_read_input_simple_public_object_id={
+                            "properties": ["email"],
+                            "idProperty": "email",
+                            "inputs": [{"id": email} for email in batch]
+                        }
+                    )
+                    for result in found.results:
+                        contact_ids[result.properties["email"].lower()] = result.id
+
+                existing = [email for email in emails if email in contact_ids]
+                for batch in _batches(existing):
+                    self.client.crm.contacts.batch_api.update(
+                        batch_input_simple_public_object_batch_input={
+                            "inputs": [
+                                {"id": contact_ids[email], "properties": self._writable(by_email[email])}
+                                for email in batch
+                            ]
+                        }
+                    )
+
+                new = [email for email in emails if email not in contact_ids]
+                for batch in _batches(new):
+                    created = self.client.crm.contacts.batch_api.create(
+                        batch_input_simple_public_object_input_for_create={
+                            "inputs": [
+                                {"properties": self._writable(by_email[email]), "associations": []}
+                                for email in batch
+                            ]
+                        }
+                    )
+                    for result in created.results:
+                        contact_ids[result.properties["email"].lower()] = result.id
+                break
+            except Exception as e:
+                if attempt == 0 and self._note_missing_properties(e):
+                    continue
+                st.error(f"HubSpot batch contact error: {str(e)}")
+                break
+
+        for email, contact_id in contact_ids.items():
+            self.contact_cache.put(email, contact_id)
+        return contact_ids
+
+    def get_contact_id(self, email: str) -> Optional[str]:
+        """
+        Contact ID for an email, from the cache or by creating/updating the contact
+
+        Args:
+            email: Contact email
+
+        Returns:
+            Contact ID if successful, None otherwise
+        """
+        return self.contact_cache.get(email) or self.create_or_update_contact(email=email)
+
+    def _associate_contact(self, email: str, associate: Callable[[str], object]):
+        """
+        Call associate(contact_id) for the contact with this email
+
+        A 404 means the cached ID went stale (contact deleted or merged): it
+        is dropped and the association retried once with a fresh lookup.
+        """
+        contact_id = self.get_contact_id(email)
+        if not contact_id:
+            return
+        try:
+            associate(contact_id)
         except Exception as e:
-            st.error(f"HubSpot contact error: {str(e)}")
-            return None
+            if not _is_not_found(e):
+                raise
+            self.contact_cache.invalidate(email)
+            contact_id = self.get_contact_id(email)
+            if contact_id:
+                associate(contact_id)
 
     def add_note_to_contact(
         self,
         contact_id: str,
-        note_body: str
+        note_body: str,
+        attachment_ids: Optional[List[str]] = None
     ) -> bool:
         """
         Add a note to a contact
@@ -135,6 +404,7 @@ class HubSpotIntegration:
         Args:
             contact_id: HubSpot contact ID
             note_body: Note content
+            attachment_ids: File manager IDs to attach (optional)
 
         Returns:
             True if successful
@@ -143,13 +413,15 @@ class HubSpotIntegration:
             return False
 
         try:
+            properties = {
+                "hs_note_body": note_body,
+                "hs_timestamp": datetime.now().isoformat()
+            }
+            if attachment_ids:
+                properties["hs_attachment_ids"] = ";".join(attachment_ids)
+
             # Create note (simplified for v8)
-            note_input = SimplePublicObjectInput(
-                properties={
-                    "hs_note_body": note_body,
-                    "hs_timestamp": datetime.now().isoformat()
-                }
-            )
+            note_input = SimplePublicObjectInput(properties=properties)
             # Create engagement (note)
             note_result = self.client.crm.objects.notes.basic_api.create(
                 simple_public_object_input=note_input
@@ -196,17 +468,7 @@ class HubSpotIntegration:
         if not self.is_enabled():
             return None
 
-        properties = {
-            "dealname": deal_name,
-            "amount": str(amount),
-            "dealstage": deal_stage,
-            "pipeline": "default",
-            "closedate": (datetime.now() + timedelta(days=90)).strftime("%Y-%m-%d"),
-            "deal_source": "SE Builders AI Platform"
-        }
-
-        if additional_properties:
-            properties.update(additional_properties)
+        properties = self._deal_properties(deal_name, amount, deal_stage, additional_properties)
 
         try:
             # Create deal input object
@@ -219,16 +481,17 @@ class HubSpotIntegration:
 
             # Associate with contact if email provided
             if contact_email:
-                contact_id = self.create_or_update_contact(email=contact_email)
-                if contact_id:
-                    try:
-                        self.client.crm.deals.associations_api.create(
+                try:
+                    self._associate_contact(
+                        contact_email,
+                        lambda contact_id: self.client.crm.deals.associations_api.create(
                             deal_id=deal.id,
                             to_object_type="contacts",
                             to_object_id=contact_id
                         )
-                    except:
-                        pass  # Association may fail but deal is created
+                    )
+                except:
+                    pass  # Association may fail but deal is created
 
             return deal.id
 
@@ -236,6 +499,26 @@ class HubSpotIntegration:
             st.error(f"Failed to create deal: {str(e)}")
             return None
 
+    @staticmethod
+    def _deal_properties(
+        deal_name: str,
+        amount: float,
+        deal_stage: str = "appointmentscheduled",
+        additional_properties: Dict = None
+    ) -> Dict:
+        properties = {
+            "dealname": deal_name,
+            "amount": str(amount),
+            "dealstage": deal_stage,
+            "pipeline": "default",
+            "closedate": (datetime.now() + timedelta(days=90)).strftime("%Y-%m-%d"),
+            "deal_source": "SE Builders AI Platform"
+        }
+
+        if additional_properties:
+            properties.update(additional_properties)
+        return properties
+
     def associate_deal_to_contact(
         self,
         deal_id: str,
@@ -283,19 +566,7 @@ class HubSpotIntegration:
         if not self.is_enabled():
             return None
 
-        if due_date is None:
-            due_date = datetime.now() + timedelta(days=7)
-
-        # Convert to milliseconds timestamp
-        due_timestamp = int(due_date.timestamp() * 1000)
-
-        properties = {
-            "hs_task_subject": subject,
-            "hs_task_body": notes,
-            "hs_task_status": "NOT_STARTED",
-            "hs_task_priority": priority,
-            "hs_timestamp": str(due_timestamp)
-        }
+        properties = self._task_properties(subject, notes, due_date, priority)
 
         try:
             # Create task input
@@ -308,14 +579,15 @@ class HubSpotIntegration:
 
             # Associate with contact if provided
             if contact_email:
-                contact_id = self.create_or_update_contact(email=contact_email)
-                if contact_id:
-                    self.client.crm.objects.tasks.associations_api.create(
+                self._associate_contact(
+                    contact_email,
+                    lambda contact_id: self.client.crm.objects.tasks.associations_api.create(
                         task_id=task.id,
                         to_object_type="contacts",
                         to_object_id=contact_id,
                         association_type="task_to_contact"
                     )
+                )
 
             return task.id
 
@@ -323,21 +595,305 @@ class HubSpotIntegration:
             st.error(f"Failed to create task: {str(e)}")
             return None
 
+    @staticmethod
+    def _task_properties(subject: str, notes: str, due_date: datetime = None, priority: str = "MEDIUM") -> Dict:
+        if due_date is None:
+            due_date = datetime.now() + timedelta(days=7)
+
+        # Convert to milliseconds timestamp
+        due_timestamp = int(due_date.timestamp() * 1000)
+
+        return {
+            "hs_task_subject": subject,
+            "hs_task_body": notes,
+            "hs_task_status": "NOT_STARTED",
+            "hs_task_priority": priority,
+            "hs_timestamp": str(due_timestamp)
+        }
+
+    def complete_task(self, task_id: str, note: str = "") -> bool:
+        """
+        Mark a task as completed
+
+        Args:
+            task_id: HubSpot task ID
+            note: Optional text appended to the task body
+
+        Returns:
+            True if successful
+        """
+        if not self.is_enabled():
+            return False
+
+        properties = {"hs_task_status": "COMPLETED"}
+
+        try:
+            if note:
+                task = self.client.crm.objects.tasks.basic_api.get_by_id(
+                    task_id=task_id,
+                    properties=["hs_task_body"]
+                )
+                body = task.properties.get("hs_task_body") or ""
+                properties["hs_task_body"] = f"{body}\n\n{note}".strip()
+
+            self.client.crm.objects.tasks.basic_api.update(
+                task_id=task_id,
+                simple_public_object_input=SimplePublicObjectInput(properties=properties)
+            )
+            return True
+
+        except Exception as e:
+            st.error(f"Failed to complete task: {str(e)}")
+            return False
+
+    # ==================== BATCH OPERATIONS ====================
+
+    def _contact_ids(self, emails: List[str]) -> Dict[str, str]:
+        """Contact IDs by lowercased email: cached ones, the rest upserted in batches"""
+        contact_ids, missing = {}, []
+        for email in {email.strip().lower() for email in emails if email}:
+            contact_id = self.contact_cache.get(email)
+            if contact_id:
+                contact_ids[email] = contact_id
+            else:
+                missing.append(email)
+        if missing:
+            contact_ids.update(self.batch_upsert_contacts([{"email": email} for email in missing]))
+        return contact_ids
+
+    def _batch_create(
+        self,
+        batch_api,
+        records: List[Dict],
+        association_type: int,
+        label: str
+    ) -> List[Optional[str]]:
+        """
+        Create CRM objects in batches, each associated with its contact
+
+        Associations are sent with the create inputs, so no separate
+        association request is needed. The raw response is parsed because the
+        client's result model drops the objectWriteTraceId used for matching.
+
+        Args:
+            batch_api: Batch API of the object type
+            records: Dicts with "properties" and optionally "contact_id" or "contact_email"
+            association_type: HubSpot-defined association type to the contact
+            label: Object name for error messages
+
+        Returns:
+            Object IDs in the order of records (None where creation failed)
+        """
+        contact_ids = self._contact_ids([record.get("contact_email") for record in records])
+
+        def contact_for(record: Dict) -> Optional[str]:
+            return record.get("contact_id") or contact_ids.get((record.get("contact_email") or "").strip().lower())
+
+        ids = []
+        for batch in _batches(records):
+            for attempt in range(2):
+                inputs = [
+                    {
+                        "objectWriteTraceId": str(index),
+                        "properties": record["properties"],
+                        "associations": [{
+                            "to": {"id": contact_for(record)},
+                            "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": association_type}]
+                        }] if contact_for(record) else []
+                    }
+                    for index, record in enumerate(batch)
+                ]
+                try:
+                    created = batch_api.create(
+                        batch_input_simple_public_object_input_for_create={"inputs": inputs},
+                        _preload_content=False
+                    )
+                    ids.extend(_ids_by_trace_id(created, len(batch)))
+                    break
+                except Exception as e:
+                    # A cached contact may have been deleted or merged: look it up again once
+                    emails = {(record.get("contact_email") or "").strip().lower() for record in batch} - {""}
+                    if attempt == 0 and emails and getattr(e, "status", None) in (400, 404):
+                        for email in emails:
+                            self.contact_cache.invalidate(email)
+                        contact_ids.update(self._contact_ids(list(emails)))
+                        continue
+                    st.error(f"Failed to create {label}: {str(e)}")
+                    ids.extend([None] * len(batch))
+                    break
+        return ids
+
+    def batch_create_tasks(self, tasks: List[Dict]) -> List[Optional[str]]:
+        """
+        Create many tasks with a few batch requests
+
+        Args:
+            tasks: Dicts with create_task arguments (subject, notes, due_date,
+                priority, contact_email)
+
+        Returns:
+            Task IDs in the order of tasks (None where creation failed)
+        """
+        if not self.is_enabled() or not tasks:
+            return [None] * len(tasks)
+
+        records = [
+            {
+                "properties": self._task_properties(
+                    task["subject"], task["notes"], task.get("due_date"), task.get("priority", "MEDIUM")
+                ),
+                "contact_email": task.get("contact_email")
+            }
+            for task in tasks
+        ]
+        return self._batch_create(self.client.crm.objects.tasks.batch_api, records, TASK_TO_CONTACT, "tasks")
+
+    def batch_create_notes(self, notes: List[Dict]) -> List[Optional[str]]:
+        """
+        Create many contact notes with a few batch requests
+
+        Args:
+            notes: Dicts with "body" and "contact_id" or "contact_email"
+
+        Returns:
+            Note IDs in the order of notes (None where creation failed)
+        """
+        if not self.is_enabled() or not notes:
+            return [None] * len(notes)
+
+        timestamp = datetime.now().isoformat()
+        records = [
+            {
+                "properties": {"hs_note_body": note["body"], "hs_timestamp": timestamp},
+                "contact_id": note.get("contact_id"),
+                "contact_email": note.get("contact_email")
+            }
+            for note in notes
+        ]
+        return self._batch_create(self.client.crm.objects.notes.batch_api, records, NOTE_TO_CONTACT, "notes")
+
+    def batch_create_deals(self, deals: List[Dict]) -> List[Optional[str]]:
+        """
+        Create many deals with a few batch requests
+
+        Args:
+            deals: Dicts with create_deal arguments (deal_name, amount,
+                deal_stage, contact_email, additional_properties)
+
+        Returns:
+            Deal IDs in the order of deals (None where creation failed)
+        """
+        if not self.is_enabled() or not deals:
+            return [None] * len(deals)
+
+        records = [
+            {
+                "properties": self._deal_properties(
+                    deal["deal_name"], deal["amount"],
+                    deal.get("deal_stage", "appointmentscheduled"), deal.get("additional_properties")
+                ),
+                "contact_email": deal.get("contact_email")
+            }
+            for deal in deals
+        ]
+        return self._batch_create(self.client.crm.deals.batch_api, records, DEAL_TO_CONTACT, "deals")
+
+    def batch_complete_tasks(self, task_ids: List[str], note: str = "") -> int:
+        """
+        Mark many tasks as completed with a few batch requests
+
+        Args:
+            task_ids: HubSpot task IDs
+            note: Optional text appended to each task body
+
+        Returns:
+            Number of tasks completed
+        """
+        if not self.is_enabled() or not task_ids:
+            return 0
+
+        completed = 0
+        for batch in _batches(list(task_ids)):
+            try:
+                bodies = {}
+                if note:
+                    found = self.client.crm.objects.tasks.batch_api.read(
+                        batch_read_input_simple_public_object_id={
+                            "properties": ["hs_task_body"],
+                            "inputs": [{"id": task_id} for task_id in batch]
+                        }
+                    )
+                    bodies = {result.id: result.properties.get("hs_task_body") or "" for result in found.results}
+
+                inputs = []
+                for task_id in batch:
+                    properties = {"hs_task_status": "COMPLETED"}
+                    if note:
+                        properties["hs_task_body"] = f"{bodies.get(task_id, '')}\n\n{note}".strip()
+                    inputs.append({"id": task_id, "properties": properties})
+
+                updated = self.client.crm.objects.tasks.batch_api.update(
+                    batch_input_simple_public_object_batch_input={"inputs": inputs}
+                )
+                completed += len(updated.results)
+            except Exception as e:
+                st.error(f"Failed to complete tasks: {str(e)}")
+        return completed
+
     # ==================== UTILITY FUNCTIONS ====================
 
+    def upload_transcript(self, conversation_history: List[Dict]) -> Optional[str]:
+        """
+        Upload a gzip-compressed chat transcript to the file manager
+
+        Args:
+            conversation_history: List of messages
+
+        Returns:
+            File ID or None if failed
+        """
+        if not self.is_enabled():
+            return None
+
+        file_name = f"chat-transcript-{datetime.now().strftime('%Y%m%d-%H%M%S')}.md.gz"
+        try:
+            # The generated client uploads from a path
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, file_name)
+                with open(path, "wb") as f:
+                    f.write(compress_transcript(conversation_history))
+                result = self.client.files.files_api.upload(
+                    file=path,
+                    folder_path=TRANSCRIPT_FOLDER,
+                    file_name=file_name,
+                    options=json.dumps({"access": "PRIVATE", "overwrite": False})
+                )
+            return result.id
+        except Exception as e:
+            st.error(f"Failed to upload transcript: {str(e)}")
+            return None
+
     def log_chat_conversation(
         self,
         contact_email: str,
         conversation_history: List[Dict],
-        conversation_summary: str = ""
+        conversation_summary: str = "",
+        lead=None,
+        attach_transcript: Optional[bool] = None
     ) -> bool:
         """
         Log an AI chat conversation to HubSpot
 
+        The note holds a condensed summary (lead facts, client questions,
+        assistant next steps) of bounded size rather than raw messages.
+
         Args:
             contact_email: Contact's email
             conversation_history: List of messages
             conversation_summary: Summary of the conversation
+            lead: LeadQualifier of the conversation (optional)
+            attach_transcript: Attach the full compressed transcript
+                (defaults to HUBSPOT_ATTACH_TRANSCRIPTS)
 
         Returns:
             True if successful
@@ -358,14 +914,77 @@ class HubSpotIntegration:
             return False
 
         # Format conversation as note
-        note_body = f"**AI Chat Conversation Summary**\n\n{conversation_summary}\n\n---\n\n**Full Transcript:**\n\n"
-
-        for msg in conversation_history[-10:]:  # Last 10 messages
-            role = "🤖 AI Assistant" if msg['role'] == 'assistant' else "👤 Client"
-            note_body += f"\n**{role}:**\n{msg['content']}\n"
+        note_body = f"**AI Chat Conversation Summary**\n\n{conversation_summary}\n\n---\n\n"
+        note_body += condense_transcript(conversation_history, lead)
+
+        if attach_transcript is None:
+            attach_transcript = self.attach_transcripts
+        attachment_ids = []
+        if attach_transcript and conversation_history:
+            file_id = self.upload_transcript(conversation_history)
+            if file_id:
+                attachment_ids.append(file_id)
+                note_body += f"\n\n---\n\nFull transcript attached ({len(conversation_history)} messages)"
 
         # Add note to contact
-        return self.add_note_to_contact(contact_id, note_body)
+        return self.add_note_to_contact(contact_id, note_body, attachment_ids)
+
+    def log_assistant_lead(
+        self,
+        contact_email: str,
+        conversation_history: List[Dict],
+        lead,
+        name: str = "",
+        phone: str = "",
+        company: str = "",
+        lead_source: str = "AI Chat Assistant"
+    ) -> bool:
+        """
+        Log a client assistant conversation with its qualified lead profile
+
+        Args:
+            contact_email: Contact's email
+            conversation_history: List of messages
+            lead: LeadQualifier of the conversation
+            name: Full name (optional)
+            phone: Phone number (optional)
+            company: Company name (optional)
+            lead_source: Where the conversation happened
+
+        Returns:
+            True if successful
+        """
+        # Parse name
+        name_parts = name.split()
+        firstname = name_parts[0] if name_parts else ""
+        lastname = " ".join(name_parts[1:])
+
+        # Create conversation summary
+        summary = f"AI chat conversation on {datetime.now().strftime('%Y-%m-%d')}"
+        summary += f"\n\nMessages exchanged: {len(conversation_history)}"
+
+        if not self.log_chat_conversation(
+            contact_email=contact_email,
+            conversation_history=conversation_history,
+            conversation_summary=summary,
+            lead=lead
+        ):
+            return False
+
+        # Update contact with additional info
+        self.create_or_update_contact(
+            email=contact_email,
+            firstname=firstname,
+            lastname=lastname,
+            phone=phone,
+            company=company,
+            additional_properties={
+                "lead_source": lead_source,
+                "ai_conversation_date": datetime.now().strftime("%Y-%m-%d"),
+                **lead.hubspot_properties()
+            }
+        )
+        return True
 
     def log_cost_estimate(
         self,
@@ -421,30 +1040,16 @@ class HubSpotIntegration:
 
         return deal_id
 
-    def log_safety_issue(
-        self,
+    @staticmethod
+    def _safety_task(
         project_name: str,
         location: str,
         severity: str,
         description: str,
-        contact_email: str = None
-    ) -> Optional[str]:
-        """
-        Create a task for a safety issue
-
-        Args:
-            project_name: Project name
-            location: Issue location
-            severity: CRITICAL, MODERATE, or MINOR
-            description: Issue description
-            contact_email: Optional contact to assign
-
-        Returns:
-            Task ID if successful
-        """
-        if not self.is_enabled():
-            return None
-
+        contact_email: str = None,
+        osha_references: List[str] = None
+    ) -> Dict:
+        """create_task arguments for a safety issue"""
         priority_map = {
             "CRITICAL": "HIGH",
             "MODERATE": "MEDIUM",
@@ -464,6 +1069,11 @@ class HubSpotIntegration:
 
         subject = f"🚨 {severity} Safety Issue: {project_name}"
 
+        osha_block = ""
+        if osha_references:
+            osha_block = "\n**OSHA References (checked against 29 CFR 1926):**\n"
+            osha_block += "\n".join(f"- {line}" for line in osha_references) + "\n"
+
         notes = f"""
 **Project:** {project_name}
 **Location:** {location}
@@ -472,7 +1082,7 @@ class HubSpotIntegration:
 
 **Description:**
 {description}
-
+{osha_block}
 **Action Required:**
 Immediate inspection and remediation required.
 
@@ -480,13 +1090,58 @@ Immediate inspection and remediation required.
 *Detected by SE Builders AI Safety Scanner*
 """
 
-        return self.create_task(
-            subject=subject,
-            notes=notes,
-            due_date=due_date,
-            priority=priority,
-            contact_email=contact_email
-        )
+        return {
+            "subject": subject,
+            "notes": notes,
+            "due_date": due_date,
+            "priority": priority,
+            "contact_email": contact_email
+        }
+
+    def log_safety_issue(
+        self,
+        project_name: str,
+        location: str,
+        severity: str,
+        description: str,
+        contact_email: str = None,
+        osha_references: List[str] = None
+    ) -> Optional[str]:
+        """
+        Create a task for a safety issue
+
+        Args:
+            project_name: Project name
+            location: Issue location
+            severity: CRITICAL, MODERATE, or MINOR
+            description: Issue description
+            contact_email: Optional contact to assign
+            osha_references: Validated OSHA reference lines to include
+
+        Returns:
+            Task ID if successful
+        """
+        if not self.is_enabled():
+            return None
+
+        return self.create_task(**self._safety_task(
+            project_name, location, severity, description, contact_email, osha_references
+        ))
+
+    def batch_log_safety_issues(self, issues: List[Dict]) -> List[Optional[str]]:
+        """
+        Create tasks for many safety issues with a few batch requests
+
+        Args:
+            issues: Dicts with log_safety_issue arguments
+
+        Returns:
+            Task IDs in the order of issues (None where creation failed)
+        """
+        if not self.is_enabled():
+            return [None] * len(issues)
+
+        return self.batch_create_tasks([self._safety_task(**issue) for issue in issues])
 
 
 # ==================== GLOBAL INSTANCE ====================
@@ -0,0 +1,495 @@
+"""
+Inbound Inquiry Backlog
+
+Leads that arrive by email or web form are drafted a reply in bulk with the
+client assistant's instructions and knowledge base, instead of being pasted
+into the chat one by one:
+
+- Inquiries are read from a folder (.eml, .txt, .json web form exports), an
+  mbox file or a CSV export
+- Replies are drafted concurrently through the async Gemini API, capped both
+  by concurrent calls and by a requests-per-minute rate limiter, with
+  retries and backoff for transient errors
+- Lead fields, score and escalations come from the local lead qualifier
+  (modules/lead_qualification.py), merged with the form fields
+- Drafts wait in a local SQLite review queue (INQUIRY_QUEUE_DB overrides the
+  path) until someone approves, edits or discards them on the Inquiry Inbox
+  page; the queue doubles as the checkpoint, so re-running an import skips
+  inquiries already drafted
+
+See inquiry_backlog_cli.py for the batch command.
+"""
+
+import asyncio
+import csv
+import email
+import email.policy
+import hashlib
+import html
+import json
+import mailbox
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from email.utils import parseaddr, parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from modules.assistant_session import ASSISTANT_INSTRUCTIONS, default_model_factory
+from modules.knowledge_base import get_knowledge_base
+from modules.lead_qualification import LeadQualifier
+from modules.paths import DATA_DIR
+
+INQUIRY_DB_PATH = Path(os.getenv("INQUIRY_QUEUE_DB", DATA_DIR / "inquiry_queue.db"))
+
+# Concurrent drafting calls and overall request rate
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RATE_PER_MINUTE = 300
+
+# Transient model errors are retried with exponential backoff
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2.0
+
+# Longest inquiry text sent to the model
+MAX_INQUIRY_CHARS = 6000
+
+# Review states
+PENDING = "pending"
+APPROVED = "approved"
+DISCARDED = "discarded"
+FAILED = "failed"
+
+DRAFT_INSTRUCTIONS = ASSISTANT_INSTRUCTIONS + """
+
+You are now drafting a reply to an inquiry that arrived by email or web form. A member of the SE Builders team will review and send it.
+- Write the email body only (no subject line), addressed to the sender by first name when known
+- Answer their questions from the knowledge base excerpts, then propose a clear next step
+- Keep it under 250 words
+- Sign off as "The SE Builders Team"
+- Use [square brackets] for anything the team must fill in or confirm"""
+
+# CSV / web form column names, first match wins
+_FIELD_ALIASES = {
+    "name": ("name", "full_name", "full name", "contact_name", "contact name"),
+    "first_name": ("first_name", "first name", "firstname"),
+    "last_name": ("last_name", "last name", "lastname"),
+    "email": ("email", "email_address", "email address", "e-mail"),
+    "phone": ("phone", "phone_number", "phone number", "telephone"),
+    "company": ("company", "organization", "organisation", "facility"),
+    "subject": ("subject", "topic", "project_type", "project type"),
+    "body": ("message", "body", "inquiry", "comments", "description", "details"),
+    "received_at": ("date", "submitted_at", "submitted", "received", "created_at", "timestamp"),
+    "submission_id": ("submission_id", "submission id", "entry_id", "entry id", "response_id",
+                      "response id", "lead_id", "lead id", "id"),
+}
+
+_TAG = re.compile(r"<[^>]+>")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inquiries (
+    id TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    source TEXT NOT NULL,
+    received_at TEXT,
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL,
+    draft TEXT NOT NULL DEFAULT '',
+    lead_score INTEGER NOT NULL DEFAULT 0,
+    lead_grade TEXT NOT NULL DEFAULT '',
+    lead_summary TEXT NOT NULL DEFAULT '',
+    escalations TEXT NOT NULL DEFAULT '[]',
+    contact TEXT NOT NULL DEFAULT '{}',
+    contact_id TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    drafted_at TEXT NOT NULL,
+    reviewed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_inquiries_status ON inquiries(status, lead_score);
+"""
+
+
+# ==================== LOADING ====================
+
+def _inquiry_id(source: str, key: str) -> str:
+    return hashlib.sha256(f"{source}\n{key}".encode("utf-8")).hexdigest()[:16]
+
+
+def _clean_text(text: str) -> str:
+    """Drop quoted earlier messages and excess blank lines"""
+    lines = [line for line in text.replace("\r\n", "\n").split("\n") if not line.lstrip().startswith(">")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _email_body(message) -> str:
+    part = message.get_body(preferencelist=("plain", "html"))
+    if part is None:
+        return ""
+    text = part.get_content()
+    if part.get_content_type() == "text/html":
+        text = html.unescape(_TAG.sub(" ", text))
+    return _clean_text(text)
+
+
+def parse_email_message(message, source: str, channel: str = "email") -> Dict:
+    """Inquiry fields from an email.message.EmailMessage"""
+    name, address = parseaddr(str(message.get("From", "")))
+    received_at = None
+    try:
+        received_at = parsedate_to_datetime(message["Date"]).isoformat(timespec="seconds")
+    except (TypeError, ValueError):
+        pass
+    body = _email_body(message)
+    key = str(message.get("Message-ID") or body)
+    return {
+        "id": _inquiry_id(source if not message.get("Message-ID") else "email", key),
+        "channel": channel,
+        "source": source,
+        "received_at": received_at,
+        "name": name,
+        "email": address,
+        "phone": "",
+        "company": "",
+        "subject": str(message.get("Subject", "")),
+        "body": body
+    }
+
+
+def parse_form_record(record: Dict, source: str) -> Dict:
+    """
+    Inquiry fields from a web form / CSV row, matching common column names
+
+    The ID comes from the form's submission ID when the export has one,
+    otherwise from the sender, submission time and message. It never
+    depends on the file or row position, so re-exports that add or re-sort
+    rows map to the inquiries already drafted.
+    """
+    lowered = {str(k).strip().lower(): str(v or "").strip() for k, v in record.items() if k}
+
+    def field(name: str) -> str:
+        return next((lowered[alias] for alias in _FIELD_ALIASES[name] if lowered.get(alias)), "")
+
+    name = field("name") or " ".join(filter(None, (field("first_name"), field("last_name"))))
+    body = _clean_text(field("body"))
+    submission_id = field("submission_id")
+    if submission_id:
+        inquiry_id = _inquiry_id("form-submission", submission_id)
+    else:
+        inquiry_id = _inquiry_id("form", f"{field('email').lower()}\n{field('received_at')}\n{body}")
+    return {
+        "id": inquiry_id,
+        "channel": "web form",
+        "source": source,
+        "received_at": field("received_at") or None,
+        "name": name,
+        "email": field("email"),
+        "phone": field("phone"),
+        "company": field("company"),
+        "subject": field("subject"),
+        "body": body
+    }
+
+
+def load_inquiries(path: Path) -> List[Dict]:
+    """
+    Read inquiries from a folder, an mbox file or a CSV export
+
+    Folders may hold .eml files, plain .txt messages and .json web form
+    exports (one object or a list); other files are ignored.
+
+    Returns:
+        Inquiry dicts with id, channel, source, received_at, name, email,
+        phone, company, subject and body; empty inquiries are dropped
+    """
+    path = Path(path)
+    inquiries = []
+
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            inquiries.extend(load_inquiries(file) if file.suffix.lower() in (".mbox", ".csv") else _load_file(file))
+    elif path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for record in csv.DictReader(f):
+                inquiries.append(parse_form_record(record, str(path)))
+    elif path.suffix.lower() == ".mbox" or path.name.lower() == "mbox":
+        box = mailbox.mbox(path, factory=lambda f: email.message_from_binary_file(f, policy=email.policy.default))
+        try:
+            for message in box:
+                inquiries.append(parse_email_message(message, str(path)))
+        finally:
+            box.close()
+    else:
+        inquiries.extend(_load_file(path))
+
+    return [inquiry for inquiry in inquiries if inquiry["body"]]
+
+
+def _load_file(path: Path) -> List[Dict]:
+    suffix = path.suffix.lower()
+    if suffix == ".eml":
+        with open(path, "rb") as f:
+            return [parse_email_message(email.message_from_binary_file(f, policy=email.policy.default), str(path))]
+    if suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        records = data if isinstance(data, list) else [data]
+        return [parse_form_record(record, str(path)) for record in records]
+    if suffix == ".txt":
+        text = _clean_text(path.read_text(encoding="utf-8", errors="replace"))
+        return [{
+            "id": _inquiry_id(str(path), text), "channel": "email", "source": str(path), "received_at": None,
+            "name": "", "email": "", "phone": "", "company": "", "subject": path.stem, "body": text
+        }]
+    return []
+
+
+# ==================== LEAD FIELDS ====================
+
+def qualify_inquiry(inquiry: Dict) -> LeadQualifier:
+    """Lead profile from the inquiry text, with form fields taking precedence"""
+    lead = LeadQualifier()
+    lead.update(f"{inquiry['subject']}\n{inquiry['body']}")
+    if inquiry["email"]:
+        lead.profile["email"] = inquiry["email"]
+    if inquiry["phone"]:
+        lead.profile["phone"] = inquiry["phone"]
+    return lead
+
+
+def contact_properties(inquiry: Dict, lead: LeadQualifier) -> Dict:
+    """HubSpot contact properties for an inquiry (needs an email)"""
+    name_parts = inquiry["name"].split()
+    return {
+        "email": lead.profile["email"] or "",
+        "firstname": name_parts[0] if name_parts else "",
+        "lastname": " ".join(name_parts[1:]),
+        "phone": lead.profile["phone"] or "",
+        "company": inquiry["company"],
+        "lead_source": f"Inbound {inquiry['channel'].title()}",
+        "ai_conversation_date": datetime.now().strftime("%Y-%m-%d"),
+        **lead.hubspot_properties()
+    }
+
+
+# ==================== DRAFTING ====================
+
+class RateLimiter:
+    """Spaces out async requests to at most rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def get_draft_model():
+    """Gemini model with the drafting instructions"""
+    return default_model_factory(DRAFT_INSTRUCTIONS)
+
+
+def build_draft_prompt(inquiry: Dict, lead: LeadQualifier, context: str) -> str:
+    """Prompt for one inquiry: knowledge excerpts, lead profile and the message"""
+    sender = inquiry["name"] or inquiry["email"] or "Unknown sender"
+    parts = []
+    if context:
+        parts.append(context)
+    parts.append(f"LEAD PROFILE (from the inquiry):\n{lead.summary()}")
+    if lead.flags:
+        parts.append(
+            "ESCALATION: acknowledge their request and say a member of the team will follow up "
+            "personally; offer to schedule a consultation."
+        )
+    parts.append(
+        f"INQUIRY ({inquiry['channel']}) from {sender}"
+        + (f", {inquiry['company']}" if inquiry["company"] else "")
+        + (f"\nSubject: {inquiry['subject']}" if inquiry["subject"] else "")
+        + f"\n\n{inquiry['body'][:MAX_INQUIRY_CHARS]}"
+    )
+    return "\n\n".join(parts)
+
+
+async def draft_replies(
+    inquiries: List[Dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_per_minute: float = DEFAULT_RATE_PER_MINUTE,
+    model=None,
+    on_result: Optional[Callable[[Dict], None]] = None
+) -> List[Dict]:
+    """
+    Draft replies for many inquiries concurrently
+
+    Args:
+        inquiries: Inquiries from load_inquiries()
+        concurrency: Maximum concurrent model calls
+        rate_per_minute: Maximum model requests started per minute
+        model: Drafting model (defaults to get_draft_model())
+        on_result: Called with each record as soon as it is drafted
+
+    Returns:
+        Inquiry records with draft, lead fields, contact properties and
+        status (pending, or failed with an error)
+    """
+    model = model or get_draft_model()
+    knowledge_base = get_knowledge_base()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    limiter = RateLimiter(rate_per_minute)
+    records = []
+
+    async def draft(inquiry: Dict):
+        lead = qualify_inquiry(inquiry)
+        record = {
+            **inquiry,
+            "lead_score": lead.score,
+            "lead_grade": lead.grade,
+            "lead_summary": lead.summary(),
+            "escalations": lead.escalation_labels(),
+            "contact": contact_properties(inquiry, lead),
+            "draft": "",
+            "status": PENDING,
+            "error": None
+        }
+        prompt = build_draft_prompt(
+            inquiry, lead, knowledge_base.build_context(f"{inquiry['subject']}\n{inquiry['body']}")
+        )
+        try:
+            async with slots:
+                for attempt in range(MAX_ATTEMPTS):
+                    await limiter.wait()
+                    try:
+                        response = await model.generate_content_async(prompt)
+                        record["draft"] = response.text.strip()
+                        break
+                    except Exception:
+                        if attempt == MAX_ATTEMPTS - 1:
+                            raise
+                        await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+        except Exception as e:
+            record["status"] = FAILED
+            record["error"] = str(e)
+
+        records.append(record)
+        if on_result:
+            on_result(record)
+
+    await asyncio.gather(*(draft(inquiry) for inquiry in inquiries))
+    return records
+
+
+# ==================== REVIEW QUEUE ====================
+
+def connect() -> sqlite3.Connection:
+    """Open a connection to the review queue, creating it if needed"""
+    INQUIRY_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INQUIRY_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection):
+    """Add columns missing from queues created by older versions"""
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(inquiries)")}
+    if "contact" not in existing:
+        try:
+            conn.execute("ALTER TABLE inquiries ADD COLUMN contact TEXT NOT NULL DEFAULT '{}'")
+        except sqlite3.OperationalError:
+            pass  # Another connection added it first
+
+
+def drafted_ids() -> Set[str]:
+    """Inquiries already in the queue (failed drafts are retried)"""
+    with closing(connect()) as conn:
+        return {row["id"] for row in conn.execute("SELECT id FROM inquiries WHERE status != ?", (FAILED,))}
+
+
+def save_drafts(records: List[Dict]):
+    """Add drafted inquiries to the review queue (replacing failed attempts)"""
+    now = datetime.now().isoformat(timespec="seconds")
+    with closing(connect()) as conn, conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO inquiries
+               (id, channel, source, received_at, name, email, phone, company, subject, body, draft,
+                lead_score, lead_grade, lead_summary, escalations, contact, status, error, drafted_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (r["id"], r["channel"], r["source"], r["received_at"], r["name"], r["contact"]["email"],
+                 r["contact"]["phone"], r["company"], r["subject"], r["body"], r["draft"], r["lead_score"],
+                 r["lead_grade"], r["lead_summary"], json.dumps(r["escalations"]), json.dumps(r["contact"]),
+                 r["status"], r["error"], now)
+                for r in records
+            ]
+        )
+
+
+def unsaved_contacts() -> List[Dict]:
+    """
+    Contact properties of queued inquiries not yet saved to HubSpot
+
+    Covers earlier runs that were interrupted after drafting, since
+    drafted inquiries are skipped when the export is processed again.
+    """
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT email, contact FROM inquiries WHERE contact_id IS NULL AND email != '' AND status != ?",
+            (FAILED,)
+        ).fetchall()
+    return [json.loads(row["contact"]) if row["contact"] != "{}" else {"email": row["email"]} for row in rows]
+
+
+def set_contact_ids(contact_ids: Dict[str, str]):
+    """Record the HubSpot contact of each queued inquiry, by lowercased email"""
+    with closing(connect()) as conn, conn:
+        conn.executemany(
+            "UPDATE inquiries SET contact_id = ? WHERE lower(email) = ?",
+            [(contact_id, email) for email, contact_id in contact_ids.items()]
+        )
+
+
+def load_queue(status: str = PENDING, limit: int = 50) -> List[Dict]:
+    """Queued inquiries in a state, hottest leads first"""
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT * FROM inquiries WHERE status = ? ORDER BY lead_score DESC, received_at LIMIT ?",
+            (status, limit)
+        ).fetchall()
+    return [{**dict(row), "escalations": json.loads(row["escalations"])} for row in rows]
+
+
+def queue_counts() -> Dict[str, int]:
+    """Number of inquiries per review state"""
+    with closing(connect()) as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM inquiries GROUP BY status").fetchall())
+    return {status: counts.get(status, 0) for status in (PENDING, APPROVED, DISCARDED, FAILED)}
+
+
+def review_inquiry(inquiry_id: str, status: str, draft: Optional[str] = None):
+    """Mark an inquiry approved or discarded, keeping any edits to the draft"""
+    now = datetime.now().isoformat(timespec="seconds")
+    with closing(connect()) as conn, conn:
+        if draft is None:
+            conn.execute("UPDATE inquiries SET status = ?, reviewed_at = ? WHERE id = ?", (status, now, inquiry_id))
+        else:
+            conn.execute(
+                "UPDATE inquiries SET status = ?, draft = ?, reviewed_at = ? WHERE id = ?",
+                (status, draft, now, inquiry_id)
+            )
@@ -0,0 +1,136 @@
+"""
+Inquiry Inbox
+
+Review queue for replies drafted by the inquiry backlog processor
+(inquiry_backlog_cli.py). Drafts are listed hottest lead first; each can be
+edited, opened in the mail client, approved (logged as a note on the HubSpot
+contact) or discarded. Only one page of the queue is rendered at a time.
+"""
+
+from urllib.parse import quote
+
+import streamlit as st
+
+from modules.hubspot_integration import hubspot
+from modules.inquiry_backlog import (
+    APPROVED,
+    DISCARDED,
+    FAILED,
+    PENDING,
+    load_queue,
+    queue_counts,
+    review_inquiry,
+)
+
+PAGE_SIZE = 25
+
+GRADE_ICONS = {"Hot": "🔥", "Warm": "🟠", "Cold": "🔵"}
+
+STATUS_LABELS = {
+    PENDING: "⏳ Pending Review",
+    APPROVED: "✅ Approved",
+    DISCARDED: "🗑️ Discarded",
+    FAILED: "❌ Failed Drafts",
+}
+
+
+def _mailto(inquiry: dict, draft: str) -> str:
+    subject = f"Re: {inquiry['subject']}" if inquiry["subject"] else "Your inquiry to SE Builders"
+    return f"mailto:{inquiry['email']}?subject={quote(subject)}&body={quote(draft)}"
+
+
+def _approve(inquiry: dict, draft: str):
+    review_inquiry(inquiry["id"], APPROVED, draft)
+    if hubspot.is_enabled() and inquiry["contact_id"]:
+        hubspot.add_note_to_contact(
+            inquiry["contact_id"],
+            f"**Inbound {inquiry['channel']} inquiry**\n\n{inquiry['body']}\n\n---\n\n"
+            f"**Approved reply:**\n\n{draft}\n\n---\n\n{inquiry['lead_summary']}"
+        )
+
+
+def show_inquiry(inquiry: dict):
+    """One queued inquiry with its draft and review actions"""
+    icon = GRADE_ICONS.get(inquiry["lead_grade"], "⚪")
+    sender = inquiry["name"] or inquiry["email"] or "Unknown sender"
+    title = f"{icon} {inquiry['lead_score']} · {sender} · {inquiry['subject'] or inquiry['body'][:60]}"
+
+    with st.expander(title, expanded=bool(inquiry["escalations"]) and inquiry["status"] == PENDING):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.caption(
+                f"{inquiry['channel'].title()} · {inquiry['received_at'] or 'date unknown'}"
+                + (f" · {inquiry['email']}" if inquiry["email"] else "")
+                + (f" · {inquiry['phone']}" if inquiry["phone"] else "")
+            )
+            for label in inquiry["escalations"]:
+                st.warning(f"🚨 Escalate: {label}")
+            st.markdown("**Inquiry**")
+            st.text(inquiry["body"])
+            st.markdown("**Lead Profile**")
+            st.caption("\n\n".join(inquiry["lead_summary"].splitlines()))
+
+        with col2:
+            if inquiry["status"] == FAILED:
+                st.error(f"Drafting failed: {inquiry['error']}")
+                st.caption("Re-run inquiry_backlog_cli.py on the same export to retry.")
+                return
+
+            draft = st.text_area("Draft Reply", inquiry["draft"], height=320, key=f"draft_{inquiry['id']}")
+
+            if inquiry["status"] != PENDING:
+                st.caption(f"Reviewed {inquiry['reviewed_at']}")
+                return
+
+            b1, b2, b3 = st.columns(3)
+            with b1:
+                if st.button("✅ Approve", key=f"approve_{inquiry['id']}", use_container_width=True):
+                    _approve(inquiry, draft)
+                    st.rerun()
+            with b2:
+                if inquiry["email"]:
+                    st.link_button("✉️ Open in Email", _mailto(inquiry, draft), use_container_width=True)
+            with b3:
+                if st.button("🗑️ Discard", key=f"discard_{inquiry['id']}", use_container_width=True):
+                    review_inquiry(inquiry["id"], DISCARDED)
+                    st.rerun()
+
+
+def show_inquiry_inbox():
+    st.markdown("<h1 class='main-header'>📥 Inquiry Inbox</h1>", unsafe_allow_html=True)
+    st.markdown("<p class='sub-header'>AI-drafted replies to email and web form inquiries, hottest leads first</p>", unsafe_allow_html=True)
+
+    st.markdown("---")
+
+    counts = queue_counts()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pending Review", counts[PENDING])
+    col2.metric("Approved", counts[APPROVED])
+    col3.metric("Discarded", counts[DISCARDED])
+    col4.metric("Failed", counts[FAILED])
+
+    if not any(counts.values()):
+        st.info("📭 No inquiries yet. Draft replies for a backlog with:")
+        st.code("python inquiry_backlog_cli.py path/to/inbox.mbox", language="bash")
+        return
+
+    status = st.radio(
+        "Show", list(STATUS_LABELS), format_func=STATUS_LABELS.get, horizontal=True, label_visibility="collapsed"
+    )
+
+    limit_key = f"inquiry_limit_{status}"
+    limit = st.session_state.get(limit_key, PAGE_SIZE)
+    inquiries = load_queue(status, limit)
+
+    if not inquiries:
+        st.info("Nothing here.")
+        return
+
+    for inquiry in inquiries:
+        show_inquiry(inquiry)
+
+    if counts[status] > len(inquiries):
+        if st.button(f"Show more ({counts[status] - len(inquiries)} remaining)", use_container_width=True):
+            st.session_state[limit_key] = limit + PAGE_SIZE
+            st.rerun()
@@ -0,0 +1,212 @@
+"""
+Intent Routing and Model Tiers for the Client Assistant
+
+A cheap local classifier decides how each client message is answered,
+cheapest tier first:
+
+    template  Greetings, thanks/goodbyes and contact-info requests get a
+              fixed reply with no model call
+    cache     FAQ-style questions already answered for another visitor come
+              from the semantic answer cache (see AssistantSession)
+    light     Short, simple questions the knowledge base covers well go to
+              the lighter model
+    full      Long or multi-part messages, escalations, regulatory detail and
+              concrete project discussions go to the full model
+
+Every decision is logged with its latency to ROUTING_LOG_PATH (JSON lines)
+and kept in memory for the chat page, so the thresholds below can be tuned
+from real traffic.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.knowledge_base import KnowledgeBase
+from modules.lead_qualification import LeadQualifier
+from modules.paths import DATA_DIR
+
+TIERS = ("template", "cache", "prefetch", "light", "full")
+
+# Intents whose replies depend on this visitor's details, so never come from the answer cache
+TAILORED_INTENTS = ("project", "complex", "escalation")
+
+ROUTING_LOG_PATH = Path(os.getenv("ASSISTANT_ROUTING_LOG", DATA_DIR / "assistant_routing.jsonl"))
+
+# Messages longer than this always go to the full model
+COMPLEX_MIN_WORDS = 40
+# Longest message the light model answers
+LIGHT_MAX_WORDS = 18
+# Minimum BM25 score of the best knowledge base chunk for the light tier
+LIGHT_MIN_RETRIEVAL_SCORE = 3.0
+
+COMPANY_PHONE = "(555) 123-4567"
+COMPANY_EMAIL = "info@sebuilders.com"
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+_GREETING_WORDS = {
+    "hi", "hello", "hey", "hiya", "howdy", "greetings", "good", "morning", "afternoon", "evening",
+    "there", "team", "yo", "sup",
+}
+_THANKS = re.compile(
+    r"^(?:ok(?:ay)?[, ]*)?(?:thanks?(?: you)?|thank you(?: so much| very much)?|ty|great|perfect|awesome|"
+    r"got it|bye|goodbye|that'?s all|that'?s it|have a (?:good|great|nice) (?:day|one))"
+    r"(?:[, ]+(?:so much|a lot|again|bye|goodbye|for (?:the|your) help|that'?s all))*[.! ]*$"
+)
+# Requests for *our* contact details (not the visitor sharing theirs or asking us to email them)
+_CONTACT = re.compile(
+    r"\b(?:(?:your|the|company'?s?) (?:phone(?: number)?|number|e-?mail(?: address)?|address|"
+    r"contact (?:info|information|details))|"
+    r"how (?:can|do|should) i (?:reach|contact|call|e-?mail|get in touch with) (?:you|your team|someone|the team)|"
+    r"(?:can|could|may|should) (?:i|we) (?:call|reach|contact|e-?mail) you(?:r team)?|talk to (?:your|the) team)\b"
+)
+# A message carrying an email address or phone number is the visitor sharing theirs
+_SHARED_CONTACT = re.compile(
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|(?<!\d)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)"
+)
+# Wording that calls for careful, detailed answers
+_COMPLEX = re.compile(
+    r"\b(?:seismic|oshpd|hcai|medical gas|icra|infection control risk|compare|comparison|versus|vs\.?|"
+    r"pros and cons|trade-?offs?|break ?down|phasing|occupied|retrofit|code requirements?|nfpa|fgi)\b"
+)
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return values[min(int(q * len(values)), len(values) - 1)] if values else None
+
+
+def _template_reply(intent: str) -> str:
+    if intent == "greeting":
+        return (
+            "Hello! 👋 Thanks for reaching out to SE Builders. I can help with our healthcare "
+            "construction services, typical timelines and budgets, past projects, or scheduling a "
+            "consultation. What are you planning?"
+        )
+    if intent == "thanks":
+        return (
+            "You're welcome! If you'd like to talk through your project with our team, call "
+            f"{COMPANY_PHONE} or email {COMPANY_EMAIL}. Have a great day!"
+        )
+    return (
+        "You can reach the SE Builders team at:\n\n"
+        f"📞 **Phone:** {COMPANY_PHONE}\n\n"
+        f"📧 **Email:** {COMPANY_EMAIL}\n\n"
+        "Would you like to schedule a consultation? Share your name and email and our team will "
+        "follow up."
+    )
+
+
+def classify_message(
+    message: str,
+    escalations: Optional[List[str]] = None,
+    lead: Optional[LeadQualifier] = None,
+    knowledge_base: Optional[KnowledgeBase] = None
+) -> Dict:
+    """
+    Pick the tier for a client message
+
+    Args:
+        message: Client message
+        escalations: Escalation flags raised by this message
+        lead: Lead profile of the conversation
+        knowledge_base: Used to check whether the knowledge base covers it
+
+    Returns:
+        Dict with intent, tier, reason and (for templates) the reply
+    """
+    text = message.lower().strip()
+    words = _WORD.findall(text)
+
+    if escalations:
+        return {"intent": "escalation", "tier": "full", "reason": "escalation: " + ", ".join(escalations)}
+
+    if words and len(words) <= 6 and all(w in _GREETING_WORDS for w in words):
+        return {"intent": "greeting", "tier": "template", "reason": "greeting",
+                "reply": _template_reply("greeting")}
+    if len(words) <= 10 and _THANKS.match(text):
+        return {"intent": "thanks", "tier": "template", "reason": "thanks or goodbye",
+                "reply": _template_reply("thanks")}
+    if len(words) <= 12 and _CONTACT.search(text) and not _SHARED_CONTACT.search(text):
+        return {"intent": "contact", "tier": "template", "reason": "contact info request",
+                "reply": _template_reply("contact")}
+
+    if len(words) > COMPLEX_MIN_WORDS:
+        return {"intent": "complex", "tier": "full", "reason": f"{len(words)} words"}
+    if text.count("?") > 1:
+        return {"intent": "complex", "tier": "full", "reason": "several questions"}
+    match = _COMPLEX.search(text)
+    if match:
+        return {"intent": "complex", "tier": "full", "reason": f"detailed topic ({match.group(0)})"}
+    if lead is not None and lead.profile["facility_type"] and (lead.profile["square_feet"] or lead.profile["budget"]):
+        return {"intent": "project", "tier": "full", "reason": "concrete project discussion"}
+
+    if len(words) <= LIGHT_MAX_WORDS:
+        top = knowledge_base.search(message, 1) if knowledge_base is not None else []
+        if top and top[0]["score"] >= LIGHT_MIN_RETRIEVAL_SCORE:
+            return {"intent": "faq", "tier": "light", "reason": f"knowledge base match {top[0]['score']:.1f}"}
+        return {"intent": "simple", "tier": "light", "reason": "short message"}
+
+    return {"intent": "general", "tier": "full", "reason": "default"}
+
+
+class RoutingLog:
+    """Routing decisions with latency, in memory and as JSON lines"""
+
+    def __init__(self, path: Optional[Path] = ROUTING_LOG_PATH, keep: int = 2000):
+        self.path = path
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def record(self, route: Dict, latency_ms: float, first_token_ms: Optional[float] = None, ok: bool = True):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "intent": route["intent"],
+            "tier": route["tier"],
+            "reason": route["reason"],
+            "latency_ms": round(latency_ms, 1),
+            "first_token_ms": None if first_token_ms is None else round(first_token_ms, 1),
+            "ok": ok
+        }
+        with self._lock:
+            self.recent.append(entry)
+            if self.path:
+                try:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError:
+                    pass  # Logging must never break the chat
+
+    def stats(self) -> List[Dict]:
+        """Per-tier message count and latency percentiles (ms)"""
+        with self._lock:
+            entries = list(self.recent)
+
+        rows = []
+        for tier in TIERS:
+            latencies = sorted(e["latency_ms"] for e in entries if e["tier"] == tier and e["ok"])
+            count = sum(1 for e in entries if e["tier"] == tier)
+            if not count:
+                continue
+            rows.append({
+                "tier": tier,
+                "messages": count,
+                "share": count / len(entries),
+                "p50_ms": _percentile(latencies, 0.5),
+                "p95_ms": _percentile(latencies, 0.95),
+                "errors": sum(1 for e in entries if e["tier"] == tier and not e["ok"])
+            })
+        return rows
+
+
+@lru_cache(maxsize=1)
+def get_routing_log() -> RoutingLog:
+    """Process-wide routing log"""
+    return RoutingLog()
@@ -0,0 +1,227 @@
+"""
+Client Assistant Knowledge Base
+
+Company knowledge for the client assistant lives in Markdown files under
+modules/data/knowledge_base (services, projects, timelines, pricing, OSHPD
+FAQ, ...) instead of one prompt string. Each file is split into chunks at
+its headings, and the chunks are indexed with BM25 in NumPy:
+
+- Every term keeps a postings array of chunk ids and precomputed BM25
+  weights, so a query only touches the chunks that contain its terms
+- Only the top-k chunks for a message are sent to the model, so the prompt
+  stays the same size however many documents the knowledge base holds
+- The index is rebuilt automatically when a file is added or edited
+
+Add knowledge by dropping a new .md file into the directory; "## " headings
+start a new chunk, and long sections are split further at paragraphs.
+"""
+
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+KNOWLEDGE_DIR = Path(os.getenv(
+    "KNOWLEDGE_BASE_DIR",
+    Path(__file__).resolve().parent / "data" / "knowledge_base"
+))
+
+# Chunks sent with each message
+DEFAULT_TOP_K = 4
+
+# Sections longer than this are split at paragraph boundaries
+MAX_CHUNK_CHARS = 900
+
+# BM25 parameters (standard values)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+_STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "as", "at", "be", "by", "can", "do", "does",
+    "for", "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "our", "so", "that", "the", "their", "them", "there", "this", "to", "us", "was",
+    "we", "what", "when", "where", "which", "who", "will", "with", "would", "you", "your",
+    # Contraction fragments ("what's", "don't", "we're")
+    "s", "t", "re", "ve", "ll", "d", "m",
+}
+
+
+def _stem(word: str) -> str:
+    """Fold plurals so "centers"/"center" and "facilities"/"facility" match"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, drop stopwords and stem"""
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _split_long(text: str, limit: int) -> List[str]:
+    """Split a section at paragraph (then line) boundaries to fit the limit"""
+    if len(text) <= limit:
+        return [text]
+
+    pieces, current = [], ""
+    for block in re.split(r"\n\s*\n", text):
+        parts = block.splitlines() if len(block) > limit else [block]
+        for part in parts:
+            if current and len(current) + len(part) + 1 > limit:
+                pieces.append(current.strip())
+                current = ""
+            current += part + "\n"
+        current += "\n"
+    if current.strip():
+        pieces.append(current.strip())
+    return pieces
+
+
+def chunk_document(text: str, source: str, max_chars: int = MAX_CHUNK_CHARS) -> List[Dict]:
+    """
+    Split a Markdown document into retrievable chunks
+
+    The "# " title names the document; every deeper heading starts a new
+    chunk and keeps that heading so the model sees where the text came from.
+
+    Args:
+        text: Markdown contents
+        source: File name the document was loaded from
+        max_chars: Longest chunk body before it is split at paragraphs
+
+    Returns:
+        List of dicts with source, title, heading and text
+    """
+    title = Path(source).stem.replace("_", " ").title()
+    sections: List[Tuple[str, List[str]]] = []
+    heading, lines = "", []
+
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match and len(match.group(1)) == 1 and not sections and not any(l.strip() for l in lines):
+            title = match.group(2).strip()
+            continue
+        if match:
+            sections.append((heading, lines))
+            heading, lines = match.group(2).strip(), []
+        else:
+            lines.append(line)
+    sections.append((heading, lines))
+
+    chunks = []
+    for heading, lines in sections:
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+        for piece in _split_long(body, max_chars):
+            chunks.append({"source": source, "title": title, "heading": heading, "text": piece})
+    return chunks
+
+
+class KnowledgeBase:
+    """BM25 index over knowledge base chunks"""
+
+    def __init__(self, chunks: List[Dict]):
+        self.chunks = chunks
+        self.version = hashlib.sha256(
+            "\x00".join(f"{c['source']}|{c['heading']}|{c['text']}" for c in chunks).encode("utf-8")
+        ).hexdigest()[:16]
+
+        # Headings are indexed with the text so "OSHPD FAQ" finds the FAQ chunks
+        docs = [Counter(tokenize(f"{c['title']} {c['heading']} {c['text']}")) for c in chunks]
+        lengths = np.array([sum(doc.values()) for doc in docs], dtype=np.float32)
+        average = float(lengths.mean()) if len(docs) else 0.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for chunk_id, doc in enumerate(docs):
+            for term, count in doc.items():
+                postings.setdefault(term, []).append((chunk_id, count))
+
+        # term -> (chunk ids, BM25 weight of the term in each chunk)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        n = len(docs)
+        for term, entries in postings.items():
+            ids = np.array([chunk_id for chunk_id, _ in entries], dtype=np.int32)
+            tf = np.array([count for _, count in entries], dtype=np.float32)
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average)
+            self._postings[term] = (ids, (idf * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32))
+
+    @classmethod
+    def from_directory(cls, directory: Path = KNOWLEDGE_DIR) -> "KnowledgeBase":
+        """Load and chunk every .md/.txt file in a directory"""
+        chunks = []
+        for path in sorted(Path(directory).glob("*")):
+            if path.suffix.lower() in (".md", ".txt"):
+                chunks.extend(chunk_document(path.read_text(encoding="utf-8"), path.name))
+        return cls(chunks)
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[Dict]:
+        """
+        Find the chunks most relevant to a query
+
+        Args:
+            query: Client message (optionally with the previous message)
+            k: Maximum number of chunks
+
+        Returns:
+            Chunks with a "score", best first; empty if nothing matches
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self._postings:
+                ids, weights = self._postings[term]
+                scores[ids] += weights
+
+        matched = np.flatnonzero(scores)
+        if not len(matched) or k <= 0:
+            return []
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        return [{**self.chunks[i], "score": round(float(scores[i]), 3)} for i in matched]
+
+    def build_context(self, query: str, k: int = DEFAULT_TOP_K) -> str:
+        """Relevant chunks formatted for the prompt ("" if nothing matches)"""
+        results = self.search(query, k)
+        if not results:
+            return ""
+
+        sections = []
+        for chunk in results:
+            heading = f"{chunk['title']} - {chunk['heading']}" if chunk["heading"] else chunk["title"]
+            sections.append(f"[{heading}]\n{chunk['text']}")
+        return "RELEVANT SE BUILDERS INFORMATION:\n\n" + "\n\n".join(sections)
+
+
+def _directory_signature(directory: Path) -> Tuple:
+    """File names, sizes and modification times, to notice edits"""
+    if not directory.is_dir():
+        return ()
+    return tuple(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns)
+        for p in sorted(directory.glob("*")) if p.suffix.lower() in (".md", ".txt")
+    )
+
+
+@lru_cache(maxsize=4)
+def _load(directory: Path, signature: Tuple) -> KnowledgeBase:
+    return KnowledgeBase.from_directory(directory)
+
+
+def get_knowledge_base(directory: Path = KNOWLEDGE_DIR) -> KnowledgeBase:
+    """Shared knowledge base, rebuilt when its files change"""
+    directory = Path(directory)
+    return _load(directory, _directory_signature(directory))
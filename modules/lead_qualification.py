@@ -0,0 +1,432 @@
+"""
+Lead Qualification and Escalation Engine
+
+Reads each client chat message as it arrives and keeps a structured lead
+profile (facility type, size, budget, timeline, location, stage, contact
+details) with a 0-100 score - no model calls:
+
+- Keywords and phrases (facility types, cities, escalation wording) sit in
+  one word n-gram table, so a message is scanned once with a dict probe per
+  word regardless of how many phrases are configured
+- Numbers with units (sq ft, budgets, dates) use a few compiled regular
+  expressions on the lowercased message
+- Rules combine facts, e.g. budget per sq ft against the typical ranges
+
+Processing a message only looks at that message, so updates take
+microseconds however long the conversation gets.
+
+The escalation triggers from the assistant instructions are checked here
+as well, so they no longer depend on the model noticing them:
+
+- Specific or detailed pricing requested
+- Complex regulatory questions
+- Legal or contract discussions
+- Budget far outside the typical ranges
+- Client frustration
+- RFP or formal proposal requested
+- Urgent timeline (less than 6 months)
+
+The profile is pushed to HubSpot as contact properties when a conversation
+is saved.
+"""
+
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# ==================== PHRASES ====================
+
+# Phrases are "|"-separated and matched on whole lowercase words, so
+# "x-ray", "X Ray" and "x ray" are the same phrase.
+
+# Canonical facility type -> phrases; earlier types win when several match
+FACILITY_TYPES = {
+    "Hospital": "hospital|hospitals|acute care|patient tower|bed tower|emergency department|er expansion",
+    "Surgery Center": "surgery center|surgery centers|surgery centre|surgical center|surgical centers|"
+                      "ambulatory surgery|ambulatory surgical|asc|ascs|operating room|operating rooms|"
+                      "operating suite|operating suites|or suites",
+    "Imaging Center": "imaging center|imaging centers|imaging|radiology|mri|ct scanner|ct suite|x ray|xray",
+    "Urgent Care": "urgent care",
+    "Medical Office": "medical office|medical offices|medical office building|mob|mobs|doctor office|"
+                      "doctors office|physician office|physician offices|exam room|exam rooms",
+    "Dental Office": "dental|dental office|dentist|orthodontic|orthodontist",
+    "Laboratory": "laboratory|laboratories|lab|labs",
+    "Rehabilitation Center": "rehab|rehabilitation|physical therapy",
+    "Skilled Nursing": "skilled nursing|nursing home|snf|assisted living|memory care",
+    "Clinic": "clinic|clinics|outpatient",
+}
+
+SERVICE_AREA = {
+    "Orange County": "orange county|oc|irvine|newport beach|anaheim|santa ana|costa mesa|huntington beach|"
+                     "fullerton|mission viejo|laguna beach|laguna hills|laguna niguel",
+    "Los Angeles County": "los angeles|la|long beach|pasadena|santa monica|torrance|glendale|burbank",
+    "San Diego County": "san diego|carlsbad|oceanside|escondido|chula vista|la jolla",
+    "Riverside County": "riverside|temecula|corona|murrieta|palm springs",
+    "San Bernardino County": "san bernardino|ontario|rancho cucamonga|fontana|redlands",
+    "Ventura County": "ventura|oxnard|thousand oaks|simi valley|camarillo",
+}
+OUTSIDE_AREA = ("northern california|bay area|san francisco|sacramento|san jose|fresno|"
+                "oregon|nevada|las vegas|arizona|phoenix|texas")
+
+# Project stage -> phrases, most advanced first
+PROJECT_STAGES = {
+    "RFP / Bidding": "rfp|rfps|request for proposal|request for proposals|formal proposal|bid package|"
+                     "bid documents|bidding documents",
+    "Design": "architect|architects|architecture|construction documents|drawings|design development|"
+              "schematic design",
+    "Planning": "planning|feasibility|site selection|acquiring land|buying land|early stage|early stages|"
+                "just starting|just exploring",
+}
+
+URGENT_PHRASES = "asap|as soon as possible|urgent|urgently|immediately|right away|rush|fast track|fast tracked"
+
+ESCALATION_TRIGGERS = {
+    "detailed_pricing": "exact price|exact pricing|exact cost|exact quote|exact number|detailed price|"
+                        "detailed pricing|detailed quote|detailed estimate|firm price|firm quote|firm bid|"
+                        "specific price|specific pricing|specific cost|specific quote|itemized|final price|"
+                        "guaranteed price|guaranteed maximum price|gmp|quote|price quote|how much exactly",
+    "regulatory": "hcai|oshpd 1|oshpd 2|oshpd 3|oshpd 4|oshpd 5|seismic retrofit|seismic upgrade|"
+                  "seismic compliance|spc|npc|ceqa|variance|certificate of need|licensing survey|"
+                  "cms certification|cms survey",
+    "legal_contract": "contract|contracts|legal|lawyer|attorney|lawsuit|lien|liens|liability|indemnity|"
+                      "indemnification|bonding|insurance requirements",
+    "frustration": "frustrated|frustrating|frustration|annoyed|annoying|ridiculous|useless|not helpful|"
+                   "unhelpful|terrible|angry|waste of time|waste of my time|real person|actual person|"
+                   "talk to a human|speak to a human|talk to someone|speak to someone|taking too long",
+    "rfp": PROJECT_STAGES["RFP / Bidding"],
+}
+
+ESCALATION_LABELS = {
+    "detailed_pricing": "Specific pricing requested",
+    "regulatory": "Complex regulatory question",
+    "legal_contract": "Legal or contract discussion",
+    "budget_outside_range": "Budget outside typical ranges",
+    "frustration": "Client frustrated",
+    "rfp": "RFP or formal proposal requested",
+    "urgent_timeline": "Urgent timeline (under 6 months)",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class _PhraseTable:
+    """Word n-gram lookup: one dict probe per candidate n-gram"""
+
+    def __init__(self):
+        self.phrases: Dict[str, List[Tuple[str, str]]] = {}
+        # First words of multi-word phrases; other words only need a unigram probe
+        self.starts: Dict[str, int] = {}
+
+    def add(self, kind: str, value: str, phrases: str):
+        for phrase in phrases.split("|"):
+            words = _WORD.findall(phrase.lower())
+            self.phrases.setdefault(" ".join(words), []).append((kind, value))
+            if len(words) > 1:
+                self.starts[words[0]] = max(self.starts.get(words[0], 1), len(words))
+
+    def scan(self, words: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+        """Matches by kind, as (value, matched phrase) in message order"""
+        found: Dict[str, List[Tuple[str, str]]] = {}
+        for i, word in enumerate(words):
+            longest = self.starts.get(word, 1)
+            for n in range(min(longest, len(words) - i), 0, -1):
+                phrase = word if n == 1 else " ".join(words[i:i + n])
+                for kind, value in self.phrases.get(phrase, ()):
+                    found.setdefault(kind, []).append((value, phrase))
+        return found
+
+
+_PHRASES = _PhraseTable()
+for _name, _phrases in FACILITY_TYPES.items():
+    _PHRASES.add("facility", _name, _phrases)
+for _name, _phrases in SERVICE_AREA.items():
+    _PHRASES.add("location", _name, _phrases)
+_PHRASES.add("outside", "", OUTSIDE_AREA)
+for _name, _phrases in PROJECT_STAGES.items():
+    _PHRASES.add("stage", _name, _phrases)
+for _name, _phrases in ESCALATION_TRIGGERS.items():
+    _PHRASES.add("escalation", _name, _phrases)
+_PHRASES.add("urgent", "", URGENT_PHRASES)
+
+# ==================== NUMBERS AND CONTACTS ====================
+
+# Patterns run on the lowercased message
+
+_NUMBER = r"(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)"
+
+_SQUARE_FEET = re.compile(_NUMBER + r"\s*(k)?\s*[- ]?(?:sq\.?\s*f(?:ee)?t\.?|square[- ]f(?:ee|oo)t|sf\b|sqft\b)")
+
+# "$4.5m", "$900k", "4 million dollars", "budget of 12 million"
+_BUDGET = re.compile(
+    r"\$\s*" + _NUMBER + r"\s*(k|m|mm|million|thousand|b|billion)?\b(?!\s*(?:per|/)\s*(?:sq|square|sf))"
+    r"|" + _NUMBER + r"\s*(million|billion|thousand)\b"
+)
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6, "b": 1e9, "billion": 1e9}
+
+_TIMELINE_SPAN = re.compile(
+    r"\b(?:in|within|next|under|less than|about|around|over)\s+(?:the\s+next\s+)?" + _NUMBER +
+    r"\s*(weeks?|months?|years?)\b"
+)
+_TIMELINE_QUARTER = re.compile(r"\b(?:by|in|before|for)\s+(?:the\s+)?(?:end of\s+)?q([1-4])\s*(?:of\s+)?'?(20\d{2}|\d{2})\b")
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december"]
+_TIMELINE_MONTH = re.compile(
+    r"\b(?:by|in|before|until|open(?:ing)?(?: in)?)\s+("
+    + "|".join(_MONTHS) + r"|(?:jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec)\.?)\s+(20\d{2})\b"
+)
+_TIMELINE_YEAR = re.compile(r"\b(?:by|in|before|during|open(?:ing)?(?: in)?)\s+(?:early |mid[- ]|late )?(20\d{2})\b")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"(?<!\d)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)")
+_DECISION_MAKER = re.compile(
+    r"\bi(?:'m| am)\s+(?:the\s+|a\s+|an\s+)?(?:\w+\s+)?"
+    r"(ceo|coo|cfo|president|owner|founder|partner|administrator|director|vp|vice president|"
+    r"facilities manager|facility manager|project manager|physician|doctor|dentist|practice manager)\b"
+)
+
+# ==================== SCORING ====================
+
+# Typical cost per sq ft (see knowledge base pricing); well outside this is escalated
+TYPICAL_COST_PER_SQFT = (200, 900)
+# Budgets above this always go to the team
+LARGE_BUDGET = 100_000_000
+URGENT_MONTHS = 6
+
+# Points per known fact; total 100
+SCORE_WEIGHTS = {
+    "facility_type": 15,
+    "square_feet": 10,
+    "budget": 20,
+    "timeline": 15,
+    "location": 10,
+    "contact": 10,
+    "decision_maker": 10,
+    "stage": 10,
+}
+HOT_SCORE = 70
+WARM_SCORE = 40
+
+
+def _to_number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _months_until(year: int, month: int, today: date) -> int:
+    return max((year - today.year) * 12 + month - today.month, 0)
+
+
+# ==================== QUALIFIER ====================
+
+class LeadQualifier:
+    """Incrementally built lead profile, score and escalation flags for one chat"""
+
+    def __init__(self, today: Optional[date] = None):
+        self.today = today or date.today()
+        self.profile: Dict = {
+            "facility_type": None,
+            "square_feet": None,
+            "budget": None,
+            "timeline_months": None,
+            "timeline_text": None,
+            "urgent": False,
+            "location": None,
+            "in_service_area": None,
+            "stage": None,
+            "email": None,
+            "phone": None,
+            "decision_maker": None,
+        }
+        self.flags: Dict[str, str] = {}
+        self.messages = 0
+
+    def update(self, message: str) -> List[str]:
+        """
+        Read one client message into the profile
+
+        Args:
+            message: Text the client sent
+
+        Returns:
+            Escalation flags raised by this message (not raised before)
+        """
+        self.messages += 1
+        profile = self.profile
+        before = set(self.flags)
+        text = message.lower()
+        found = _PHRASES.scan(_WORD.findall(text))
+
+        if "facility" in found and not profile["facility_type"]:
+            names = {name for name, _ in found["facility"]}
+            profile["facility_type"] = next(name for name in FACILITY_TYPES if name in names)
+
+        if "location" in found:
+            profile["location"] = found["location"][0][0]
+            profile["in_service_area"] = True
+        elif "outside" in found and not profile["location"]:
+            profile["location"] = found["outside"][0][1].title()
+            profile["in_service_area"] = False
+
+        if "stage" in found:
+            stages = list(PROJECT_STAGES)
+            best = min(stages.index(name) for name, _ in found["stage"])
+            if profile["stage"] is None or best < stages.index(profile["stage"]):
+                profile["stage"] = stages[best]
+
+        if "urgent" in found:
+            profile["urgent"] = True
+
+        for flag, phrase in found.get("escalation", ()):
+            self.flags.setdefault(flag, phrase)
+
+        for match in _SQUARE_FEET.finditer(text):
+            value = _to_number(match.group(1)) * (1000 if match.group(2) else 1)
+            if value >= 500:
+                profile["square_feet"] = int(value)
+
+        if "$" in text or "illion" in text or "thousand" in text:
+            for match in _BUDGET.finditer(text):
+                amount, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+                value = _to_number(amount) * _MULTIPLIERS.get(unit or "", 1)
+                # Small dollar figures are prices per sq ft or fees, not project budgets
+                if value >= 100_000:
+                    profile["budget"] = int(value)
+
+        if any(ch.isdigit() for ch in text):
+            self._update_timeline(text)
+            match = _PHONE.search(text)
+            if match:
+                profile["phone"] = match.group(0)
+
+        if "@" in text:
+            match = _EMAIL.search(text)
+            if match:
+                profile["email"] = match.group(0)
+
+        match = _DECISION_MAKER.search(text)
+        if match:
+            role = match.group(1)
+            profile["decision_maker"] = role.upper() if len(role) <= 3 else role.title()
+
+        self._rule_flags()
+        return [flag for flag in self.flags if flag not in before]
+
+    def _update_timeline(self, text: str):
+        profile = self.profile
+        months = None
+
+        match = _TIMELINE_SPAN.search(text)
+        if match:
+            value = _to_number(match.group(1))
+            unit = match.group(2)
+            months = value / 4.3 if unit.startswith("week") else value * 12 if unit.startswith("year") else value
+        else:
+            match = _TIMELINE_QUARTER.search(text)
+            if match:
+                year = int(match.group(2))
+                year = year + 2000 if year < 100 else year
+                months = _months_until(year, int(match.group(1)) * 3, self.today)
+            else:
+                match = _TIMELINE_MONTH.search(text)
+                if match:
+                    month = next(i for i, name in enumerate(_MONTHS, 1) if name.startswith(match.group(1)[:3]))
+                    months = _months_until(int(match.group(2)), month, self.today)
+                else:
+                    match = _TIMELINE_YEAR.search(text)
+                    if match and int(match.group(1)) >= self.today.year:
+                        months = _months_until(int(match.group(1)), 12, self.today)
+
+        if months is not None:
+            profile["timeline_months"] = round(months, 1)
+            profile["timeline_text"] = match.group(0).strip()
+
+    def _rule_flags(self):
+        """Escalations that depend on several facts"""
+        profile = self.profile
+
+        if "urgent_timeline" not in self.flags:
+            months = profile["timeline_months"]
+            if profile["urgent"] or (months is not None and months < URGENT_MONTHS):
+                self.flags["urgent_timeline"] = profile["timeline_text"] or "urgent"
+
+        if "budget_outside_range" not in self.flags and profile["budget"]:
+            budget = profile["budget"]
+            if budget > LARGE_BUDGET:
+                self.flags["budget_outside_range"] = f"${budget:,.0f}"
+            elif profile["square_feet"]:
+                per_sqft = budget / profile["square_feet"]
+                low, high = TYPICAL_COST_PER_SQFT
+                if not low <= per_sqft <= high:
+                    self.flags["budget_outside_range"] = f"${per_sqft:,.0f} per sq ft"
+
+    # ==================== RESULTS ====================
+
+    @property
+    def score(self) -> int:
+        profile = self.profile
+        known = {
+            "facility_type": profile["facility_type"],
+            "square_feet": profile["square_feet"],
+            "budget": profile["budget"],
+            "timeline": profile["timeline_months"] is not None or profile["urgent"],
+            "location": profile["in_service_area"],
+            "contact": profile["email"] or profile["phone"],
+            "decision_maker": profile["decision_maker"],
+            "stage": profile["stage"],
+        }
+        return sum(weight for fact, weight in SCORE_WEIGHTS.items() if known[fact])
+
+    @property
+    def grade(self) -> str:
+        score = self.score
+        if score >= HOT_SCORE:
+            return "Hot"
+        if score >= WARM_SCORE:
+            return "Warm"
+        return "Cold"
+
+    def escalation_labels(self) -> List[str]:
+        return [ESCALATION_LABELS[flag] for flag in self.flags]
+
+    def summary(self) -> str:
+        """Readable lead profile for notes and the team"""
+        profile = self.profile
+        lines = [f"Lead score: {self.score}/100 ({self.grade})"]
+
+        if profile["facility_type"]:
+            lines.append(f"Facility type: {profile['facility_type']}")
+        if profile["square_feet"]:
+            lines.append(f"Size: {profile['square_feet']:,} sq ft")
+        if profile["budget"]:
+            lines.append(f"Budget: ${profile['budget']:,.0f}")
+        if profile["timeline_months"] is not None:
+            lines.append(f"Timeline: {profile['timeline_text']} (~{profile['timeline_months']:g} months)")
+        if profile["urgent"]:
+            lines.append("Client described the project as urgent")
+        if profile["location"]:
+            area = "" if profile["in_service_area"] else " (outside service area)"
+            lines.append(f"Location: {profile['location']}{area}")
+        if profile["stage"]:
+            lines.append(f"Stage: {profile['stage']}")
+        if profile["decision_maker"]:
+            lines.append(f"Role: {profile['decision_maker']}")
+        if self.flags:
+            lines.append("Escalation: " + "; ".join(
+                f"{ESCALATION_LABELS[flag]} (\"{trigger}\")" for flag, trigger in self.flags.items()
+            ))
+        return "\n".join(lines)
+
+    def hubspot_properties(self) -> Dict:
+        """Contact properties for HubSpot (empty values are dropped by the caller)"""
+        profile = self.profile
+        return {
+            "ai_lead_score": str(self.score),
+            "ai_lead_grade": self.grade,
+            "ai_facility_type": profile["facility_type"] or "",
+            "ai_square_feet": str(profile["square_feet"] or ""),
+            "ai_budget": str(profile["budget"] or ""),
+            "ai_timeline_months": "" if profile["timeline_months"] is None else f"{profile['timeline_months']:g}",
+            "ai_project_location": profile["location"] or "",
+            "ai_project_stage": profile["stage"] or "",
+            "ai_escalation_flags": ";".join(self.flags),
+            "hs_lead_status": "OPEN" if self.flags or self.grade == "Hot" else "",
+        }
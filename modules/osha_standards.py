@@ -0,0 +1,321 @@
+"""
+Offline OSHA 29 CFR 1926 Standards Index
+
+The safety prompt asks Gemini for an "OSHA Reference" per hazard, and those
+citations are often malformed, point at sections that don't exist, or are
+missing entirely. This module checks them locally against a bundled index
+of 1926 subparts and sections (modules/data/osha_1926.json):
+
+- Only sections with a detailed entry validate; a number that merely falls
+  in a subpart's section range is reported as unverified, since most
+  numbers in those ranges do not exist
+- A character trie over the detailed sections normalizes cited references
+  and lists nearby sections for near-misses
+- An inverted keyword index suggests the right section from the hazard
+  description
+
+Everything runs in-process with no model calls.
+"""
+
+import json
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+INDEX_PATH = Path(__file__).resolve().parent / "data" / "osha_1926.json"
+
+# "29 CFR 1926.501(b)(1)", "§1926.501", "OSHA 1910.132", "1926.451 (g)(1)"
+_CITATION = re.compile(
+    r"(?:29\s*C\.?\s*F\.?\s*R\.?\s*(?:part\s*)?)?§*\s*"
+    r"\b(19(?:26|10))\s*\.\s*(\d{1,4})((?:\s*\([a-z0-9]{1,4}\))*)",
+    re.IGNORECASE
+)
+# "Subpart M", "1926 Subpart X"
+_SUBPART = re.compile(r"\bsubpart\s+([A-Z]{1,2})\b", re.IGNORECASE)
+
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)?")
+
+# Longest keyword phrase in the index, in words
+_MAX_PHRASE = 3
+
+
+class _TrieNode:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entry: Optional[Dict] = None
+
+
+class OshaIndex:
+    """Prefix trie and inverted keyword index over 29 CFR 1926"""
+
+    def __init__(self, data: Dict):
+        self._root = _TrieNode()
+        self.subparts: Dict[str, Dict] = {}
+        self.sections: Dict[str, Dict] = {}
+
+        keyword_sections: Dict[str, set] = defaultdict(set)
+
+        # (first, last, subpart) section number ranges, in order
+        self._ranges = []
+
+        for subpart in data["subparts"]:
+            self.subparts[subpart["id"]] = subpart
+            self._ranges.append((subpart["range"][0], subpart["range"][1], subpart))
+            for section in subpart["sections"]:
+                entry = {
+                    "section": section["section"],
+                    "title": section["title"],
+                    "subpart": subpart["id"],
+                    "subpart_title": subpart["title"]
+                }
+                self.sections[section["section"]] = entry
+                self._insert(section["section"], entry)
+                for keyword in section["keywords"]:
+                    keyword_sections[" ".join(_WORD.findall(keyword.lower()))].add(section["section"])
+
+        # Inverted index: keyword phrase -> {section: weight}. Multi-word and
+        # rarer phrases are stronger evidence than common single words.
+        total = len(self.sections)
+        self._keywords: Dict[str, Dict[str, float]] = {}
+        for phrase, sections in keyword_sections.items():
+            weight = len(phrase.split()) * math.log(1 + total / len(sections))
+            self._keywords[phrase] = {section: weight for section in sections}
+
+    # ==================== TRIE ====================
+
+    def _insert(self, key: str, entry: Dict):
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.entry = entry
+
+    def _find_node(self, key: str) -> Optional[_TrieNode]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, section: str) -> Optional[Dict]:
+        """Exact section lookup, e.g. "1926.501" """
+        node = self._find_node(section)
+        return node.entry if node else None
+
+    def subpart_for(self, section: str) -> Optional[Dict]:
+        """Subpart whose section range contains a 1926 section number"""
+        try:
+            number = int(section.split(".", 1)[1])
+        except (IndexError, ValueError):
+            return None
+        for first, last, subpart in self._ranges:
+            if first <= number <= last:
+                return subpart
+        return None
+
+    def complete(self, prefix: str, limit: int = 5) -> List[Dict]:
+        """Sections whose number starts with prefix, in numeric order"""
+        node = self._find_node(prefix)
+        if node is None:
+            return []
+
+        found = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.entry:
+                found.append(current.entry)
+            stack.extend(current.children.values())
+
+        found.sort(key=lambda e: float(e["section"].split(".", 1)[1]))
+        return found[:limit]
+
+    def nearest(self, section: str, limit: int = 3) -> List[Dict]:
+        """Sections sharing the longest prefix with an unknown section number"""
+        for length in range(len(section), len("1926."), -1):
+            matches = self.complete(section[:length], limit)
+            if matches:
+                return matches
+        return []
+
+    # ==================== VALIDATION ====================
+
+    def parse_citations(self, text: str) -> List[Dict]:
+        """
+        Find and normalize every OSHA citation in a reference string
+
+        Returns:
+            One dict per citation with the cited text, normalized form,
+            validity, whether it is unverified (inside a subpart's range but
+            not in the index), and the matching section entry (if any)
+        """
+        citations = []
+
+        for match in _CITATION.finditer(text or ""):
+            part, number, paragraphs = match.group(1), match.group(2), match.group(3)
+            section = f"{part}.{number}"
+            paragraphs = re.sub(r"\s+", "", paragraphs or "").lower()
+            normalized = f"29 CFR {section}{paragraphs}"
+
+            citation = {
+                "cited": match.group(0).strip(),
+                "normalized": normalized,
+                "section": section,
+                "valid": False,
+                "unverified": False,
+                "entry": None,
+                "note": ""
+            }
+
+            if part == "1910":
+                citation["note"] = "General industry standard (1910), not construction (1926)"
+            else:
+                entry = self.lookup(section)
+                subpart = self.subpart_for(section)
+                if entry:
+                    citation["valid"] = True
+                    citation["entry"] = entry
+                elif subpart:
+                    # Inside a subpart's range, but most numbers there are not real sections
+                    citation["unverified"] = True
+                    citation["entry"] = {"subpart": subpart["id"], "subpart_title": subpart["title"]}
+                    citation["note"] = (
+                        f"Not in the bundled index; check that it exists in Subpart {subpart['id']} "
+                        f"({subpart['title']})"
+                    )
+                else:
+                    near = self.nearest(section)
+                    citation["note"] = "Section not found in 29 CFR 1926"
+                    if near:
+                        citation["note"] += "; nearby: " + ", ".join(e["section"] for e in near)
+
+            citations.append(citation)
+
+        for match in _SUBPART.finditer(text or ""):
+            subpart_id = match.group(1).upper()
+            subpart = self.subparts.get(subpart_id)
+            citations.append({
+                "cited": match.group(0),
+                "normalized": f"29 CFR 1926 Subpart {subpart_id}",
+                "section": None,
+                "valid": subpart is not None,
+                "unverified": False,
+                "entry": {"subpart": subpart_id, "subpart_title": subpart["title"]} if subpart else None,
+                "note": "" if subpart else "Subpart not found in 29 CFR 1926"
+            })
+
+        return citations
+
+    def suggest(self, description: str, limit: int = 3) -> List[Dict]:
+        """
+        Suggest sections for a hazard description via the keyword index
+
+        Returns:
+            Section entries with a "score", best first
+        """
+        words = _WORD.findall((description or "").lower())
+        scores: Dict[str, float] = defaultdict(float)
+
+        seen = set()
+        for size in range(1, _MAX_PHRASE + 1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in seen:
+                    continue
+                seen.add(phrase)
+                for section, weight in self._keywords.get(phrase, {}).items():
+                    scores[section] += weight
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [{**self.sections[section], "score": round(score, 2)} for section, score in ranked]
+
+    def review(self, osha_reference: str, description: str) -> Dict:
+        """
+        Validate a hazard's cited reference and suggest the best section
+
+        Returns:
+            Dict with status (valid, unverified, invalid, missing), the
+            parsed citations, and keyword-based suggestions for the description
+        """
+        citations = self.parse_citations(osha_reference)
+        suggestions = self.suggest(description)
+
+        if not citations:
+            status = "missing"
+        elif all(c["valid"] for c in citations):
+            status = "valid"
+        elif all(c["valid"] or c["unverified"] for c in citations):
+            status = "unverified"
+        else:
+            status = "invalid"
+
+        return {
+            "status": status,
+            "citations": citations,
+            "suggestions": suggestions
+        }
+
+
+@lru_cache(maxsize=1)
+def get_osha_index() -> OshaIndex:
+    """Load the bundled index once per process"""
+    with open(INDEX_PATH, encoding="utf-8") as f:
+        return OshaIndex(json.load(f))
+
+
+def format_section(entry: Dict) -> str:
+    """e.g. "29 CFR 1926.501 - Duty to have fall protection (Subpart M)" """
+    return f"29 CFR {entry['section']} - {entry['title']} (Subpart {entry['subpart']})"
+
+
+def describe_reference_review(review: Dict) -> List[str]:
+    """
+    Human-readable lines for a review, used in task notes and the report UI
+
+    Returns:
+        Markdown lines, one per citation plus a suggestion when needed
+    """
+    lines = []
+
+    for citation in review["citations"]:
+        if citation["valid"] and citation["section"]:
+            entry = citation["entry"]
+            lines.append(f"✅ {citation['normalized']} - {entry['title']} (Subpart {entry['subpart']})")
+        elif citation["valid"]:
+            lines.append(f"✅ {citation['normalized']} - {citation['entry']['subpart_title']}")
+        elif citation["unverified"]:
+            lines.append(f"❔ {citation['normalized']} - {citation['note']}")
+        else:
+            lines.append(f"⚠️ \"{citation['cited']}\" - {citation['note']}")
+
+    if review["status"] != "valid" and review["suggestions"]:
+        lines.append(f"💡 Suggested: {format_section(review['suggestions'][0])}")
+
+    return lines
+
+
+def review_analysis_references(analysis: str, hazards: List[Dict] = None) -> List[str]:
+    """
+    Check the OSHA reference of every hazard in a per-photo analysis
+
+    Args:
+        analysis: Per-photo analysis text
+        hazards: Already-parsed hazards for the analysis, if available
+
+    Returns:
+        Markdown lines describing each hazard's validated references
+    """
+    from modules.safety_analysis import parse_hazards
+
+    index = get_osha_index()
+    lines = []
+    for number, hazard in enumerate(hazards if hazards is not None else parse_hazards(analysis), start=1):
+        review = index.review(hazard.get("osha_reference", ""), hazard["description"])
+        for line in describe_reference_review(review):
+            lines.append(f"Hazard {number}: {line}")
+    return lines
@@ -0,0 +1,14 @@
+"""
+Shared filesystem locations for the SE Builders AI Platform
+
+Runtime data (scan history, transcripts, upload spools) lives under a single
+data directory, which defaults to ./data next to app.py and can be moved with
+the SE_BUILDERS_DATA_DIR environment variable.
+"""
+
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DATA_DIR = Path(os.getenv("SE_BUILDERS_DATA_DIR", PROJECT_ROOT / "data"))
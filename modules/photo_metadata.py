@@ -0,0 +1,181 @@
+"""
+Site Photo Metadata and Site-Walk Clustering
+
+Phones and site cameras record when (and often where) each photo was taken
+in EXIF. Reading it only needs the file header: Pillow opens images lazily,
+so no pixel data is decoded here. Photos from one upload are then grouped
+into areas of the site walk by time gaps and GPS distance, so each area can
+be analyzed with its own location and shared context.
+"""
+
+import io
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+# EXIF tags
+_EXIF_IFD = 0x8769
+_GPS_IFD = 0x8825
+_DATETIME = 306
+_DATETIME_ORIGINAL = 36867
+_GPS_LAT_REF, _GPS_LAT, _GPS_LON_REF, _GPS_LON = 1, 2, 3, 4
+
+# A new area starts after this much time between photos...
+DEFAULT_MAX_GAP = timedelta(minutes=8)
+# ...or when a photo is this far from the area's center
+DEFAULT_MAX_DISTANCE_M = 40.0
+
+
+def _parse_exif_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _dms_to_degrees(dms, ref) -> Optional[float]:
+    try:
+        degrees, minutes, seconds = (float(v) for v in dms)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if str(ref).upper() in ("S", "W") else value
+
+
+def read_photo_metadata(name: str, data: bytes) -> Dict:
+    """
+    Read capture time and GPS position from a photo's EXIF header
+
+    Args:
+        name: File name
+        data: Raw image bytes
+
+    Returns:
+        Dict with name, taken_at (datetime or None), lat/lon (or None) and size
+    """
+    metadata = {"name": name, "taken_at": None, "lat": None, "lon": None, "size": None}
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            metadata["size"] = image.size
+            exif = image.getexif()
+    except Exception:
+        return metadata
+
+    if not exif:
+        return metadata
+
+    exif_ifd = exif.get_ifd(_EXIF_IFD)
+    metadata["taken_at"] = (
+        _parse_exif_datetime(exif_ifd.get(_DATETIME_ORIGINAL)) or
+        _parse_exif_datetime(exif.get(_DATETIME))
+    )
+
+    gps = exif.get_ifd(_GPS_IFD)
+    if gps and _GPS_LAT in gps and _GPS_LON in gps:
+        metadata["lat"] = _dms_to_degrees(gps[_GPS_LAT], gps.get(_GPS_LAT_REF, "N"))
+        metadata["lon"] = _dms_to_degrees(gps[_GPS_LON], gps.get(_GPS_LON_REF, "E"))
+
+    return metadata
+
+
+def distance_m(first: Tuple[float, float], second: Tuple[float, float]) -> float:
+    """Great-circle distance in meters between two (lat, lon) points"""
+    lat1, lon1 = map(math.radians, first)
+    lat2, lon2 = map(math.radians, second)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+def cluster_photos(
+    metadata: List[Dict],
+    max_gap: timedelta = DEFAULT_MAX_GAP,
+    max_distance_m: float = DEFAULT_MAX_DISTANCE_M
+) -> List[Dict]:
+    """
+    Group photos into site-walk areas
+
+    Photos are ordered by capture time; a new area starts when the time gap
+    to the previous photo exceeds max_gap, or when both the photo and the
+    area have GPS and the photo is farther than max_distance_m from the
+    area's center. Photos without a timestamp form one "Undated" group.
+
+    Args:
+        metadata: Results of read_photo_metadata()
+
+    Returns:
+        List of clusters with photo names, their positions in metadata
+        ("indices", unique even when names repeat), start/end times, center
+        and label
+    """
+    indexed = [dict(m, index=index) for index, m in enumerate(metadata)]
+    dated = sorted((m for m in indexed if m["taken_at"]), key=lambda m: m["taken_at"])
+    undated = [m for m in indexed if not m["taken_at"]]
+
+    clusters: List[Dict] = []
+    current = None
+
+    for photo in dated:
+        position = (photo["lat"], photo["lon"]) if photo["lat"] is not None else None
+
+        new_area = current is None or photo["taken_at"] - current["end"] > max_gap
+        if not new_area and position and current["center"]:
+            new_area = distance_m(position, current["center"]) > max_distance_m
+
+        if new_area:
+            current = {"photos": [], "indices": [], "start": photo["taken_at"], "end": photo["taken_at"],
+                       "center": None, "_points": []}
+            clusters.append(current)
+
+        current["photos"].append(photo["name"])
+        current["indices"].append(photo["index"])
+        current["end"] = photo["taken_at"]
+        if position:
+            current["_points"].append(position)
+            points = current["_points"]
+            current["center"] = (
+                sum(p[0] for p in points) / len(points),
+                sum(p[1] for p in points) / len(points)
+            )
+
+    for number, cluster in enumerate(clusters, start=1):
+        del cluster["_points"]
+        start, end = cluster["start"].strftime("%I:%M %p"), cluster["end"].strftime("%I:%M %p")
+        cluster["label"] = f"Area {number} ({start})" if start == end else f"Area {number} ({start}-{end})"
+
+    if undated:
+        clusters.append({
+            "photos": [m["name"] for m in undated],
+            "indices": [m["index"] for m in undated],
+            "start": None,
+            "end": None,
+            "center": None,
+            "label": "Undated photos"
+        })
+
+    return clusters
+
+
+def cluster_context(cluster: Dict) -> str:
+    """Shared prompt context for every photo in a cluster"""
+    lines = [f"SITE WALK AREA: {cluster['label']} - {len(cluster['photos'])} photo(s) taken together."]
+    if cluster["start"]:
+        lines.append(
+            f"Photos in this area were taken between {cluster['start'].strftime('%I:%M %p')} "
+            f"and {cluster['end'].strftime('%I:%M %p')} on {cluster['start'].strftime('%B %d, %Y')}."
+        )
+    if cluster["center"]:
+        lines.append(f"Approximate GPS position: {cluster['center'][0]:.5f}, {cluster['center'][1]:.5f}.")
+    if len(cluster["photos"]) > 1:
+        lines.append(
+            "Other photos of this area: " + ", ".join(cluster["photos"][:12]) +
+            ". The same hazard may appear in several of them; describe it consistently."
+        )
+    return "\n".join(lines)
@@ -0,0 +1,439 @@
+"""
+Safety Analysis Pipeline for SE Builders AI Platform
+
+Streamlit-free building blocks shared by the Safety Scanner page and the
+background scan jobs:
+- Prompt construction for per-photo hazard analysis
+- Image preparation for Gemini vision calls
+- Scan summary and text report generation
+
+Everything here is also safe to call outside a Streamlit script run, so the
+headless bulk scanner (safety_scan_cli.py) shares the exact same logic.
+"""
+
+import io
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import google.generativeai as genai
+from PIL import Image
+
+
+SAFETY_MODEL_NAME = "gemini-2.0-flash-exp"
+
+# Longest image side sent to the model; larger photos are downscaled first
+MAX_IMAGE_DIMENSION = 2048
+
+NO_HAZARDS_MARKER = "NO SAFETY HAZARDS DETECTED"
+
+
+def get_safety_model():
+    """Configure Gemini and return the vision model used for safety scans"""
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(model_name=SAFETY_MODEL_NAME)
+
+
+def image_to_part(image: Image.Image) -> Dict:
+    """
+    Convert a PIL image to a JPEG part for the Gemini API
+
+    Args:
+        image: Decoded PIL image
+
+    Returns:
+        Dict with mime_type and raw JPEG bytes
+    """
+    buf = io.BytesIO()
+    image.convert("RGB").save(buf, format="JPEG")
+    return {
+        "mime_type": "image/jpeg",
+        "data": buf.getvalue()
+    }
+
+
+def prepare_photo(path: str, max_dimension: int = MAX_IMAGE_DIMENSION) -> bytes:
+    """
+    Decode, downscale and re-encode a photo file as JPEG
+
+    Top-level so it can run in a process pool. JPEG draft mode lets Pillow
+    decode at a reduced scale instead of decoding the full pixel grid.
+
+    Args:
+        path: Image file on disk
+        max_dimension: Longest side of the output image
+
+    Returns:
+        JPEG bytes ready for build_photo_part()
+    """
+    with Image.open(path) as image:
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension))
+
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85)
+        return buf.getvalue()
+
+
+def build_photo_part(jpeg_bytes: bytes) -> Dict:
+    """Wrap already-encoded JPEG bytes as a Gemini image part"""
+    return {
+        "mime_type": "image/jpeg",
+        "data": jpeg_bytes
+    }
+
+
+def build_safety_prompt(
+    project_name: str,
+    location: str,
+    photo_name: str,
+    extra_context: str = ""
+) -> str:
+    """
+    Build the hazard analysis prompt for a single site photo
+
+    Args:
+        project_name: Project being inspected
+        location: Area of the site
+        photo_name: File name of the photo
+        extra_context: Optional notes about the image (e.g. that it is a tile)
+    """
+    context_block = f"\n{extra_context.strip()}\n" if extra_context else ""
+
+    return f"""You are a construction safety inspector analyzing a photo from a healthcare construction site.
+
+PROJECT: {project_name}
+LOCATION: {location if location else 'Not specified'}
+PHOTO: {photo_name}
+{context_block}
+Analyze this construction site photo for safety hazards and OSHA violations.
+
+Look for:
+
+1. **PPE (Personal Protective Equipment) Violations:**
+   - Missing hard hats
+   - No safety vests/high-visibility clothing
+   - Improper footwear
+   - Missing eye protection
+   - No fall protection harness when needed
+   - Missing gloves
+
+2. **Fall Hazards:**
+   - Unguarded edges or openings
+   - Missing guardrails
+   - Unsecured ladders
+   - Open holes or penetrations
+   - Improper scaffolding
+   - Damaged platforms
+
+3. **Electrical Hazards:**
+   - Exposed wiring
+   - Uncovered electrical panels
+   - Extension cords in unsafe locations
+   - Water near electrical equipment
+
+4. **Equipment & Material Safety:**
+   - Improperly stored materials
+   - Unstable stacks
+   - Heavy equipment in unsafe positions
+   - Tools left in walkways
+
+5. **Site Housekeeping:**
+   - Debris accumulation
+   - Trip hazards
+   - Blocked walkways or exits
+   - Poor organization
+
+6. **Healthcare-Specific Concerns:**
+   - Contamination risks
+   - Medical gas system hazards
+   - Clean room protocol violations
+
+For EACH hazard you identify, provide:
+- Severity: CRITICAL, MODERATE, or MINOR
+- Description: What is the hazard?
+- OSHA Reference: Relevant OSHA standard (if applicable)
+- Recommended Action: What should be done?
+
+If NO hazards are found, state that clearly.
+
+Format your response as:
+
+HAZARDS FOUND: [number]
+
+[For each hazard:]
+🔴 CRITICAL / 🟡 MODERATE / 🟢 MINOR
+Description: [detailed description]
+OSHA Reference: [standard number if applicable]
+Recommended Action: [specific corrective action]
+
+---
+
+If no hazards: "✅ NO SAFETY HAZARDS DETECTED - Site appears compliant"
+"""
+
+
+def analyze_photo(
+    model,
+    image_bytes: bytes,
+    photo_name: str,
+    project_name: str,
+    location: str,
+    extra_context: str = ""
+) -> str:
+    """
+    Run the hazard analysis for one photo
+
+    Args:
+        model: Gemini model from get_safety_model()
+        image_bytes: Raw uploaded image bytes (PNG or JPEG)
+        photo_name: File name shown in the prompt and report
+        project_name: Project being inspected
+        location: Area of the site the photo was taken in
+        extra_context: Optional shared context (e.g. the site-walk area)
+
+    Returns:
+        The model's analysis text
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    prompt = build_safety_prompt(project_name, location, photo_name, extra_context)
+    response = model.generate_content([image_to_part(image), prompt])
+    return response.text
+
+
+async def analyze_photo_async(
+    model,
+    jpeg_bytes: bytes,
+    photo_name: str,
+    project_name: str,
+    location: str
+) -> str:
+    """Async variant of analyze_photo() for photos prepared by prepare_photo()"""
+    prompt = build_safety_prompt(project_name, location, photo_name)
+    response = await model.generate_content_async([build_photo_part(jpeg_bytes), prompt])
+    return response.text
+
+
+def build_summary_prompt(all_hazards: List[Dict]) -> str:
+    """Build the overall summary prompt from per-photo analyses"""
+    combined_text = "\n\n".join([h['analysis'] for h in all_hazards])
+
+    return f"""Based on these safety scan results from {len(all_hazards)} photos:
+
+{combined_text}
+
+Provide:
+1. Overall Safety Score (0-100)
+2. Total number of hazards by severity (Critical, Moderate, Minor)
+3. Top 3 priority actions needed
+4. Overall site safety assessment (1-2 sentences)
+
+Format as:
+SAFETY SCORE: XX/100
+CRITICAL: X | MODERATE: X | MINOR: X
+
+TOP PRIORITIES:
+1. [action]
+2. [action]
+3. [action]
+
+ASSESSMENT: [brief assessment]
+"""
+
+
+def summarize_scan(model, all_hazards: List[Dict]) -> str:
+    """Generate the overall scan summary text"""
+    response = model.generate_content(build_summary_prompt(all_hazards))
+    return response.text
+
+
+def detect_severity(analysis: str) -> Optional[str]:
+    """
+    Detect the highest severity mentioned in an analysis
+
+    Returns:
+        CRITICAL, MODERATE, MINOR, or None if no hazards were reported
+    """
+    if NO_HAZARDS_MARKER in analysis:
+        return None
+
+    if "CRITICAL" in analysis or "🔴" in analysis:
+        return "CRITICAL"
+    elif "MODERATE" in analysis or "🟡" in analysis:
+        return "MODERATE"
+    elif "MINOR" in analysis or "🟢" in analysis:
+        return "MINOR"
+
+    return None
+
+
+def build_report_text(
+    project_name: str,
+    location: str,
+    all_hazards: List[Dict],
+    summary_text: str,
+    generated_at: datetime = None
+) -> str:
+    """Build the downloadable plain-text safety report"""
+    generated_at = generated_at or datetime.now()
+
+    report_text = f"""SE BUILDERS - SAFETY SCAN REPORT
+Generated: {generated_at.strftime('%B %d, %Y at %I:%M %p')}
+
+PROJECT: {project_name}
+LOCATION: {location if location else 'Not specified'}
+PHOTOS ANALYZED: {len(all_hazards)}
+
+{'=' * 60}
+
+"""
+    for hazard_data in all_hazards:
+        report_text += f"\nPHOTO: {hazard_data['file']}\n{'-' * 60}\n"
+        report_text += hazard_data['analysis'] + "\n\n"
+
+    report_text += f"\n{'=' * 60}\n\nOVERALL SUMMARY\n{'-' * 60}\n"
+    report_text += summary_text
+
+    return report_text
+
+
+# ==================== HAZARD PARSING ====================
+
+SEVERITY_ORDER = {"CRITICAL": 3, "MODERATE": 2, "MINOR": 1}
+
+SEVERITY_ICONS = {"CRITICAL": "🔴", "MODERATE": "🟡", "MINOR": "🟢"}
+
+_SEVERITY_LINE = re.compile(
+    r"^[\s*#>\-]*(?:severity[\s*]*:[\s*]*)?(?:🔴|🟡|🟢)?[\s*]*(CRITICAL|MODERATE|MINOR)\b",
+    re.IGNORECASE
+)
+_FIELD_LINE = re.compile(
+    r"^[\s*\-]*(description|osha reference|recommended action)[\s*]*:[\s*]*(.*)$",
+    re.IGNORECASE
+)
+_FIELD_KEYS = {
+    "description": "description",
+    "osha reference": "osha_reference",
+    "recommended action": "action"
+}
+
+_STOPWORDS = frozenset(
+    "a an the and or of in on at to for with without is are was were be by from near "
+    "this that there their it its as not no into onto over under".split()
+)
+
+
+def parse_hazards(analysis: str) -> List[Dict]:
+    """
+    Parse the per-photo analysis format into structured hazards
+
+    Args:
+        analysis: Model output following build_safety_prompt()'s format
+
+    Returns:
+        List of dicts with severity, description, osha_reference and action
+    """
+    if NO_HAZARDS_MARKER in analysis:
+        return []
+
+    hazards = []
+    current = None
+    field = None
+
+    for line in analysis.splitlines():
+        field_match = _FIELD_LINE.match(line)
+        if field_match and current is not None:
+            field = _FIELD_KEYS[field_match.group(1).lower()]
+            current[field] = field_match.group(2).strip().strip("*").strip()
+            continue
+
+        severity_match = _SEVERITY_LINE.match(line)
+        if severity_match:
+            current = {
+                "severity": severity_match.group(1).upper(),
+                "description": "",
+                "osha_reference": "",
+                "action": ""
+            }
+            hazards.append(current)
+            field = None
+            continue
+
+        stripped = line.strip()
+        if not stripped or stripped == "---":
+            field = None
+        elif current is not None and field:
+            # Continuation of a multi-line field
+            current[field] = f"{current[field]} {stripped}".strip()
+
+    return [h for h in hazards if h["description"]]
+
+
+def format_hazards(hazards: List[Dict]) -> str:
+    """Render structured hazards back into the per-photo analysis format"""
+    if not hazards:
+        return "✅ NO SAFETY HAZARDS DETECTED - Site appears compliant"
+
+    blocks = [f"HAZARDS FOUND: {len(hazards)}"]
+    for hazard in hazards:
+        # Ensemble analyses note how many passes reported the hazard
+        agreement = f" ({hazard['votes']}/{hazard['passes']} passes agree)" if "votes" in hazard else ""
+        blocks.append(
+            f"{SEVERITY_ICONS[hazard['severity']]} {hazard['severity']}{agreement}\n"
+            f"Description: {hazard['description']}\n"
+            f"OSHA Reference: {hazard.get('osha_reference') or 'N/A'}\n"
+            f"Recommended Action: {hazard.get('action') or 'N/A'}"
+        )
+
+    return "\n\n---\n\n".join(blocks)
+
+
+# Keyword rules mirroring the detection categories in build_safety_prompt();
+# first matching category wins, so more specific categories come first
+HAZARD_CATEGORIES = [
+    ("Healthcare-Specific", ("medical gas", "contamination", "infection", "clean room",
+                             "cleanroom", "sterile", "icra", "patient", "negative pressure")),
+    ("Electrical", ("electrical", "wiring", "wire", "panel", "extension cord", "cord",
+                    "outlet", "energized", "breaker", "conduit")),
+    ("Fall Protection", ("fall", "guardrail", "guard rail", "edge", "opening", "ladder",
+                         "scaffold", "penetration", "hole", "harness", "platform", "roof")),
+    ("PPE", ("hard hat", "hardhat", "vest", "high-visibility", "hi-vis", "eye protection",
+             "safety glasses", "goggles", "gloves", "footwear", "boots", "ppe",
+             "respirator", "hearing protection")),
+    ("Equipment & Materials", ("material", "stack", "storage", "stored", "equipment",
+                               "forklift", "lift", "tool", "cylinder", "crane")),
+    ("Housekeeping", ("debris", "trip", "walkway", "housekeeping", "clutter", "exit",
+                      "blocked", "spill", "waste", "organization")),
+]
+
+OTHER_CATEGORY = "Other"
+
+_CATEGORY_PATTERNS = [
+    (category, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")", re.IGNORECASE))
+    for category, keywords in HAZARD_CATEGORIES
+]
+
+
+def categorize_hazard(description: str) -> str:
+    """Map a hazard description to one of the scanner's detection categories"""
+    for category, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(description):
+            return category
+    return OTHER_CATEGORY
+
+
+def description_tokens(text: str) -> frozenset:
+    """Normalized content words of a hazard description"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return frozenset(w for w in words if w not in _STOPWORDS and len(w) > 1)
+
+
+def hazard_similarity(first: Dict, second: Dict) -> float:
+    """Jaccard similarity of two hazards' description words"""
+    a = description_tokens(first["description"])
+    b = description_tokens(second["description"])
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
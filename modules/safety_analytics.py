@@ -0,0 +1,231 @@
+"""
+Safety Hazard Trend Analytics
+
+Hazard rates per project, location and category over time, built from the
+scan history recorded by the Safety Scanner. All aggregations are vectorized
+pandas group-bys over the hazard table, and loaded history is cached until
+the database changes, so the page stays interactive with years of scans.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from modules.hazard_history import history_version, load_history
+
+PERIODS = {"Weekly": "W-MON", "Monthly": "MS"}
+
+# Period aliases matching the group-by frequencies above
+PERIOD_ALIASES = {"W-MON": "W-MON", "MS": "M"}
+
+GROUPINGS = {"Project": "project", "Location": "location", "Category": "category"}
+
+LOOKBACKS = {
+    "Last 4 weeks": 28,
+    "Last 13 weeks": 91,
+    "Last 12 months": 365,
+    "All time": None
+}
+
+
+# ==================== AGGREGATIONS ====================
+
+def period_counts(scans: pd.DataFrame, hazards: pd.DataFrame, group: str, freq: str):
+    """
+    Hazard counts and photos inspected per period and group
+
+    Categories have no photo count of their own, so their denominator is
+    all photos inspected in the period.
+
+    Returns:
+        (hazard_counts, photo_counts) DataFrames indexed by period with one
+        column per group value
+    """
+    hazard_counts = (
+        hazards.groupby([pd.Grouper(key="scanned_at", freq=freq), group], observed=True)
+        .size()
+        .unstack(fill_value=0)
+    )
+
+    if group in scans.columns:
+        photo_counts = (
+            scans.groupby([pd.Grouper(key="scanned_at", freq=freq), group])["photos"]
+            .sum()
+            .unstack(fill_value=0)
+        )
+    else:
+        totals = scans.groupby(pd.Grouper(key="scanned_at", freq=freq))["photos"].sum()
+        photo_counts = pd.DataFrame({column: totals for column in hazard_counts.columns})
+
+    index = hazard_counts.index.union(photo_counts.index)
+    columns = hazard_counts.columns.union(photo_counts.columns)
+    return (
+        hazard_counts.reindex(index=index, columns=columns, fill_value=0),
+        photo_counts.reindex(index=index, columns=columns, fill_value=0)
+    )
+
+
+def rolling_rate(hazard_counts: pd.DataFrame, photo_counts: pd.DataFrame, window: int) -> pd.DataFrame:
+    """Hazards per 100 photos over a rolling window of periods"""
+    hazards = hazard_counts.rolling(window, min_periods=1).sum()
+    photos = photo_counts.rolling(window, min_periods=1).sum()
+    return (hazards / photos.where(photos > 0) * 100).round(1)
+
+
+def period_over_period(hazard_counts: pd.DataFrame) -> pd.DataFrame:
+    """Change between the last two periods per group, largest increases first"""
+    if len(hazard_counts) < 2:
+        return pd.DataFrame(columns=["Previous", "Current", "Change", "Change %"])
+
+    previous, current = hazard_counts.iloc[-2], hazard_counts.iloc[-1]
+    change = current - previous
+    table = pd.DataFrame({
+        "Previous": previous,
+        "Current": current,
+        "Change": change,
+        "Change %": (change / previous.where(previous > 0) * 100).round(0)
+    })
+    return table[(table["Previous"] > 0) | (table["Current"] > 0)].sort_values("Change", ascending=False)
+
+
+def recurring_hot_spots(hazards: pd.DataFrame, freq: str, min_periods: int) -> pd.DataFrame:
+    """
+    Project/location/category combinations with hazards in many periods
+
+    Returns:
+        DataFrame sorted by number of periods with findings, then hazard count
+    """
+    if hazards.empty:
+        return pd.DataFrame()
+
+    frame = hazards.assign(
+        period=hazards["scanned_at"].dt.to_period(PERIOD_ALIASES[freq]),
+        is_critical=hazards["severity"] == "CRITICAL"
+    )
+    spots = (
+        frame.groupby(["project", "location", "category"], observed=True)
+        .agg(
+            periods=("period", "nunique"),
+            hazards=("severity", "size"),
+            critical=("is_critical", "sum"),
+            last_seen=("scanned_at", "max")
+        )
+        .reset_index()
+    )
+    spots = spots[spots["periods"] >= min_periods]
+    return spots.sort_values(["periods", "hazards"], ascending=False).reset_index(drop=True)
+
+
+# ==================== CACHED LOADING ====================
+
+def _lookback_start(lookback_days) -> Optional[datetime]:
+    """Start of the time range, rounded to midnight so it stays a stable cache key for the day"""
+    if not lookback_days:
+        return None
+    today = datetime.combine(date.today(), datetime.min.time())
+    return today - timedelta(days=lookback_days)
+
+
+@st.cache_data(show_spinner=False)
+def _load_history_cached(version: float, since: Optional[datetime]):
+    """History frames; the database version invalidates the cache on new scans"""
+    return load_history(since)
+
+
+# ==================== PAGE ====================
+
+def show_hazard_analytics():
+    st.markdown("<h1 class='main-header'>📈 Safety Hazard Trends</h1>", unsafe_allow_html=True)
+    st.markdown("<p class='sub-header'>Hazard rates, week-over-week change and recurring hot spots across projects</p>", unsafe_allow_html=True)
+
+    st.markdown("---")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        lookback = st.selectbox("Time Range", list(LOOKBACKS), index=2)
+    with col2:
+        period_label = st.selectbox("Granularity", list(PERIODS))
+    with col3:
+        group_label = st.selectbox("Group By", list(GROUPINGS))
+    with col4:
+        window = st.slider("Rolling Window (periods)", min_value=1, max_value=12, value=4)
+
+    scans, hazards = _load_history_cached(history_version(), _lookback_start(LOOKBACKS[lookback]))
+
+    if scans.empty:
+        st.info("📭 No scan history yet. Completed scans from the Safety Scanner will appear here.")
+        return
+
+    # Filters
+    col1, col2 = st.columns(2)
+    with col1:
+        projects = st.multiselect("Projects", sorted(scans["project"].unique()))
+    with col2:
+        severities = st.multiselect("Severity", ["CRITICAL", "MODERATE", "MINOR"])
+
+    if projects:
+        scans = scans[scans["project"].isin(projects)]
+        hazards = hazards[hazards["project"].isin(projects)]
+    if severities:
+        hazards = hazards[hazards["severity"].isin(severities)]
+
+    freq = PERIODS[period_label]
+    group = GROUPINGS[group_label]
+    period_name = "week" if period_label == "Weekly" else "month"
+
+    hazard_counts, photo_counts = period_counts(scans, hazards, group, freq)
+
+    # Headline metrics
+    total_photos = int(scans["photos"].sum())
+    critical = int((hazards["severity"] == "CRITICAL").sum())
+    totals = hazard_counts.sum(axis=1)
+    delta = None
+    if len(totals) >= 2:
+        delta = f"{int(totals.iloc[-1] - totals.iloc[-2]):+d} vs last {period_name}"
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Scans", f"{len(scans):,}")
+    col2.metric("Hazards Found", f"{len(hazards):,}", delta, delta_color="inverse")
+    col3.metric("Hazards / 100 Photos", f"{len(hazards) / total_photos * 100:.1f}" if total_photos else "—")
+    col4.metric("Critical", f"{critical:,}")
+
+    st.markdown("---")
+
+    # Rolling hazard rate
+    st.subheader(f"📉 Hazard Rate by {group_label} ({window}-{period_name} rolling, per 100 photos)")
+    rates = rolling_rate(hazard_counts, photo_counts, window)
+    if rates.empty:
+        st.info("No hazards match the current filters.")
+    else:
+        st.line_chart(rates)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader(f"↕️ {period_label[:-2]}-over-{period_name} Change")
+        st.dataframe(period_over_period(hazard_counts), use_container_width=True)
+
+    with col2:
+        st.subheader("🧱 Hazards by Category and Severity")
+        if not hazards.empty:
+            by_category = (
+                hazards.groupby(["category", "severity"], observed=True)
+                .size()
+                .unstack(fill_value=0)
+            )
+            st.bar_chart(by_category)
+
+    # Recurring hot spots
+    st.markdown("---")
+    st.subheader("📍 Recurring Hot Spots")
+    min_periods = st.slider(
+        f"Flag locations with findings in at least this many {period_name}s",
+        min_value=2, max_value=12, value=3
+    )
+    spots = recurring_hot_spots(hazards, freq, min_periods)
+    if spots.empty:
+        st.success("✅ No recurring hot spots for the selected range")
+    else:
+        st.dataframe(spots, use_container_width=True, hide_index=True)
@@ -1,10 +1,27 @@
 import streamlit as st
-import google.generativeai as genai
 from PIL import Image
-import io
-import os
-from datetime import datetime
+import time
 from modules.hubspot_integration import hubspot, show_hubspot_status
+from modules.safety_analysis import detect_severity, build_report_text
+from modules.osha_standards import review_analysis_references
+from modules.scan_jobs import submit_scan_job, get_scan_job, list_scan_jobs, COMPLETED, FAILED
+from modules.photo_metadata import read_photo_metadata, cluster_photos, cluster_context
+from modules.hazard_history import set_photo_task
+from modules.hazard_diff import format_diff_report
+from modules.camera_monitor import start_monitor, get_monitor, list_monitors, stop_monitor
+from modules.ensemble_analysis import DEFAULT_PASSES, MAX_PASSES, DEFAULT_MIN_CONFIDENCE
+from modules.upload_spool import get_upload_spool, group_ready_files
+from modules.tiled_analysis import tiled_photo_capacity
+
+# Seconds between progress polls while a background scan is running
+SCAN_POLL_INTERVAL = 1.5
+
+# Seconds between refreshes of the camera monitoring dashboard
+MONITOR_REFRESH_INTERVAL = 5
+
+# Thumbnails shown for an upload; larger batches are summarized
+MAX_THUMBNAILS = 8
+
 
 def show_safety_scanner():
     st.markdown("<h1 class='main-header'>🛡️ Construction Safety AI Scanner</h1>", unsafe_allow_html=True)
@@ -16,6 +33,11 @@ def show_safety_scanner():
 
     st.markdown("---")
 
+    mode = st.radio("Mode", ["📷 Photo Scan", "📹 Camera Monitoring"], horizontal=True, label_visibility="collapsed")
+    if mode == "📹 Camera Monitoring":
+        show_camera_monitoring()
+        return
+
     # Two column layout
     col1, col2 = st.columns([1, 1])
 
@@ -51,14 +73,93 @@ def show_safety_scanner():
 
             # Display thumbnails
             cols = st.columns(min(len(uploaded_files), 4))
-            for idx, file in enumerate(uploaded_files):
+            for idx, file in enumerate(uploaded_files[:MAX_THUMBNAILS]):
                 with cols[idx % 4]:
                     image = Image.open(file)
                     st.image(image, caption=file.name, use_column_width=True)
+            if len(uploaded_files) > MAX_THUMBNAILS:
+                st.caption(f"+ {len(uploaded_files) - MAX_THUMBNAILS} more photo(s)")
+
+        # Photos sent from the field through the resumable upload server
+        field_group, field_scan = show_field_uploads()
+
+        # Group a site walk into areas using EXIF time and GPS
+        groups = None
+        if uploaded_files and len(uploaded_files) > 1:
+            auto_group = st.checkbox(
+                "🗂️ Group photos into areas (EXIF time & GPS)",
+                value=True,
+                help="Photos taken close together in time and place are analyzed as one area "
+                     "with its own location name and shared context"
+            )
+            if auto_group:
+                groups = show_photo_groups(uploaded_files, location)
+
+        # Optional deeper analysis modes
+        analysis_mode = st.radio(
+            "Analysis Mode",
+            ["⚡ Standard", "🔬 High-resolution tiling", "🗳️ Ensemble voting"],
+            help="Tiling splits each photo into overlapping tiles to catch small hazards "
+                 "(missing eye protection, floor penetrations). Ensemble voting runs several "
+                 "analyses per photo and only escalates hazards most of them agree on. "
+                 "Both use more AI calls."
+        )
+        tile_budget = 0
+        ensemble_passes = 0
+        min_confidence = DEFAULT_MIN_CONFIDENCE
+        if analysis_mode == "🔬 High-resolution tiling":
+            tile_budget = st.slider(
+                "Tile budget per scan",
+                min_value=4,
+                max_value=96,
+                value=24,
+                step=4,
+                help="Maximum number of views analyzed across all photos in this scan; "
+                     "each tiled photo uses its full view plus at least two tiles"
+            )
+            photo_count = len(uploaded_files or [])
+            if photo_count > tiled_photo_capacity(tile_budget):
+                st.warning(
+                    f"⚠️ A budget of {tile_budget} tiles only covers {tiled_photo_capacity(tile_budget)} "
+                    f"of {photo_count} photos. The largest photos are tiled and the rest get a standard analysis."
+                )
+        elif analysis_mode == "🗳️ Ensemble voting":
+            ensemble_passes = st.slider(
+                "Analyses per photo",
+                min_value=2,
+                max_value=MAX_PASSES,
+                value=DEFAULT_PASSES,
+                help="Passes run in parallel with different temperatures and inspection focus"
+            )
+            min_confidence = st.slider(
+                "Escalation threshold (share of passes that must agree)",
+                min_value=0.3,
+                max_value=1.0,
+                value=DEFAULT_MIN_CONFIDENCE,
+                step=0.05
+            )
 
         # Scan button
         scan_button = st.button("🔍 Scan for Safety Hazards", type="primary", use_container_width=True)
 
+        # Reattach to scans started earlier (e.g. before a page refresh)
+        recent_jobs = list_scan_jobs()
+        if recent_jobs:
+            with st.expander("🕘 Recent Scans"):
+                job_labels = {job.id: job.label() for job in recent_jobs}
+                current_id = st.session_state.get("safety_scan_job_id")
+                job_ids = list(job_labels)
+                selected_id = st.selectbox(
+                    "Show results for",
+                    job_ids,
+                    index=job_ids.index(current_id) if current_id in job_ids else 0,
+                    format_func=lambda job_id: job_labels[job_id]
+                )
+                if st.button("📂 Open Scan", use_container_width=True):
+                    st.session_state.safety_scan_job_id = selected_id
+
+    poll_scan = False
+
     with col2:
         st.subheader("Safety Analysis Results")
 
@@ -66,263 +167,34 @@ def show_safety_scanner():
             if not uploaded_files:
                 st.error("⚠️ Please upload at least one photo to scan.")
             else:
-                with st.spinner("Analyzing photos for safety hazards..."):
-                    try:
-                        # Configure AI
-                        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-                        model = genai.GenerativeModel(model_name="gemini-2.0-flash-exp")
-
-                        all_hazards = []
-
-                        # Process each image
-                        for idx, file in enumerate(uploaded_files):
-                            image = Image.open(file)
-
-                            # Convert to bytes for AI
-                            buf = io.BytesIO()
-                            image.save(buf, format="JPEG")
-                            image_part = {
-                                "mime_type": "image/jpeg",
-                                "data": buf.getvalue()
-                            }
-
-                            # Create safety scanning prompt
-                            prompt = f"""You are a construction safety inspector analyzing a photo from a healthcare construction site.
-
-PROJECT: {project_name}
-LOCATION: {location if location else 'Not specified'}
-PHOTO: {file.name}
-
-Analyze this construction site photo for safety hazards and OSHA violations.
-
-Look for:
-
-1. **PPE (Personal Protective Equipment) Violations:**
-   - Missing hard hats
-   - No safety vests/high-visibility clothing
-   - Improper footwear
-   - Missing eye protection
-   - No fall protection harness when needed
-   - Missing gloves
-
-2. **Fall Hazards:**
-   - Unguarded edges or openings
-   - Missing guardrails
-   - Unsecured ladders
-   - Open holes or penetrations
-   - Improper scaffolding
-   - Damaged platforms
-
-3. **Electrical Hazards:**
-   - Exposed wiring
-   - Uncovered electrical panels
-   - Extension cords in unsafe locations
-   - Water near electrical equipment
-
-4. **Equipment & Material Safety:**
-   - Improperly stored materials
-   - Unstable stacks
-   - Heavy equipment in unsafe positions
-   - Tools left in walkways
-
-5. **Site Housekeeping:**
-   - Debris accumulation
-   - Trip hazards
-   - Blocked walkways or exits
-   - Poor organization
-
-6. **Healthcare-Specific Concerns:**
-   - Contamination risks
-   - Medical gas system hazards
-   - Clean room protocol violations
-
-For EACH hazard you identify, provide:
-- Severity: CRITICAL, MODERATE, or MINOR
-- Description: What is the hazard?
-- OSHA Reference: Relevant OSHA standard (if applicable)
-- Recommended Action: What should be done?
-
-If NO hazards are found, state that clearly.
-
-Format your response as:
-
-HAZARDS FOUND: [number]
-
-[For each hazard:]
-🔴 CRITICAL / 🟡 MODERATE / 🟢 MINOR
-Description: [detailed description]
-OSHA Reference: [standard number if applicable]
-Recommended Action: [specific corrective action]
-
----
-
-If no hazards: "✅ NO SAFETY HAZARDS DETECTED - Site appears compliant"
-"""
-
-                            # Generate analysis
-                            response = model.generate_content([image_part, prompt])
-                            analysis = response.text
-
-                            all_hazards.append({
-                                "file": file.name,
-                                "analysis": analysis
-                            })
-
-                        # Display results
-                        st.markdown("---")
-                        st.success(f"✅ Analyzed {len(uploaded_files)} photo(s)")
-
-                        # Summary
-                        st.markdown("### 📊 Safety Scan Report")
-                        st.markdown(f"**Project:** {project_name}")
-                        st.markdown(f"**Location:** {location if location else 'Not specified'}")
-                        st.markdown(f"**Date:** {datetime.now().strftime('%B %d, %Y at %I:%M %p')}")
-                        st.markdown(f"**Photos Analyzed:** {len(uploaded_files)}")
-
-                        st.markdown("---")
-
-                        # Display results for each photo
-                        for idx, hazard_data in enumerate(all_hazards):
-                            with st.expander(f"📷 {hazard_data['file']}", expanded=(idx == 0)):
-                                st.markdown(hazard_data['analysis'])
-
-                        # Overall summary
-                        st.markdown("---")
-                        st.markdown("### 📋 Overall Summary")
-
-                        # Combine all analyses for summary
-                        combined_text = "\n\n".join([h['analysis'] for h in all_hazards])
-
-                        summary_prompt = f"""Based on these safety scan results from {len(uploaded_files)} photos:
-
-{combined_text}
-
-Provide:
-1. Overall Safety Score (0-100)
-2. Total number of hazards by severity (Critical, Moderate, Minor)
-3. Top 3 priority actions needed
-4. Overall site safety assessment (1-2 sentences)
-
-Format as:
-SAFETY SCORE: XX/100
-CRITICAL: X | MODERATE: X | MINOR: X
-
-TOP PRIORITIES:
-1. [action]
-2. [action]
-3. [action]
-
-ASSESSMENT: [brief assessment]
-"""
-
-                        summary_response = model.generate_content(summary_prompt)
-                        st.markdown(summary_response.text)
-
-                        # Export options
-                        st.markdown("---")
-                        col1, col2, col3 = st.columns(3)
-
-                        # Create full report text
-                        report_text = f"""SE BUILDERS - SAFETY SCAN REPORT
-Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
-
-PROJECT: {project_name}
-LOCATION: {location if location else 'Not specified'}
-PHOTOS ANALYZED: {len(uploaded_files)}
-
-{'=' * 60}
-
-"""
-                        for hazard_data in all_hazards:
-                            report_text += f"\nPHOTO: {hazard_data['file']}\n{'-' * 60}\n"
-                            report_text += hazard_data['analysis'] + "\n\n"
-
-                        report_text += f"\n{'=' * 60}\n\nOVERALL SUMMARY\n{'-' * 60}\n"
-                        report_text += summary_response.text
-
-                        with col1:
-                            st.download_button(
-                                label="📥 Download Report",
-                                data=report_text,
-                                file_name=f"Safety_Report_{project_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.txt",
-                                mime="text/plain",
-                                use_container_width=True
-                            )
-
-                        with col2:
-                            if st.button("📧 Email Report", use_container_width=True):
-                                st.info("Email feature coming soon!")
-
-                        # HubSpot Integration
-                        if hubspot.is_enabled():
-                            st.markdown("---")
-                            st.subheader("📋 Create HubSpot Tasks for Safety Issues")
-
-                            # Extract critical issues from analysis
-                            critical_found = any("CRITICAL" in h['analysis'] or "🔴" in h['analysis'] for h in all_hazards)
-
-                            if critical_found:
-                                st.warning("⚠️ Critical safety issues detected - Consider creating HubSpot tasks for follow-up")
-
-                            with st.form("hubspot_task_form"):
-                                st.write("Create tasks in HubSpot for safety issues requiring follow-up")
-
-                                task_email = st.text_input(
-                                    "Project Manager Email (Optional)",
-                                    placeholder="pm@sebuilders.com",
-                                    help="Associate tasks with a contact in HubSpot"
-                                )
-
-                                create_tasks = st.form_submit_button("📝 Create Safety Tasks", use_container_width=True)
-
-                                if create_tasks:
-                                    with st.spinner("Creating HubSpot tasks..."):
-                                        tasks_created = 0
-
-                                        # Parse each analysis for severity
-                                        for hazard_data in all_hazards:
-                                            analysis = hazard_data['analysis']
-
-                                            # Detect critical issues
-                                            if "CRITICAL" in analysis or "🔴" in analysis:
-                                                severity = "CRITICAL"
-                                            elif "MODERATE" in analysis or "🟡" in analysis:
-                                                severity = "MODERATE"
-                                            elif "MINOR" in analysis or "🟢" in analysis:
-                                                severity = "MINOR"
-                                            else:
-                                                continue  # Skip if no clear severity
-
-                                            # Skip if no hazards found
-                                            if "NO SAFETY HAZARDS DETECTED" in analysis:
-                                                continue
-
-                                            # Create task for this hazard
-                                            task_id = hubspot.log_safety_issue(
-                                                project_name=project_name,
-                                                location=f"{location} - {hazard_data['file']}",
-                                                severity=severity,
-                                                description=analysis[:1000],  # Limit to 1000 chars
-                                                contact_email=task_email if task_email else None
-                                            )
-
-                                            if task_id:
-                                                tasks_created += 1
-
-                                        if tasks_created > 0:
-                                            st.success(f"✅ Created {tasks_created} safety task(s) in HubSpot!")
-                                            st.balloons()
-                                        else:
-                                            st.info("ℹ️ No critical safety issues found - no tasks created")
-                        else:
-                            with col3:
-                                if st.button("💾 Save to Database", use_container_width=True):
-                                    st.info("Database integration coming soon!")
-
-                    except Exception as e:
-                        st.error(f"Error analyzing photos: {str(e)}")
-        else:
+                # Hand the photos to the background worker pool
+                photos = [(file.name, file.getvalue()) for file in uploaded_files]
+                st.session_state.safety_scan_job_id = submit_scan_job(
+                    project_name, location, photos, tile_budget=tile_budget, groups=groups,
+                    ensemble_passes=ensemble_passes, min_confidence=min_confidence
+                )
+
+        if field_scan and field_group:
+            spool = get_upload_spool()
+            photos = [(photo["scan_name"], spool.read_file(photo["sha256"])) for photo in field_group["photos"]]
+            job_id = submit_scan_job(
+                field_group["project"] or project_name, field_group["location"] or location, photos,
+                tile_budget=tile_budget, ensemble_passes=ensemble_passes, min_confidence=min_confidence
+            )
+            spool.mark_scanned([photo["sha256"] for photo in field_group["photos"]], job_id)
+            st.session_state.safety_scan_job_id = job_id
+
+        job = get_scan_job(st.session_state.get("safety_scan_job_id"))
+
+        if job is None:
             st.info("👈 Upload site photos and click 'Scan' to analyze safety hazards")
+        elif job.status == FAILED:
+            st.error(f"Error analyzing photos: {job.error}")
+        elif job.status != COMPLETED:
+            show_scan_progress(job)
+            poll_scan = True
+        else:
+            show_scan_results(job)
 
     # Info section
     st.markdown("---")
@@ -384,3 +256,389 @@ PHOTOS ANALYZED: {len(uploaded_files)}
     col2.metric("Hazards Found", "47", "-8%")
     col3.metric("Resolution Rate", "96%", "+4%")
     col4.metric("Safety Score", "94/100", "+6")
+
+    # Keep polling while the background scan is still running
+    if poll_scan:
+        time.sleep(SCAN_POLL_INTERVAL)
+        st.rerun()
+
+
+def show_field_uploads():
+    """
+    List photo batches waiting in the field upload spool
+
+    Returns:
+        (selected batch or None, whether "Scan" was clicked)
+    """
+    try:
+        groups = group_ready_files(get_upload_spool().ready_files())
+    except OSError:
+        return None, False
+
+    if not groups:
+        return None, False
+
+    with st.expander(f"📥 Field Uploads ({sum(len(g['photos']) for g in groups)} photo(s) waiting)"):
+        labels = [group["label"] for group in groups]
+        selected = st.selectbox("Batch", range(len(groups)), format_func=lambda idx: labels[idx])
+        st.caption("Sent from site with field_upload.py. The batch's project and location are used when set.")
+        clicked = st.button("🔍 Scan Field Batch", use_container_width=True)
+
+    return groups[selected], clicked
+
+
+def show_photo_groups(uploaded_files, location):
+    """
+    Cluster uploaded photos into site-walk areas and let the user name them
+
+    Returns:
+        Area groups for submit_scan_job(), or None if EXIF gives nothing to group by
+    """
+    metadata = [read_photo_metadata(file.name, file.getvalue()) for file in uploaded_files]
+    clusters = cluster_photos(metadata)
+
+    if len(clusters) < 2:
+        if not any(m["taken_at"] for m in metadata):
+            st.caption("ℹ️ No EXIF timestamps found - all photos will use the location above")
+        return None
+
+    st.caption(f"📍 {len(clusters)} area(s) detected - name each one for the report")
+
+    groups = []
+    for idx, cluster in enumerate(clusters):
+        default_name = f"{location} - {cluster['label']}" if location else cluster['label']
+        area_location = st.text_input(
+            f"{cluster['label']} · {len(cluster['photos'])} photo(s)",
+            value=default_name,
+            key=f"safety_area_{idx}_{cluster['label']}",
+            help=", ".join(cluster["photos"])
+        )
+        groups.append({
+            "label": cluster["label"],
+            "location": area_location,
+            "context": cluster_context(cluster),
+            "photos": cluster["indices"]
+        })
+
+    return groups
+
+
+def show_scan_progress(job):
+    """Render progress and partial results of a running scan"""
+    st.progress(job.progress, text=f"Analyzing photos for safety hazards... ({job.completed}/{job.total})")
+    st.caption("You can keep working - the scan continues in the background.")
+
+    for hazard_data in job.get_results():
+        with st.expander(f"📷 {hazard_data['file']}"):
+            st.markdown(hazard_data['analysis'])
+
+
+def show_scan_results(job):
+    """Render the report, exports and HubSpot actions for a finished scan"""
+    all_hazards = job.get_results()
+    project_name = job.project_name
+    location = job.location
+
+    # Display results
+    st.markdown("---")
+    st.success(f"✅ Analyzed {len(all_hazards)} photo(s)")
+
+    # Summary
+    st.markdown("### 📊 Safety Scan Report")
+    st.markdown(f"**Project:** {project_name}")
+    st.markdown(f"**Location:** {location if location else 'Not specified'}")
+    st.markdown(f"**Date:** {job.created_at.strftime('%B %d, %Y at %I:%M %p')}")
+    st.markdown(f"**Photos Analyzed:** {len(all_hazards)}")
+
+    st.markdown("---")
+
+    # Display results for each photo, grouped by site-walk area
+    current_area = None
+    for idx, hazard_data in enumerate(all_hazards):
+        if len(job.groups) > 1 and hazard_data.get("location") != current_area:
+            current_area = hazard_data.get("location")
+            st.markdown(f"#### 📍 {current_area}")
+
+        with st.expander(f"📷 {hazard_data['file']}", expanded=(idx == 0)):
+            if hazard_data.get("overlay"):
+                st.image(
+                    hazard_data["overlay"],
+                    caption=f"Hazard regions ({hazard_data['tiles_analyzed']} views analyzed)",
+                    use_column_width=True
+                )
+            st.markdown(hazard_data['analysis'])
+
+            if hazard_data.get("unconfirmed"):
+                st.caption(
+                    f"🗳️ {len(hazard_data['unconfirmed'])} finding(s) reported by too few of "
+                    f"{hazard_data['passes']} passes - not escalated:"
+                )
+                for hazard in hazard_data["unconfirmed"]:
+                    st.caption(f"- {hazard['severity']} ({hazard['votes']}/{hazard['passes']}): {hazard['description']}")
+
+            osha_lines = review_analysis_references(hazard_data['analysis'], hazard_data.get('hazards'))
+            if osha_lines:
+                st.markdown("**📘 OSHA reference check:**")
+                st.markdown("\n".join(f"- {line}" for line in osha_lines))
+
+    # Repeat inspections: what changed since the last visit to each area
+    diff_reports = [
+        format_diff_report(v["diff"], v["location"], v["previous_scanned_at"])
+        for v in job.visit_diffs
+    ]
+    if diff_reports:
+        st.markdown("---")
+        st.markdown("### 🔁 Changes Since Last Visit")
+        for diff_report in diff_reports:
+            st.markdown(diff_report)
+
+    # Overall summary
+    st.markdown("---")
+    st.markdown("### 📋 Overall Summary")
+    st.markdown(job.summary)
+
+    # Export options
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+
+    # Create full report text
+    report_text = build_report_text(project_name, location, all_hazards, job.summary, job.created_at)
+    if diff_reports:
+        report_text += "\n\nCHANGES SINCE LAST VISIT\n\n" + "\n\n".join(
+            r.replace("**", "").replace("~~", "") for r in diff_reports
+        )
+
+    with col1:
+        st.download_button(
+            label="📥 Download Report",
+            data=report_text,
+            file_name=f"Safety_Report_{project_name.replace(' ', '_')}_{job.created_at.strftime('%Y%m%d')}.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+    with col2:
+        if st.button("📧 Email Report", use_container_width=True):
+            st.info("Email feature coming soon!")
+
+    # HubSpot Integration
+    if hubspot.is_enabled():
+        st.markdown("---")
+        st.subheader("📋 Create HubSpot Tasks for Safety Issues")
+
+        # Extract critical issues from analysis
+        critical_found = any(detect_severity(h['analysis']) == "CRITICAL" for h in all_hazards)
+
+        if critical_found:
+            st.warning("⚠️ Critical safety issues detected - Consider creating HubSpot tasks for follow-up")
+
+        # Offer to close tasks whose hazards were all resolved since the previous visit
+        tasks_to_close = sorted({t for v in job.visit_diffs for t in v["tasks_to_close"]})
+        if any(not v["complete"] for v in job.visit_diffs):
+            st.info("ℹ️ Some areas were only partly re-inspected (fewer photos or failed analyses), "
+                    "so hazards not seen there are kept open")
+        if job.tasks_closed is not None:
+            st.success(f"✅ Closed {job.tasks_closed} HubSpot task(s) for hazards resolved since the last visit")
+        elif tasks_to_close:
+            st.write(f"{len(tasks_to_close)} HubSpot task(s) track hazards that were not found on this re-inspection.")
+            if st.button(f"✅ Close {len(tasks_to_close)} Resolved Task(s)", use_container_width=True):
+                with st.spinner("Closing HubSpot tasks..."):
+                    job.tasks_closed = hubspot.batch_complete_tasks(
+                        tasks_to_close,
+                        note=f"Resolved - not found on re-inspection {job.created_at.strftime('%Y-%m-%d')}"
+                    )
+                st.rerun()
+
+        # Photos whose hazards all persist from a visit that already has a task
+        tracked_photos = set()
+        for visit in job.visit_diffs:
+            persisting = {p["current"]["photo"] for p in visit["diff"]["persisting"] if p["current"]["task_id"]}
+            new_photos = {h["photo"] for h in visit["diff"]["new"]}
+            tracked_photos |= {(visit["scan_id"], photo) for photo in persisting - new_photos}
+
+        if job.tasks_created is not None:
+            st.success(f"✅ {job.tasks_created} safety task(s) already created in HubSpot for this scan")
+            return
+
+        with st.form("hubspot_task_form"):
+            st.write("Create tasks in HubSpot for safety issues requiring follow-up")
+
+            task_email = st.text_input(
+                "Project Manager Email (Optional)",
+                placeholder="pm@sebuilders.com",
+                help="Associate tasks with a contact in HubSpot"
+            )
+
+            create_tasks = st.form_submit_button("📝 Create Safety Tasks", use_container_width=True)
+
+            if create_tasks:
+                with st.spinner("Creating HubSpot tasks..."):
+                    tasks_created = 0
+                    photos, issues = [], []
+
+                    # Parse each analysis for severity
+                    for hazard_data in all_hazards:
+                        analysis = hazard_data['analysis']
+
+                        severity = detect_severity(analysis)
+                        if severity is None:
+                            continue  # Skip if no hazards or no clear severity
+
+                        if (hazard_data.get('scan_id'), hazard_data['file']) in tracked_photos:
+                            continue  # Already tracked by a task from the previous visit
+
+                        photos.append(hazard_data)
+                        issues.append({
+                            "project_name": project_name,
+                            "location": f"{hazard_data.get('location', location)} - {hazard_data['file']}",
+                            "severity": severity,
+                            "description": analysis[:1000],  # Limit to 1000 chars
+                            "contact_email": task_email if task_email else None,
+                            "osha_references": review_analysis_references(analysis, hazard_data.get('hazards'))
+                        })
+
+                    # One task per hazard photo, created together in a few batch requests
+                    task_ids = hubspot.batch_log_safety_issues(issues)
+
+                    for hazard_data, task_id in zip(photos, task_ids):
+                        if task_id:
+                            tasks_created += 1
+                            if hazard_data.get('scan_id'):
+                                try:
+                                    set_photo_task(hazard_data['scan_id'], hazard_data['file'], task_id)
+                                except Exception:
+                                    pass  # Only needed to auto-close the task on a later visit
+
+                    if tasks_created > 0:
+                        job.tasks_created = tasks_created
+                        st.success(f"✅ Created {tasks_created} safety task(s) in HubSpot!")
+                        st.balloons()
+                    else:
+                        st.info("ℹ️ No critical safety issues found - no tasks created")
+    else:
+        with col3:
+            if st.button("💾 Save to Database", use_container_width=True):
+                st.info("Database integration coming soon!")
+
+
+def show_camera_monitoring():
+    """Start, watch and stop continuous monitoring of fixed site cameras"""
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.subheader("Connect a Site Camera")
+
+        with st.form("camera_monitor_form"):
+            camera_name = st.text_input("Camera Name", value="Site Camera 1")
+            source = st.text_input(
+                "Stream URL or Local Source",
+                placeholder="http://camera.local/video.mjpg, rtsp://..., or a folder of frames",
+                help="HTTP MJPEG streams work out of the box. RTSP and video files need OpenCV."
+            )
+            project_name = st.selectbox(
+                "Project",
+                ["Costa Mesa Clinic", "Irvine Surgery Center", "Orange County Medical Office",
+                 "Newport Beach Imaging", "Riverside Hospital Addition"]
+            )
+            location = st.text_input("Area Covered", placeholder="e.g., Level 3 east deck")
+
+            min_interval = st.slider(
+                "Fastest sampling (seconds between frames)", min_value=2, max_value=60, value=5,
+                help="Sampling slows down automatically while the scene is unchanged"
+            )
+            calls_per_hour = st.slider("AI call budget per hour", min_value=5, max_value=240, value=60, step=5)
+            task_alerts = st.checkbox(
+                "📋 Create HubSpot task for CRITICAL hazards",
+                value=hubspot.is_enabled(),
+                disabled=not hubspot.is_enabled()
+            )
+
+            start = st.form_submit_button("▶️ Start Monitoring", use_container_width=True)
+
+        if start:
+            if not source:
+                st.error("⚠️ Please enter a camera stream URL or local source.")
+            else:
+                handlers = []
+                if task_alerts:
+                    def create_alert_task(alert):
+                        hazard = alert["hazard"]
+                        hubspot.log_safety_issue(
+                            project_name=alert["project"],
+                            location=f"{alert['location'] or 'Site camera'} - {alert['camera']}",
+                            severity="CRITICAL",
+                            description=f"{hazard['description']}\n\nRecommended Action: {hazard.get('action', '')}",
+                            osha_references=review_analysis_references("", [hazard])
+                        )
+                    handlers.append(create_alert_task)
+
+                st.session_state.camera_monitor_id = start_monitor(
+                    camera_name, source, project_name, location,
+                    settings={"min_interval": float(min_interval), "max_calls_per_hour": calls_per_hour},
+                    alert_handlers=handlers
+                )
+
+    with col2:
+        st.subheader("Live Monitoring")
+
+        monitors = list_monitors()
+        if not monitors:
+            st.info("👈 Connect a camera to start continuous safety monitoring")
+            return
+
+        labels = {m.id: f"{m.camera_name} · {m.project_name} · {'running' if m.running else 'stopped'}" for m in monitors}
+        ids = list(labels)
+        current_id = st.session_state.get("camera_monitor_id")
+        selected_id = st.selectbox(
+            "Camera",
+            ids,
+            index=ids.index(current_id) if current_id in ids else 0,
+            format_func=lambda monitor_id: labels[monitor_id]
+        )
+        monitor = get_monitor(selected_id)
+        if monitor is None:
+            return
+
+        stats = monitor.stats
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Frames Read", f"{stats['frames_read']:,}")
+        c2.metric("Dropped", f"{stats['frames_dropped']:,}")
+        c3.metric("AI Analyses", f"{stats['analyses']:,}")
+        c4.metric("Alerts", f"{stats['alerts']:,}")
+        st.caption(
+            f"Sampling every {monitor.interval:.0f}s · {stats['unchanged']:,} unchanged frame(s) skipped · "
+            f"{stats['budget_skipped']:,} skipped over budget"
+        )
+
+        if monitor.last_error:
+            st.warning(f"⚠️ {monitor.last_error}")
+
+        if monitor.last_analyzed_frame:
+            st.image(
+                monitor.last_analyzed_frame,
+                caption=f"Last analyzed {monitor.last_analyzed_at.strftime('%I:%M:%S %p')}",
+                use_column_width=True
+            )
+            with st.expander("📋 Latest Analysis"):
+                st.markdown(monitor.last_analysis)
+
+        if monitor.alerts:
+            st.markdown("**🚨 CRITICAL Alerts**")
+            for alert in reversed(list(monitor.alerts)[-10:]):
+                st.error(f"{alert['time'].strftime('%b %d %I:%M %p')} - {alert['hazard']['description']}")
+
+        with st.expander("🕘 Activity"):
+            for when, message in reversed(list(monitor.events)[-20:]):
+                st.caption(f"{when.strftime('%I:%M:%S %p')} - {message}")
+
+        col_a, col_b = st.columns(2)
+        with col_a:
+            if monitor.running and st.button("⏹️ Stop Monitoring", use_container_width=True):
+                stop_monitor(monitor.id)
+                st.rerun()
+        with col_b:
+            auto_refresh = st.checkbox("🔄 Auto-refresh", value=monitor.running)
+
+    if auto_refresh and monitor.running:
+        time.sleep(MONITOR_REFRESH_INTERVAL)
+        st.rerun()
@@ -0,0 +1,333 @@
+"""
+Background Safety Scan Jobs
+
+Safety scans run in a process-wide worker pool instead of the Streamlit
+script thread. Jobs, their progress and partial results live in this
+module (which Streamlit imports once per process), so a widget interaction
+or rerun never throws the work away: the page just looks the job up again
+by its ID and keeps polling.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from modules.hazard_history import record_scan, diff_with_previous_visit
+from modules.safety_analysis import get_safety_model, analyze_photo, summarize_scan
+from modules.tiled_analysis import allocate_tile_budget, analyze_photo_tiled, draw_hazard_overlay, image_size
+from modules.ensemble_analysis import analyze_photo_ensemble, DEFAULT_MIN_CONFIDENCE
+
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Photos of one site-walk area analyzed concurrently
+PHOTO_WORKERS = 3
+
+# Finished jobs are kept this long so users can reattach after a refresh
+JOB_RETENTION = timedelta(hours=24)
+MAX_RETAINED_JOBS = 50
+
+
+class ScanJob:
+    """A safety scan running in the background worker pool"""
+
+    def __init__(
+        self,
+        project_name: str,
+        location: str,
+        photos: List[Tuple[str, bytes]],
+        fingerprint: str,
+        tile_budget: int = 0,
+        groups: List[Dict] = None,
+        ensemble_passes: int = 0,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.project_name = project_name
+        self.location = location
+        self.photos = _unique_names(photos)
+        self.fingerprint = fingerprint
+        self.tile_budget = tile_budget
+        self.ensemble_passes = ensemble_passes
+        self.min_confidence = min_confidence
+
+        # Site-walk areas: each has a location, shared prompt context and photo
+        # indices into self.photos (names can repeat across uploads)
+        self.groups = groups or [{
+            "label": "",
+            "location": location,
+            "context": "",
+            "photos": list(range(len(photos)))
+        }]
+
+        self.status = QUEUED
+        self.results: List[Dict] = []
+        self.summary = ""
+        self.error = ""
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+        # Diffs against the previous visit to each area (repeat inspections only)
+        self.visit_diffs: List[Dict] = []
+
+        # Set once HubSpot tasks were created/closed so reruns don't repeat them
+        self.tasks_created: Optional[int] = None
+        self.tasks_closed: Optional[int] = None
+
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return len(self.photos)
+
+    @property
+    def completed(self) -> int:
+        return len(self.results)
+
+    @property
+    def progress(self) -> float:
+        """Fraction of work done (photos plus the final summary step)"""
+        return min(self.completed / (self.total + 1), 1.0) if self.status != COMPLETED else 1.0
+
+    def is_finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def get_results(self) -> List[Dict]:
+        """Snapshot of the per-photo results produced so far"""
+        with self._lock:
+            return list(self.results)
+
+    def _add_result(self, result: Dict):
+        with self._lock:
+            self.results.append(result)
+
+    def label(self) -> str:
+        """Short human-readable description for job pickers"""
+        when = self.created_at.strftime("%b %d %I:%M %p")
+        return f"{self.project_name} · {self.total} photo(s) · {when} · {self.status}"
+
+
+# ==================== JOB REGISTRY ====================
+
+_jobs: Dict[str, ScanJob] = {}
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCAN_JOB_WORKERS", "2")),
+    thread_name_prefix="safety-scan"
+)
+
+
+def _unique_names(photos: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """Number repeated file names ("IMG_0001 (2).jpg") so results and history tell them apart"""
+    seen = set()
+    unique = []
+    for name, data in photos:
+        candidate, copy = name, 1
+        while candidate in seen:
+            copy += 1
+            stem, dot, ext = name.rpartition(".")
+            candidate = f"{stem} ({copy}).{ext}" if dot else f"{name} ({copy})"
+        seen.add(candidate)
+        unique.append((candidate, data))
+    return unique
+
+
+def _scan_fingerprint(
+    project_name: str,
+    location: str,
+    photos: List[Tuple[str, bytes]],
+    tile_budget: int,
+    groups: List[Dict] = None,
+    ensemble: str = ""
+) -> str:
+    """Identify a scan by its inputs so identical resubmissions reuse the job"""
+    digest = hashlib.sha256()
+    digest.update(project_name.encode())
+    digest.update(b"\0")
+    digest.update((location or "").encode())
+    digest.update(f"\0tiles={tile_budget}\0ensemble={ensemble}".encode())
+    for group in groups or []:
+        digest.update(f"\0{group['location']}:{','.join(map(str, group['photos']))}".encode())
+    for name, data in photos:
+        digest.update(b"\0")
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def _prune_jobs():
+    """Drop old finished jobs (caller holds _jobs_lock)"""
+    cutoff = datetime.now() - JOB_RETENTION
+    for job_id, job in list(_jobs.items()):
+        if job.is_finished() and job.finished_at and job.finished_at < cutoff:
+            del _jobs[job_id]
+
+    finished = sorted(
+        (job for job in _jobs.values() if job.is_finished()),
+        key=lambda job: job.created_at
+    )
+    while len(_jobs) > MAX_RETAINED_JOBS and finished:
+        del _jobs[finished.pop(0).id]
+
+
+def submit_scan_job(
+    project_name: str,
+    location: str,
+    photos: List[Tuple[str, bytes]],
+    tile_budget: int = 0,
+    groups: List[Dict] = None,
+    ensemble_passes: int = 0,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE
+) -> str:
+    """
+    Queue a safety scan in the background
+
+    Resubmitting the same photos for the same project/location returns the
+    existing job instead of scanning again, unless that job failed.
+
+    Args:
+        project_name: Project being inspected
+        location: Area of the site
+        photos: List of (file name, raw image bytes)
+        tile_budget: Total tiles for high-resolution tiling across the
+            whole scan (0 disables tiling)
+        groups: Optional site-walk areas, each a dict with label, location,
+            shared prompt context and photo indices into photos; defaults
+            to one area
+        ensemble_passes: Concurrent analysis passes per photo for ensemble
+            voting (0 disables it; ignored when tiling is on)
+        min_confidence: Share of ensemble passes that must agree before a
+            hazard is escalated
+
+    Returns:
+        Job ID to poll with get_scan_job()
+    """
+    ensemble = f"{ensemble_passes}@{min_confidence}" if ensemble_passes else ""
+    fingerprint = _scan_fingerprint(project_name, location, photos, tile_budget, groups, ensemble)
+
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.fingerprint == fingerprint and job.status != FAILED:
+                return job.id
+
+        job = ScanJob(
+            project_name, location, photos, fingerprint, tile_budget, groups,
+            ensemble_passes, min_confidence
+        )
+        _jobs[job.id] = job
+        _prune_jobs()
+
+    _executor.submit(_run_scan_job, job)
+    return job.id
+
+
+def get_scan_job(job_id: Optional[str]) -> Optional[ScanJob]:
+    """Look up a job by ID (None if unknown or expired)"""
+    if not job_id:
+        return None
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_scan_jobs() -> List[ScanJob]:
+    """All retained jobs, newest first"""
+    with _jobs_lock:
+        return sorted(_jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+
+# ==================== WORKER ====================
+
+def _run_scan_job(job: ScanJob):
+    """Analyze each photo, publishing results as they complete"""
+    job.status = RUNNING
+
+    try:
+        model = get_safety_model()
+
+        # Full views count against the tile budget; photos it cannot cover are analyzed normally
+        tiles_per_photo = [0] * job.total
+        if job.tile_budget:
+            tiles_per_photo = allocate_tile_budget([image_size(data) for _, data in job.photos], job.tile_budget)
+
+        def analyze(index: int, group: Dict) -> Dict:
+            name, data = job.photos[index]
+            result = {"index": index, "file": name, "location": group["location"], "area": group["label"]}
+            try:
+                if tiles_per_photo[index] >= 2:
+                    tiled = analyze_photo_tiled(
+                        model, data, name, job.project_name, group["location"],
+                        max_tiles=tiles_per_photo[index], extra_context=group["context"]
+                    )
+                    result.update({
+                        "analysis": tiled["analysis"],
+                        "hazards": tiled["hazards"],
+                        "tiles_analyzed": tiled["tiles_analyzed"],
+                        "overlay": draw_hazard_overlay(data, tiled["hazards"])
+                    })
+                elif job.ensemble_passes >= 2:
+                    voted = analyze_photo_ensemble(
+                        model, data, name, job.project_name, group["location"],
+                        passes=job.ensemble_passes, min_confidence=job.min_confidence,
+                        extra_context=group["context"]
+                    )
+                    result.update({
+                        "analysis": voted["analysis"],
+                        "hazards": voted["hazards"],
+                        "unconfirmed": voted["unconfirmed"],
+                        "passes": voted["passes"]
+                    })
+                else:
+                    result["analysis"] = analyze_photo(
+                        model, data, name, job.project_name, group["location"], group["context"]
+                    )
+            except Exception as e:
+                result.update({
+                    "analysis": f"⚠️ Analysis failed for this photo: {str(e)}",
+                    "error": str(e)
+                })
+            return result
+
+        # Areas run one after another; photos within an area run concurrently
+        for group in job.groups:
+            if not group["photos"]:
+                continue
+            with ThreadPoolExecutor(max_workers=min(PHOTO_WORKERS, len(group["photos"]))) as pool:
+                for result in pool.map(lambda index: analyze(index, group), group["photos"]):
+                    job._add_result(result)
+
+        job.summary = summarize_scan(model, job.get_results())
+
+        # One history scan per area so trends and repeat visits line up by location
+        results = job.get_results()
+        for number, group in enumerate(job.groups, start=1):
+            scan_id = job.id if len(job.groups) == 1 else f"{job.id}-{number}"
+            indices = set(group["photos"])
+            group_results = [r for r in results if r["index"] in indices]
+            for result in group_results:
+                result["scan_id"] = scan_id
+            try:
+                record_scan(scan_id, job.project_name, group["location"], group_results, job.created_at)
+                visit_diff = diff_with_previous_visit(scan_id, job.project_name, group["location"])
+                if visit_diff:
+                    job.visit_diffs.append(visit_diff)
+            except Exception:
+                pass  # History is for trends and visit diffs only; never fail the scan over it
+
+        job.status = COMPLETED
+
+    except Exception as e:
+        job.error = str(e)
+        job.status = FAILED
+
+    finally:
+        job.finished_at = datetime.now()
+        # Raw photo bytes are no longer needed once analyzed
+        job.photos = [(name, b"") for name, _ in job.photos]
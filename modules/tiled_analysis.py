@@ -0,0 +1,317 @@
+"""
+Tiled High-Resolution Safety Analysis
+
+Wide-angle site photos are downscaled before the model sees them, which
+hides small hazards (a single worker without eye protection, an uncovered
+floor penetration). Tiling mode splits the photo into overlapping tiles,
+analyzes the full view and every tile concurrently, then merges findings
+that were reported by neighbouring tiles into one hazard. Each merged
+hazard keeps the pixel boxes of the tiles that reported it for overlays.
+
+A scan's tile budget counts every model call of a tiled photo, full view
+included. When it cannot cover all photos, the largest photos are tiled
+and the rest get a standard single-pass analysis.
+"""
+
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from modules.safety_analysis import (
+    SEVERITY_ORDER,
+    build_safety_prompt,
+    format_hazards,
+    hazard_similarity,
+    image_to_part,
+    parse_hazards,
+)
+
+
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_OVERLAP = 0.2
+
+# Concurrent model calls per photo
+TILE_WORKERS = 4
+
+# Fewest calls worth tiling a photo for: the full view plus two tiles
+MIN_TILED_VIEWS = 3
+
+# Hazards from overlapping tiles with at least this description similarity
+# are treated as the same finding
+MERGE_SIMILARITY = 0.45
+
+OVERLAY_COLORS = {"CRITICAL": "#dc2626", "MODERATE": "#f59e0b", "MINOR": "#16a34a"}
+
+Box = Tuple[int, int, int, int]
+
+
+def _axis_starts(length: int, tile: int, step: int) -> List[int]:
+    """Tile start offsets along one axis, with the last tile flush to the edge"""
+    if length <= tile:
+        return [0]
+    count = math.ceil((length - tile) / step) + 1
+    return [min(i * step, length - tile) for i in range(count)]
+
+
+def plan_tiles(
+    width: int,
+    height: int,
+    max_tiles: int,
+    tile_size: int = DEFAULT_TILE_SIZE,
+    overlap: float = DEFAULT_OVERLAP
+) -> List[Box]:
+    """
+    Lay out overlapping tiles that fit within the tile budget
+
+    The tile size grows until the grid fits in max_tiles, so a tight budget
+    yields fewer, larger tiles rather than partial coverage.
+
+    Args:
+        width, height: Image size in pixels
+        max_tiles: Maximum number of tiles (excluding the full view)
+        tile_size: Preferred tile edge in pixels
+        overlap: Fraction of a tile shared with its neighbour
+
+    Returns:
+        List of (left, top, right, bottom) boxes; empty if tiling is pointless
+    """
+    if max_tiles < 2 or (width <= tile_size and height <= tile_size):
+        return []
+
+    size = tile_size
+    while True:
+        tile_w, tile_h = min(size, width), min(size, height)
+        step_x = max(1, int(tile_w * (1 - overlap)))
+        step_y = max(1, int(tile_h * (1 - overlap)))
+        xs = _axis_starts(width, tile_w, step_x)
+        ys = _axis_starts(height, tile_h, step_y)
+
+        if len(xs) * len(ys) <= max_tiles:
+            break
+        size = int(size * 1.25)
+
+    if len(xs) * len(ys) < 2:
+        return []
+
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+
+def image_size(image_bytes: bytes) -> Tuple[int, int]:
+    """Pixel size of an image from its header, (0, 0) if it cannot be read"""
+    try:
+        return Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        return 0, 0
+
+
+def tiled_photo_capacity(budget: int) -> int:
+    """Number of photos a tile budget can tile"""
+    return budget // MIN_TILED_VIEWS
+
+
+def allocate_tile_budget(
+    sizes: List[Tuple[int, int]],
+    budget: int,
+    tile_size: int = DEFAULT_TILE_SIZE
+) -> List[int]:
+    """
+    Split a scan's tile budget over its photos
+
+    Each tiled photo costs its tiles plus the full view. Photos no larger
+    than one tile gain nothing from tiling; of the rest, the largest are
+    tiled when the budget cannot cover them all.
+
+    Args:
+        sizes: (width, height) per photo
+        budget: Total model calls available for tiled photos
+        tile_size: Preferred tile edge in pixels
+
+    Returns:
+        Tiles per photo (excluding the full view); 0 for photos analyzed
+        without tiling
+    """
+    candidates = sorted(
+        (index for index, (width, height) in enumerate(sizes) if width > tile_size or height > tile_size),
+        key=lambda index: sizes[index][0] * sizes[index][1],
+        reverse=True
+    )
+    chosen = candidates[:tiled_photo_capacity(budget)]
+
+    tiles = [0] * len(sizes)
+    for rank, index in enumerate(chosen):
+        views = budget // len(chosen) + (1 if rank < budget % len(chosen) else 0)
+        tiles[index] = views - 1
+    return tiles
+
+
+def _boxes_touch(first: Box, second: Box) -> bool:
+    """True if two boxes overlap (tiles of the same photo share a margin)"""
+    return not (
+        first[2] <= second[0] or second[2] <= first[0] or
+        first[3] <= second[1] or second[3] <= first[1]
+    )
+
+
+def _absorb(match: Dict, hazard: Dict, box: Box):
+    """Fold a duplicate report into a finding"""
+    match["tiles"].append(box)
+    if SEVERITY_ORDER[hazard["severity"]] > SEVERITY_ORDER[match["severity"]]:
+        match["severity"] = hazard["severity"]
+    for field in ("description", "osha_reference", "action"):
+        if len(hazard.get(field, "")) > len(match.get(field, "")):
+            match[field] = hazard[field]
+
+
+def merge_tile_hazards(tile_findings: List[Tuple[Box, List[Dict]]], full_box: Optional[Box] = None) -> List[Dict]:
+    """
+    Merge hazards reported by several tiles into unique findings
+
+    A tile hazard is folded into an existing one when their descriptions
+    are similar and at least one of their tiles overlaps. The full view
+    overlaps every tile, so it is left out of that test: each full-view
+    hazard is folded into the most similar finding not already matched by
+    another full-view hazard, so similar hazards in separate parts of the
+    photo stay separate. The merged hazard keeps the highest severity, the
+    longest description, and every reporting tile box.
+
+    Args:
+        tile_findings: (tile box, parsed hazards) per analyzed view
+        full_box: Box of the full view among tile_findings, if any
+
+    Returns:
+        Deduplicated hazards, each with a "tiles" list of boxes
+    """
+    merged: List[Dict] = []
+    full_view: List[Dict] = []
+
+    for box, hazards in tile_findings:
+        if box == full_box:
+            full_view.extend(hazards)
+            continue
+        for hazard in hazards:
+            match = None
+            for existing in merged:
+                if hazard_similarity(hazard, existing) < MERGE_SIMILARITY:
+                    continue
+                if any(_boxes_touch(box, other) for other in existing["tiles"]):
+                    match = existing
+                    break
+
+            if match is None:
+                merged.append({**hazard, "tiles": [box]})
+            else:
+                _absorb(match, hazard, box)
+
+    claimed = set()
+    for hazard in full_view:
+        scored = [
+            (hazard_similarity(hazard, existing), index)
+            for index, existing in enumerate(merged) if index not in claimed
+        ]
+        best = max(scored, default=None)
+        if best is not None and best[0] >= MERGE_SIMILARITY:
+            claimed.add(best[1])
+            _absorb(merged[best[1]], hazard, full_box)
+        else:
+            claimed.add(len(merged))
+            merged.append({**hazard, "tiles": [full_box]})
+
+    merged.sort(key=lambda h: SEVERITY_ORDER[h["severity"]], reverse=True)
+    return merged
+
+
+def analyze_photo_tiled(
+    model,
+    image_bytes: bytes,
+    photo_name: str,
+    project_name: str,
+    location: str,
+    max_tiles: int,
+    tile_size: int = DEFAULT_TILE_SIZE,
+    overlap: float = DEFAULT_OVERLAP,
+    extra_context: str = ""
+) -> Dict:
+    """
+    Analyze the full photo plus overlapping tiles concurrently
+
+    Args:
+        model: Gemini model from get_safety_model()
+        image_bytes: Raw uploaded image bytes
+        photo_name: File name of the photo
+        project_name: Project being inspected
+        location: Area of the site
+        max_tiles: Tile budget for this photo (excluding the full view)
+        tile_size: Preferred tile edge in pixels
+        overlap: Fraction of overlap between neighbouring tiles
+        extra_context: Optional shared context added to every prompt
+
+    Returns:
+        Dict with the merged "analysis" text (same format as a single pass),
+        structured "hazards" with tile boxes, and "tiles_analyzed"
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    width, height = image.size
+
+    full_box = (0, 0, width, height)
+    jobs = [(full_box, image, extra_context)]
+
+    for box in plan_tiles(width, height, max_tiles, tile_size, overlap):
+        context = (
+            f"NOTE: This image is a zoomed-in tile (pixels {box[0]},{box[1]} to {box[2]},{box[3]}) "
+            f"of a {width}x{height} photo. Focus on small details such as individual workers' PPE, "
+            "floor openings and exposed wiring. Only report hazards visible in this tile."
+        )
+        if extra_context:
+            context = f"{extra_context}\n{context}"
+        jobs.append((box, image.crop(box), context))
+
+    def run(job):
+        box, tile, context = job
+        prompt = build_safety_prompt(project_name, location, photo_name, extra_context=context)
+        response = model.generate_content([image_to_part(tile), prompt])
+        return box, parse_hazards(response.text)
+
+    with ThreadPoolExecutor(max_workers=min(TILE_WORKERS, len(jobs))) as pool:
+        tile_findings = list(pool.map(run, jobs))
+
+    hazards = merge_tile_hazards(tile_findings, full_box)
+
+    return {
+        "analysis": format_hazards(hazards),
+        "hazards": hazards,
+        "tiles_analyzed": len(jobs),
+        "image_size": (width, height)
+    }
+
+
+def draw_hazard_overlay(image_bytes: bytes, hazards: List[Dict], max_dimension: int = 800) -> bytes:
+    """
+    Draw reporting tile boxes for each hazard on a downscaled copy of the photo
+
+    Full-view boxes are skipped since they cover the whole image.
+
+    Returns:
+        JPEG bytes of the overlay image
+    """
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    width, height = image.size
+    image.thumbnail((max_dimension, max_dimension))
+    scale = image.size[0] / width
+
+    draw = ImageDraw.Draw(image)
+    for number, hazard in enumerate(hazards, start=1):
+        color = OVERLAY_COLORS[hazard["severity"]]
+        for box in hazard.get("tiles", []):
+            if tuple(box) == (0, 0, width, height):
+                continue
+            scaled = [int(v * scale) for v in box]
+            draw.rectangle(scaled, outline=color, width=3)
+            draw.text((scaled[0] + 6, scaled[1] + 4), f"#{number}", fill=color)
+
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
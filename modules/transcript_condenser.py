@@ -0,0 +1,129 @@
+"""
+Transcript Condenser
+
+Turns a chat transcript into a short, structured note for the CRM instead of
+pasting raw messages: the qualified lead profile, what the client asked and
+what the assistant committed to. The note has a fixed size limit however long
+the conversation was, and the welcome message and the assistant's full
+answers are left out. The complete transcript can be kept alongside as a
+gzip-compressed attachment.
+
+Everything runs locally (no model call), so logging a chat stays fast.
+"""
+
+import gzip
+import re
+from typing import Dict, List, Optional
+
+from modules.lead_qualification import LeadQualifier
+
+# Hard limit for the condensed note
+NOTE_SUMMARY_CHARS = 4000
+
+# Client messages kept (the first few and the most recent), and their length
+MAX_QUESTIONS = 12
+QUESTION_CHARS = 220
+
+MAX_COMMITMENTS = 8
+COMMITMENT_CHARS = 220
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Assistant sentences that promise a next step to the client
+_COMMITMENT = re.compile(
+    r"\b(?:i'll|i will|we'll|we will|our team (?:will|can)|someone from|"
+    r"(?:reach|get) (?:out|back)|follow[- ]up|schedule|send you|contact you|call you)\b",
+    re.IGNORECASE
+)
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _conversation(history: List[Dict]) -> List[Dict]:
+    """Messages from the first client message on (drops the welcome message)"""
+    for index, message in enumerate(history):
+        if message["role"] == "user":
+            return history[index:]
+    return []
+
+
+def _questions(messages: List[Dict]) -> List[str]:
+    asked = [_shorten(m["content"], QUESTION_CHARS) for m in messages if m["role"] == "user"]
+    if len(asked) <= MAX_QUESTIONS:
+        return asked
+    head = MAX_QUESTIONS // 3
+    tail = MAX_QUESTIONS - head
+    return asked[:head] + [f"… {len(asked) - MAX_QUESTIONS} more …"] + asked[-tail:]
+
+
+def _commitments(messages: List[Dict]) -> List[str]:
+    found, seen = [], set()
+    for message in messages:
+        if message["role"] != "assistant":
+            continue
+        for sentence in _SENTENCE.split(message["content"]):
+            sentence = sentence.strip(" -*•#")
+            key = sentence.lower()
+            if sentence and key not in seen and _COMMITMENT.search(sentence):
+                seen.add(key)
+                found.append(_shorten(sentence, COMMITMENT_CHARS))
+    # The latest promises are the ones the team has to keep
+    return found[-MAX_COMMITMENTS:]
+
+
+def condense_transcript(
+    history: List[Dict],
+    lead: Optional[LeadQualifier] = None,
+    max_chars: int = NOTE_SUMMARY_CHARS
+) -> str:
+    """
+    Structured summary of a chat for a CRM note
+
+    Args:
+        history: Messages as {"role": "user" | "assistant", "content"}
+        lead: Lead profile of the conversation (rebuilt from the client
+            messages if not given)
+        max_chars: Size limit of the summary
+
+    Returns:
+        Markdown summary with lead facts, client questions and commitments
+    """
+    messages = _conversation(history)
+
+    if lead is None:
+        lead = LeadQualifier()
+        for message in messages:
+            if message["role"] == "user":
+                lead.update(message["content"])
+
+    sections = [f"**Lead Profile**\n{lead.summary()}"]
+
+    questions = _questions(messages)
+    if questions:
+        sections.append("**Client Asked**\n" + "\n".join(f"- {question}" for question in questions))
+
+    commitments = _commitments(messages)
+    if commitments:
+        sections.append("**Assistant Next Steps**\n" + "\n".join(f"- {item}" for item in commitments))
+
+    summary = "\n\n".join(sections)
+    if len(summary) > max_chars:
+        summary = summary[:max_chars - 1].rstrip() + "…"
+    return summary
+
+
+def format_transcript(history: List[Dict]) -> str:
+    """Full transcript as markdown"""
+    lines = []
+    for message in history:
+        role = "AI Assistant" if message["role"] == "assistant" else "Client"
+        lines.append(f"**{role}:**\n{message['content']}\n")
+    return "\n".join(lines)
+
+
+def compress_transcript(history: List[Dict]) -> bytes:
+    """Gzip-compressed full transcript, for a CRM attachment"""
+    return gzip.compress(format_transcript(history).encode("utf-8"))
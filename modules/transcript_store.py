@@ -0,0 +1,223 @@
+"""
+Chat Transcript Store
+
+Client assistant conversations are kept in a local SQLite database so a
+visitor can refresh the page or come back later and pick up where they left
+off. Each conversation is keyed by a random session token carried in the
+page URL (?chat=<token>).
+
+Transcripts are stored as zlib-compressed blocks of BLOCK_MESSAGES messages:
+appending a message rewrites only the last block, and reading a page of the
+conversation decompresses only the blocks it touches, so both stay cheap
+however long the conversation gets. The running conversation summary is
+kept alongside, so a resumed conversation does not need to re-summarize.
+
+The database lives in the platform data directory (ASSISTANT_TRANSCRIPT_DB
+overrides the path); conversations idle for RETENTION_DAYS are deleted.
+"""
+
+import json
+import os
+import re
+import secrets
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.paths import DATA_DIR
+
+TRANSCRIPT_DB_PATH = Path(os.getenv("ASSISTANT_TRANSCRIPT_DB", DATA_DIR / "chat_transcripts.db"))
+
+# Messages per compressed block
+BLOCK_MESSAGES = 20
+
+# Conversations untouched this long are deleted
+RETENTION_DAYS = 30
+
+# Expired conversations are purged at most this often (seconds)
+PURGE_INTERVAL = 3600
+
+_TOKEN = re.compile(r"^[A-Za-z0-9_-]{22}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    token TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_upto INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transcript_blocks (
+    token TEXT NOT NULL REFERENCES conversations(token),
+    block INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (token, block)
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at);
+"""
+
+_last_purge = 0.0
+
+
+def connect() -> sqlite3.Connection:
+    """Open a connection to the transcript database, creating it if needed"""
+    TRANSCRIPT_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(TRANSCRIPT_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def new_token() -> str:
+    """Random token identifying a new conversation"""
+    return secrets.token_urlsafe(16)
+
+
+def is_valid_token(token: Optional[str]) -> bool:
+    """Whether a token (e.g. from the URL) has the expected format"""
+    return bool(token and _TOKEN.match(token))
+
+
+def _encode(messages: List[Dict]) -> bytes:
+    return zlib.compress(json.dumps(messages, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(data: bytes) -> List[Dict]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def get_conversation(token: str) -> Optional[Dict]:
+    """
+    Conversation metadata
+
+    Returns:
+        Dict with message_count, summary, summarized_upto, created_at and
+        updated_at, or None if the conversation does not exist
+    """
+    with closing(connect()) as conn:
+        row = conn.execute("SELECT * FROM conversations WHERE token = ?", (token,)).fetchone()
+    return dict(row) if row else None
+
+
+def append_messages(token: str, messages: List[Dict]) -> int:
+    """
+    Add messages to the end of a conversation, creating it if needed
+
+    Args:
+        token: Conversation token
+        messages: Chat messages ({"role", "content"})
+
+    Returns:
+        Message count of the conversation afterwards
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    with closing(connect()) as conn, conn:
+        # Serialize writers so two tabs on one conversation cannot lose messages
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT message_count FROM conversations WHERE token = ?", (token,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO conversations (token, created_at, updated_at) VALUES (?, ?, ?)",
+                (token, now, now)
+            )
+        count = row["message_count"] if row else 0
+
+        block, used = divmod(count, BLOCK_MESSAGES)
+        pending = list(messages)
+        if used:
+            data = conn.execute(
+                "SELECT data FROM transcript_blocks WHERE token = ? AND block = ?", (token, block)
+            ).fetchone()["data"]
+            pending = _decode(data) + pending
+
+        while pending:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcript_blocks (token, block, data) VALUES (?, ?, ?)",
+                (token, block, _encode(pending[:BLOCK_MESSAGES]))
+            )
+            pending = pending[BLOCK_MESSAGES:]
+            block += 1
+
+        count += len(messages)
+        conn.execute(
+            "UPDATE conversations SET message_count = ?, updated_at = ? WHERE token = ?",
+            (count, now, token)
+        )
+    return count
+
+
+def load_messages(token: str, start: int = 0, end: Optional[int] = None) -> List[Dict]:
+    """
+    Messages start..end of a conversation, decompressing only the blocks needed
+
+    Args:
+        token: Conversation token
+        start: Index of the first message
+        end: Index after the last message (defaults to the end)
+
+    Returns:
+        List of chat messages ({"role", "content"})
+    """
+    first = start // BLOCK_MESSAGES
+    with closing(connect()) as conn:
+        if end is None:
+            rows = conn.execute(
+                "SELECT data FROM transcript_blocks WHERE token = ? AND block >= ? ORDER BY block",
+                (token, first)
+            ).fetchall()
+        else:
+            if end <= start:
+                return []
+            rows = conn.execute(
+                "SELECT data FROM transcript_blocks WHERE token = ? AND block BETWEEN ? AND ? ORDER BY block",
+                (token, first, (end - 1) // BLOCK_MESSAGES)
+            ).fetchall()
+
+    messages = []
+    for row in rows:
+        messages.extend(_decode(row["data"]))
+    offset = start - first * BLOCK_MESSAGES
+    return messages[offset:None if end is None else offset + end - start]
+
+
+def save_summary(token: str, summary: str, summarized_upto: int):
+    """Keep the conversation's running summary for when it is resumed"""
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            "UPDATE conversations SET summary = ?, summarized_upto = ? WHERE token = ?",
+            (summary, summarized_upto, token)
+        )
+
+
+def delete_conversation(token: str):
+    """Remove a conversation and its transcript"""
+    with closing(connect()) as conn, conn:
+        conn.execute("DELETE FROM transcript_blocks WHERE token = ?", (token,))
+        conn.execute("DELETE FROM conversations WHERE token = ?", (token,))
+
+
+def purge_expired(retention_days: int = RETENTION_DAYS, force: bool = False) -> int:
+    """
+    Delete conversations idle for longer than the retention period
+
+    Runs at most once per PURGE_INTERVAL unless forced.
+
+    Returns:
+        Number of conversations deleted
+    """
+    global _last_purge
+    if not force and time.monotonic() - _last_purge < PURGE_INTERVAL:
+        return 0
+    _last_purge = time.monotonic()
+
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat(timespec="seconds")
+    with closing(connect()) as conn, conn:
+        expired = "SELECT token FROM conversations WHERE updated_at < ?"
+        conn.execute(f"DELETE FROM transcript_blocks WHERE token IN ({expired})", (cutoff,))
+        return conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
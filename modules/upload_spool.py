@@ -0,0 +1,325 @@
+"""
+Field Photo Upload Spool
+
+Server-side storage for the resumable upload endpoint (upload_server.py).
+Field crews on poor LTE send each photo in small chunks; every chunk is
+acknowledged as soon as it is safely on disk, so a dropped connection only
+costs the chunk in flight and the client resumes from the missing ones.
+
+Spool layout (UPLOAD_SPOOL_DIR, default <data dir>/upload_spool):
+
+    partial/<upload id>/meta.json      Declared name, size, hash, project...
+    partial/<upload id>/<index>.chunk  One file per acknowledged chunk
+    complete/<sha256>.<ext>            Finished photos, content-addressed
+    complete/<sha256>.json             Photo metadata and scan status
+
+Photos are identified by their SHA-256, so a photo that is already in the
+spool (or already partially uploaded) is never sent twice. Completed photos
+wait in the spool until the Safety Scanner picks them up.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.paths import DATA_DIR
+
+SPOOL_DIR = Path(os.getenv("UPLOAD_SPOOL_DIR", DATA_DIR / "upload_spool"))
+
+# Small chunks keep retries cheap on flaky mobile connections
+DEFAULT_CHUNK_SIZE = 256 * 1024
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+# Partial uploads untouched for this long are deleted by purge_stale()
+PARTIAL_RETENTION_SECONDS = 7 * 24 * 3600
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write a file so readers never see it half-written"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, data: Dict):
+    _write_atomic(path, json.dumps(data, indent=2).encode("utf-8"))
+
+
+class UploadSpool:
+    """Chunked, resumable, content-addressed photo spool"""
+
+    def __init__(self, root: Path = SPOOL_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.partial_dir = self.root / "partial"
+        self.complete_dir = self.root / "complete"
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.complete_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # ==================== UPLOADS ====================
+
+    def _partial_path(self, upload_id: str) -> Path:
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise KeyError(upload_id)
+        path = self.partial_dir / upload_id
+        if not path.is_dir():
+            raise KeyError(upload_id)
+        return path
+
+    def _completed_meta(self, sha256: str) -> Optional[Dict]:
+        path = self.complete_dir / f"{sha256}.json"
+        return _read_json(path) if path.exists() else None
+
+    def _missing_chunks(self, path: Path, meta: Dict) -> List[int]:
+        received = {int(p.stem) for p in path.glob("*.chunk")}
+        return [i for i in range(meta["chunks"]) if i not in received]
+
+    def start_upload(
+        self,
+        name: str,
+        size: int,
+        sha256: str,
+        project: str = "",
+        location: str = "",
+        batch: str = ""
+    ) -> Dict:
+        """
+        Declare a photo before sending it
+
+        Returns the existing photo if the hash is already in the spool, or
+        the in-progress upload with the same hash so the client resumes it.
+
+        Args:
+            name: Original file name
+            size: File size in bytes
+            sha256: Hex SHA-256 of the file contents
+            project: Project the photo belongs to
+            location: Area of the site
+            batch: Client-chosen ID grouping the photos of one site walk
+
+        Returns:
+            Dict with status ("duplicate" or "uploading"), upload_id,
+            chunk_size and the list of missing chunk indices
+        """
+        sha256 = (sha256 or "").lower()
+        extension = Path(name or "").suffix.lower()
+        if not _SHA256.match(sha256):
+            raise ValueError("sha256 must be a hex SHA-256 digest")
+        if extension not in ALLOWED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type '{extension}'")
+        if not 0 < size <= MAX_UPLOAD_SIZE:
+            raise ValueError(f"File size must be between 1 byte and {MAX_UPLOAD_SIZE} bytes")
+
+        with self._lock:
+            existing = self._completed_meta(sha256)
+            if existing:
+                return {"status": "duplicate", "upload_id": None, "sha256": sha256,
+                        "chunk_size": self.chunk_size, "missing": []}
+
+            # Resume an in-progress upload of the same content
+            for path in self.partial_dir.iterdir():
+                meta_path = path / "meta.json"
+                if meta_path.exists():
+                    meta = _read_json(meta_path)
+                    if meta["sha256"] == sha256 and meta["size"] == size:
+                        return {"status": "uploading", "upload_id": path.name, "sha256": sha256,
+                                "chunk_size": meta["chunk_size"],
+                                "missing": self._missing_chunks(path, meta)}
+
+            upload_id = uuid.uuid4().hex
+            path = self.partial_dir / upload_id
+            path.mkdir()
+            meta = {
+                "name": Path(name).name,
+                "size": size,
+                "sha256": sha256,
+                "project": project,
+                "location": location,
+                "batch": batch,
+                "chunk_size": self.chunk_size,
+                "chunks": -(-size // self.chunk_size),
+                "started_at": datetime.now().isoformat(timespec="seconds")
+            }
+            _write_json(path / "meta.json", meta)
+
+        return {"status": "uploading", "upload_id": upload_id, "sha256": sha256,
+                "chunk_size": meta["chunk_size"], "missing": list(range(meta["chunks"]))}
+
+    def upload_status(self, upload_id: str) -> Dict:
+        """Chunks still missing for an in-progress upload"""
+        path = self._partial_path(upload_id)
+        meta = _read_json(path / "meta.json")
+        return {"status": "uploading", "upload_id": upload_id, "sha256": meta["sha256"],
+                "chunk_size": meta["chunk_size"], "missing": self._missing_chunks(path, meta)}
+
+    def write_chunk(self, upload_id: str, index: int, data: bytes, chunk_sha256: str = None) -> Dict:
+        """
+        Store one chunk and finish the upload once every chunk arrived
+
+        Re-sending an acknowledged chunk is harmless.
+
+        Args:
+            upload_id: ID from start_upload()
+            index: Zero-based chunk number
+            data: Chunk bytes
+            chunk_sha256: Optional hex SHA-256 of the chunk, checked on arrival
+
+        Returns:
+            Dict with status ("uploading" or "complete") and missing chunks
+        """
+        path = self._partial_path(upload_id)
+        meta = _read_json(path / "meta.json")
+
+        if not 0 <= index < meta["chunks"]:
+            raise ValueError(f"Chunk index {index} out of range")
+        expected = min(meta["chunk_size"], meta["size"] - index * meta["chunk_size"])
+        if len(data) != expected:
+            raise ValueError(f"Chunk {index} should be {expected} bytes, got {len(data)}")
+        if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+            raise ValueError(f"Chunk {index} failed its checksum")
+
+        _write_atomic(path / f"{index:06d}.chunk", data)
+
+        missing = self._missing_chunks(path, meta)
+        if missing:
+            return {"status": "uploading", "upload_id": upload_id, "sha256": meta["sha256"],
+                    "missing": missing}
+
+        return self._finish(upload_id, path, meta)
+
+    def _finish(self, upload_id: str, path: Path, meta: Dict) -> Dict:
+        """Assemble chunks, verify the whole-file hash and publish the photo"""
+        with self._lock:
+            if not path.exists():
+                # Another request finished it first
+                return {"status": "complete", "upload_id": upload_id, "sha256": meta["sha256"], "missing": []}
+
+            extension = Path(meta["name"]).suffix.lower()
+            target = self.complete_dir / f"{meta['sha256']}{extension}"
+            tmp = target.with_name(f".{target.name}.tmp")
+
+            digest = hashlib.sha256()
+            with open(tmp, "wb") as out:
+                for index in range(meta["chunks"]):
+                    chunk = (path / f"{index:06d}.chunk").read_bytes()
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            if digest.hexdigest() != meta["sha256"]:
+                tmp.unlink()
+                shutil.rmtree(path, ignore_errors=True)
+                raise ValueError("Upload failed its checksum; start it again")
+
+            os.replace(tmp, target)
+            _write_json(self.complete_dir / f"{meta['sha256']}.json", {
+                "name": meta["name"],
+                "file": target.name,
+                "size": meta["size"],
+                "sha256": meta["sha256"],
+                "project": meta["project"],
+                "location": meta["location"],
+                "batch": meta["batch"],
+                "uploaded_at": datetime.now().isoformat(timespec="seconds"),
+                "scan_id": None
+            })
+            shutil.rmtree(path, ignore_errors=True)
+
+        return {"status": "complete", "upload_id": upload_id, "sha256": meta["sha256"], "missing": []}
+
+    def purge_stale(self, max_age: float = PARTIAL_RETENTION_SECONDS) -> int:
+        """Delete abandoned partial uploads; returns how many were removed"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for path in self.partial_dir.iterdir():
+            newest = max((p.stat().st_mtime for p in path.iterdir()), default=path.stat().st_mtime)
+            if newest < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    # ==================== HAND-OFF TO THE SCANNER ====================
+
+    def ready_files(self) -> List[Dict]:
+        """Completed photos not yet scanned, oldest first"""
+        photos = []
+        for meta_path in self.complete_dir.glob("*.json"):
+            meta = _read_json(meta_path)
+            if not meta.get("scan_id"):
+                photos.append(meta)
+        return sorted(photos, key=lambda m: m["uploaded_at"])
+
+    def read_file(self, sha256: str) -> bytes:
+        meta = self._completed_meta(sha256)
+        if meta is None:
+            raise KeyError(sha256)
+        return (self.complete_dir / meta["file"]).read_bytes()
+
+    def mark_scanned(self, sha256s: List[str], scan_id: str):
+        """Record which scan picked the photos up so they leave the ready list"""
+        with self._lock:
+            for sha256 in sha256s:
+                meta = self._completed_meta(sha256)
+                if meta:
+                    meta["scan_id"] = scan_id
+                    _write_json(self.complete_dir / f"{sha256}.json", meta)
+
+
+@lru_cache(maxsize=1)
+def get_upload_spool() -> UploadSpool:
+    """Process-wide spool at the configured location"""
+    return UploadSpool()
+
+
+def group_ready_files(photos: List[Dict]) -> List[Dict]:
+    """
+    Group ready photos by project, location and batch for the scanner
+
+    Returns:
+        List of dicts with project, location, batch, photos and a label
+    """
+    groups: Dict[tuple, Dict] = {}
+    for photo in photos:
+        key = (photo["project"], photo["location"], photo["batch"])
+        if key not in groups:
+            groups[key] = {"project": photo["project"], "location": photo["location"],
+                           "batch": photo["batch"], "photos": []}
+        groups[key]["photos"].append(photo)
+
+    for group in groups.values():
+        first = group["photos"][0]["uploaded_at"].replace("T", " ")[:16]
+        where = " - ".join(part for part in (group["project"], group["location"]) if part) or "Unassigned"
+        group["label"] = f"{where} · {len(group['photos'])} photo(s) · {first}"
+
+        # Different phones reuse names like IMG_0001.jpg; keep them unique per scan
+        seen = set()
+        for photo in group["photos"]:
+            name = photo["name"]
+            if name in seen:
+                name = f"{Path(name).stem}-{photo['sha256'][:6]}{Path(name).suffix}"
+            seen.add(name)
+            photo["scan_name"] = name
+
+    return list(groups.values())
@@ -0,0 +1,321 @@
+"""
+SE Builders - Headless Bulk Safety Scanner
+
+Scans a directory tree of site photos without the browser, using the same
+prompt and severity logic as the Safety Scanner page. Photos are expected
+to be organized as:
+
+    <root>/<project>/<location>/.../<photo>.jpg
+
+Photos are decoded and downscaled in a process pool, then analyzed through
+an asyncio pipeline with a cap on concurrent model calls. Every analyzed
+photo is appended to results.jsonl as soon as it finishes, which doubles as
+the checkpoint: re-running the same command skips photos already scanned.
+
+Usage:
+    python safety_scan_cli.py /mnt/site-uploads/2025-01-14 --output scan_output
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Set
+
+from dotenv import load_dotenv
+
+from modules.hazard_history import record_scan
+from modules.safety_analysis import (
+    MAX_IMAGE_DIMENSION,
+    analyze_photo_async,
+    detect_severity,
+    get_safety_model,
+    prepare_photo,
+    summarize_scan,
+)
+
+PHOTO_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+RESULTS_FILE = "results.jsonl"
+SUMMARY_FILE = "summary_report.txt"
+SUMMARY_JSON_FILE = "summary_report.json"
+
+# Transient model errors are retried with exponential backoff
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2.0
+
+
+def find_photos(root: Path) -> List[Dict]:
+    """
+    Walk the photo tree and derive project/location from the folder layout
+
+    Returns:
+        List of dicts with path, project, location and file name, sorted by path
+    """
+    photos = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if Path(filename).suffix.lower() not in PHOTO_EXTENSIONS:
+                continue
+
+            path = Path(dirpath) / filename
+            parts = path.relative_to(root).parts[:-1]
+            photos.append({
+                "path": str(path),
+                "project": parts[0] if parts else root.name,
+                "location": " / ".join(parts[1:]),
+                "file": filename
+            })
+
+    return sorted(photos, key=lambda photo: photo["path"])
+
+
+def load_checkpoint(results_path: Path) -> Set[str]:
+    """Paths already analyzed successfully in a previous run"""
+    done = set()
+    if not results_path.exists():
+        return done
+
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written line from an interrupted run
+            if not record.get("error"):
+                done.add(record["path"])
+
+    return done
+
+
+def load_results(results_path: Path) -> List[Dict]:
+    """Latest record per photo from the results file"""
+    latest = {}
+    if results_path.exists():
+        with open(results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                latest[record["path"]] = record
+    return list(latest.values())
+
+
+async def scan_photos(
+    photos: List[Dict],
+    results_path: Path,
+    workers: int,
+    concurrency: int,
+    max_dimension: int
+) -> Dict:
+    """
+    Run the decode -> analyze pipeline and append results as they finish
+
+    Returns:
+        Run statistics (analyzed, failed, elapsed seconds)
+    """
+    model = get_safety_model()
+    loop = asyncio.get_running_loop()
+    model_slots = asyncio.Semaphore(concurrency)
+    # Bounds decoded photos held in memory while waiting for a model slot
+    inflight = asyncio.Semaphore(concurrency + workers)
+    write_lock = asyncio.Lock()
+    stats = {"analyzed": 0, "failed": 0, "records": []}
+    started = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(results_path, "a", encoding="utf-8") as results_file:
+
+        async def process(photo: Dict):
+            async with inflight:
+                await analyze(photo)
+
+        async def analyze(photo: Dict):
+            record = dict(photo)
+            try:
+                jpeg_bytes = await loop.run_in_executor(pool, prepare_photo, photo["path"], max_dimension)
+
+                async with model_slots:
+                    for attempt in range(MAX_ATTEMPTS):
+                        try:
+                            analysis = await analyze_photo_async(
+                                model, jpeg_bytes, photo["file"], photo["project"], photo["location"]
+                            )
+                            break
+                        except Exception:
+                            if attempt == MAX_ATTEMPTS - 1:
+                                raise
+                            await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+
+                record["analysis"] = analysis
+                record["severity"] = detect_severity(analysis)
+                stats["analyzed"] += 1
+            except Exception as e:
+                record["error"] = str(e)
+                stats["failed"] += 1
+
+            record["scanned_at"] = datetime.now().isoformat(timespec="seconds")
+
+            async with write_lock:
+                results_file.write(json.dumps(record) + "\n")
+                results_file.flush()
+                stats["records"].append(record)
+
+            done = stats["analyzed"] + stats["failed"]
+            status = "FAILED" if record.get("error") else (record["severity"] or "CLEAR")
+            print(f"[{done}/{len(photos)}] {status:<8} {photo['path']}", flush=True)
+
+        await asyncio.gather(*(process(photo) for photo in photos))
+
+    stats["elapsed"] = time.monotonic() - started
+    return stats
+
+
+def record_history(records: List[Dict], run_started: datetime):
+    """Add this run's results to the hazard history, one scan per project/location"""
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record["project"], record["location"])].append(record)
+
+    run_id = run_started.strftime("%Y%m%d%H%M%S")
+    for (project, location), group in groups.items():
+        results = [{**record, "file": record["path"]} for record in group]
+        record_scan(f"cli-{run_id}-{project}-{location}", project, location, results, run_started, source="cli")
+
+
+def build_summary(records: List[Dict], model=None) -> Dict:
+    """
+    Aggregate results per project/location
+
+    Args:
+        records: Latest result record per photo
+        model: If given, also generate the page's AI summary per group
+
+    Returns:
+        Dict keyed by "project :: location" with severity counts
+    """
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record["project"], record["location"])].append(record)
+
+    summary = {}
+    for (project, location), group in sorted(groups.items()):
+        analyzed = [r for r in group if not r.get("error")]
+        counts = {"CRITICAL": 0, "MODERATE": 0, "MINOR": 0, "CLEAR": 0}
+        for record in analyzed:
+            counts[record.get("severity") or "CLEAR"] += 1
+
+        entry = {
+            "project": project,
+            "location": location,
+            "photos": len(group),
+            "failed": len(group) - len(analyzed),
+            "photos_by_severity": counts,
+            "critical_photos": [r["path"] for r in analyzed if r.get("severity") == "CRITICAL"]
+        }
+
+        if model is not None and analyzed:
+            try:
+                entry["ai_summary"] = summarize_scan(model, analyzed)
+            except Exception as e:
+                entry["ai_summary"] = f"Summary failed: {str(e)}"
+
+        summary[f"{project} :: {location or 'Not specified'}"] = entry
+
+    return summary
+
+
+def write_summary_report(output_dir: Path, summary: Dict):
+    """Write the summary as JSON and as a readable text report"""
+    with open(output_dir / SUMMARY_JSON_FILE, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    lines = [
+        "SE BUILDERS - BULK SAFETY SCAN SUMMARY",
+        f"Generated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}",
+        "=" * 60,
+    ]
+    for entry in summary.values():
+        counts = entry["photos_by_severity"]
+        lines.append("")
+        lines.append(f"PROJECT: {entry['project']}")
+        lines.append(f"LOCATION: {entry['location'] or 'Not specified'}")
+        lines.append(f"PHOTOS: {entry['photos']} (failed: {entry['failed']})")
+        lines.append(
+            f"CRITICAL: {counts['CRITICAL']} | MODERATE: {counts['MODERATE']} | "
+            f"MINOR: {counts['MINOR']} | CLEAR: {counts['CLEAR']}"
+        )
+        for path in entry["critical_photos"]:
+            lines.append(f"  🔴 {path}")
+        if entry.get("ai_summary"):
+            lines.append("-" * 60)
+            lines.append(entry["ai_summary"])
+        lines.append("=" * 60)
+
+    with open(output_dir / SUMMARY_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk safety scan of a site photo directory")
+    parser.add_argument("root", help="Photo directory organized as <project>/<location>/...")
+    parser.add_argument("--output", default="scan_output", help="Directory for results.jsonl and summary report")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Processes for decoding/resizing")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum concurrent model calls")
+    parser.add_argument("--max-dimension", type=int, default=MAX_IMAGE_DIMENSION, help="Longest image side sent to the model")
+    parser.add_argument("--ai-summary", action="store_true", help="Also generate an AI summary per project/location")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rescan everything")
+    parser.add_argument("--no-history", action="store_true", help="Don't add results to the hazard trend history")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("GOOGLE_API_KEY not found in environment or .env file", file=sys.stderr)
+        return 2
+
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"Not a directory: {root}", file=sys.stderr)
+        return 2
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_path = output_dir / RESULTS_FILE
+
+    if args.restart and results_path.exists():
+        results_path.unlink()
+
+    photos = find_photos(root)
+    done = load_checkpoint(results_path)
+    pending = [photo for photo in photos if photo["path"] not in done]
+
+    print(f"Found {len(photos)} photo(s); {len(done)} already scanned, {len(pending)} to go")
+
+    if pending:
+        run_started = datetime.now()
+        stats = asyncio.run(scan_photos(
+            pending, results_path, args.workers, max(1, args.concurrency), args.max_dimension
+        ))
+        print(
+            f"Analyzed {stats['analyzed']} photo(s), {stats['failed']} failed "
+            f"in {stats['elapsed']:.1f}s"
+        )
+        if not args.no_history:
+            record_history(stats["records"], run_started)
+
+    model = get_safety_model() if args.ai_summary else None
+    summary = build_summary(load_results(results_path), model)
+    write_summary_report(output_dir, summary)
+    print(f"Summary written to {output_dir / SUMMARY_FILE}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
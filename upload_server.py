@@ -0,0 +1,149 @@
+"""
+SE Builders - Resumable Field Photo Upload Server
+
+HTTP endpoint for field crews uploading site photos over poor mobile
+connections (see field_upload.py for the client). Photos arrive in small
+chunks that are acknowledged individually, so an interrupted upload resumes
+from the missing chunks instead of restarting. Completed photos land in the
+upload spool, where the Safety Scanner page picks them up. Spool writes
+(fsync, assembling and hashing a finished photo) run on a worker pool so
+the IOLoop keeps serving other uploads.
+
+API (JSON responses; Authorization: Bearer $UPLOAD_TOKEN when it is set):
+
+    POST /uploads                      {name, size, sha256, project, location, batch}
+                                       -> {status, upload_id, chunk_size, missing}
+    GET  /uploads/<id>                 -> {status, missing}
+    PUT  /uploads/<id>/chunks/<index>  raw chunk bytes, optional X-Chunk-SHA256
+                                       -> {status, missing}
+
+Usage:
+    python upload_server.py --port 8502
+"""
+
+import argparse
+import hmac
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List
+
+import tornado.ioloop
+import tornado.web
+from dotenv import load_dotenv
+
+from modules.upload_spool import DEFAULT_CHUNK_SIZE, UploadSpool
+
+# Purge abandoned partial uploads this often (milliseconds)
+PURGE_INTERVAL_MS = 60 * 60 * 1000
+
+# Threads for spool disk work
+SPOOL_WORKERS = 4
+
+
+class UploadHandler(tornado.web.RequestHandler):
+    """Base handler with token auth and JSON errors"""
+
+    def initialize(self, spool: UploadSpool, token: str, executor: ThreadPoolExecutor):
+        self.spool = spool
+        self.token = token
+        self.executor = executor
+
+    def prepare(self):
+        if self.token:
+            supplied = self.request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, self.token):
+                raise tornado.web.HTTPError(401)
+
+    def write_error(self, status_code: int, **kwargs):
+        message = self._reason
+        if "exc_info" in kwargs:
+            error = kwargs["exc_info"][1]
+            if isinstance(error, (ValueError, KeyError)):
+                message = str(error)
+        self.finish({"error": message})
+
+    async def call(self, method, *args, **kwargs):
+        """Run a spool method on the worker pool, mapping bad input to 400 and unknown uploads to 404"""
+        try:
+            return await tornado.ioloop.IOLoop.current().run_in_executor(
+                self.executor, partial(method, *args, **kwargs)
+            )
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="Unknown upload")
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+
+
+class StartUploadHandler(UploadHandler):
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+            size = int(body.get("size", 0))
+        except (ValueError, TypeError):
+            raise tornado.web.HTTPError(400, reason="Expected a JSON body")
+
+        self.write(await self.call(
+            self.spool.start_upload,
+            name=str(body.get("name", "")),
+            size=size,
+            sha256=str(body.get("sha256", "")),
+            project=str(body.get("project", "")),
+            location=str(body.get("location", "")),
+            batch=str(body.get("batch", ""))
+        ))
+
+
+class UploadStatusHandler(UploadHandler):
+    async def get(self, upload_id: str):
+        self.write(await self.call(self.spool.upload_status, upload_id))
+
+
+class ChunkHandler(UploadHandler):
+    async def put(self, upload_id: str, index: str):
+        self.write(await self.call(
+            self.spool.write_chunk,
+            upload_id,
+            int(index),
+            self.request.body,
+            self.request.headers.get("X-Chunk-SHA256")
+        ))
+
+
+def make_app(spool: UploadSpool, token: str = "") -> tornado.web.Application:
+    executor = ThreadPoolExecutor(max_workers=SPOOL_WORKERS, thread_name_prefix="upload-spool")
+    settings = {"spool": spool, "token": token, "executor": executor}
+    return tornado.web.Application([
+        (r"/uploads", StartUploadHandler, settings),
+        (r"/uploads/([0-9a-f]+)", UploadStatusHandler, settings),
+        (r"/uploads/([0-9a-f]+)/chunks/([0-9]+)", ChunkHandler, settings),
+    ])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resumable field photo upload server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Chunk size in bytes")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    token = os.getenv("UPLOAD_TOKEN", "")
+    if not token:
+        print("Warning: UPLOAD_TOKEN is not set - the upload endpoint is open to anyone", file=sys.stderr)
+
+    spool = UploadSpool(chunk_size=args.chunk_size)
+    app = make_app(spool, token)
+    # Chunks are small; reject anything much larger outright
+    app.listen(args.port, args.host, max_body_size=args.chunk_size + 64 * 1024)
+
+    tornado.ioloop.PeriodicCallback(spool.purge_stale, PURGE_INTERVAL_MS).start()
+    print(f"Accepting uploads on http://{args.host}:{args.port}/uploads (spool: {spool.root})")
+    tornado.ioloop.IOLoop.current().start()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())